@@ -1,10 +1,14 @@
+from typing import Optional
+
 from langchain_openai import ChatOpenAI
 
+from agents.classifier import classify, register_task
+
 
 
 check_llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0)
 
-def check_summary(answer):
+def check_summary_llm(answer):
     prompt = "Ты агент, который определяет наличие итоговой записи в сообщении.\n" \
         "Ты получаешь на вход ответ агента по недвижимости Клиенту.\n" \
         "Если ответ содержит a Summary of a chat with client, including agreed with manager call time, information about client, it's family, reason for purchasing flat, building complex, financial conditions client is interested in, number of rooms, budget (if provided, optional), всегда отвечай 'YES'" \
@@ -14,3 +18,29 @@ def check_summary(answer):
     result = check_llm.invoke(prompt)
     return "YES" if "YES" in result.content else "NO"
 
+
+register_task(
+    "summary",
+    positives=[
+        "Итак, подведём итог: Иван, семья из трёх человек, ищете двухкомнатную квартиру в ЖК «Андерсен» для жизни, "
+        "бюджет до 8 млн, интересует ипотека. Звонок с менеджером согласован на завтра в 15:00.",
+        "Резюме нашего разговора: клиент — Анна, покупка для сына, студия или однокомнатная в ЖК «7Я», "
+        "рассматривает семейную ипотеку. Менеджер позвонит вам сегодня в 18:30.",
+        "Подытожу: вы планируете покупку трёхкомнатной квартиры в ЖК «Весна» для семьи с двумя детьми, "
+        "бюджет около 12 млн, оплата частично наличными, частично в ипотеку. Созвон с менеджером — в пятницу в 11:00.",
+        "Записала: Сергей, инвестиционная покупка, однокомнатная квартира, интересуют скидки и рассрочка. "
+        "Менеджер свяжется с вами в понедельник в 10:00.",
+    ],
+    negatives=[
+        "В ЖК «Андерсен» есть двухкомнатные квартиры площадью от 54 до 68 кв. м. Хотите, подберу варианты по бюджету?",
+        "Здравствуйте! Подскажите, пожалуйста, для кого вы рассматриваете квартиру?",
+        "Сдача ЖК «7Я» запланирована на четвёртый квартал. Рассказать об условиях ипотеки?",
+        "Когда вам удобно созвониться с менеджером? Есть свободное время завтра в 12:00 и в 16:00.",
+        "Рядом с комплексом есть школа, детский сад и торговый центр.",
+    ],
+    fallback=lambda text: check_summary_llm(text) == "YES",
+)
+
+
+def check_summary(answer, message_id: Optional[str] = None):
+    return "YES" if classify("summary", answer if isinstance(answer, str) else str(answer), message_id) else "NO"
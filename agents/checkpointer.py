@@ -0,0 +1,132 @@
+"""
+Process-wide LangGraph checkpointer.
+
+All chats share one saver; threads are separated only by ``thread_id``.  With
+CHECKPOINTER == "sqlite" the checkpoints live in a local SQLite file (WAL mode),
+survive restarts, and a background compactor keeps only the last
+CHECKPOINT_KEEP_LAST checkpoints per thread so the file stays flat as chats grow.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from langgraph.checkpoint.memory import MemorySaver
+
+import config
+
+import logging
+logger = logging.getLogger(__name__)
+
+_checkpointer = None
+_lock = threading.Lock()
+
+
+_PRUNE_CHECKPOINTS_SQL = """
+DELETE FROM checkpoints WHERE rowid IN (
+    SELECT rowid FROM (
+        SELECT rowid, ROW_NUMBER() OVER (
+            PARTITION BY thread_id ORDER BY checkpoint_id DESC
+        ) AS rn
+        FROM checkpoints WHERE checkpoint_ns = ''
+    ) WHERE rn > ?
+)
+"""
+
+# subgraph namespaces are unique per run, so they are dropped once older than the kept root history
+_PRUNE_SUBGRAPHS_SQL = """
+DELETE FROM checkpoints WHERE checkpoint_ns != '' AND checkpoint_id < (
+    SELECT MIN(c.checkpoint_id) FROM checkpoints c
+    WHERE c.thread_id = checkpoints.thread_id AND c.checkpoint_ns = ''
+)
+"""
+
+_PRUNE_WRITES_SQL = """
+DELETE FROM writes WHERE NOT EXISTS (
+    SELECT 1 FROM checkpoints c
+    WHERE c.thread_id = writes.thread_id
+      AND c.checkpoint_ns = writes.checkpoint_ns
+      AND c.checkpoint_id = writes.checkpoint_id
+)
+"""
+
+
+def compact(saver, keep_last: int = config.CHECKPOINT_KEEP_LAST) -> int:
+    """Drop all but the newest *keep_last* checkpoints (and their pending writes) of every thread."""
+    # checkpoint ids are uuid6, so lexical order is creation order
+    with saver.lock:
+        cur = saver.conn.execute(_PRUNE_CHECKPOINTS_SQL, (keep_last,))
+        removed = cur.rowcount
+        removed += saver.conn.execute(_PRUNE_SUBGRAPHS_SQL).rowcount
+        saver.conn.execute(_PRUNE_WRITES_SQL)
+        saver.conn.commit()
+        saver.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return removed
+
+
+def _compaction_loop(saver, interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            removed = compact(saver)
+            if removed:
+                logger.info(f"Checkpoint compaction removed {removed} checkpoints")
+        except Exception as e:
+            logger.error(f"Checkpoint compaction failed: {e}")
+
+
+def _create_sqlite_saver():
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    class ThreadedSqliteSaver(SqliteSaver):
+        """
+        SqliteSaver that also serves the async API (astream / ainvoke of the bot).
+        The sync methods are already serialised by ``self.lock``, so the async ones
+        just run them in a worker thread instead of blocking the event loop.
+        """
+        async def aget_tuple(self, config):
+            return await asyncio.to_thread(self.get_tuple, config)
+
+        async def alist(self, config, *, filter=None, before=None, limit=None):
+            items = await asyncio.to_thread(
+                lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+            )
+            for item in items:
+                yield item
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id):
+            return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    os.makedirs(os.path.dirname(os.path.abspath(config.CHECKPOINT_DB_PATH)), exist_ok=True)
+    conn = sqlite3.connect(config.CHECKPOINT_DB_PATH, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    saver = ThreadedSqliteSaver(conn)
+    saver.setup()
+
+    if config.CHECKPOINT_COMPACT_INTERVAL > 0:
+        threading.Thread(
+            target=_compaction_loop,
+            args=(saver, config.CHECKPOINT_COMPACT_INTERVAL),
+            name="checkpoint-compactor",
+            daemon=True,
+        ).start()
+    logger.info(f"Using SQLite checkpointer at {config.CHECKPOINT_DB_PATH}")
+    return saver
+
+
+def get_checkpointer():
+    """Return the checkpointer shared by every graph compiled in this process."""
+    global _checkpointer
+    if _checkpointer is None:
+        with _lock:
+            if _checkpointer is None:
+                _checkpointer = _create_sqlite_saver() if config.CHECKPOINTER == "sqlite" else MemorySaver()
+    return _checkpointer
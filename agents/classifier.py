@@ -0,0 +1,158 @@
+"""
+Shared binary classifier for the per-turn checks of the graph
+("does the answer contain the final summary?").
+
+With CLASSIFIER_BACKEND == "embeddings" (the default) each task is a nearest-centroid
+classifier over sentence embeddings of a few seed examples, so a decision takes
+milliseconds.  When the margin between the two centroids is below the task's
+threshold, or the embedding model is not available, the task's LLM fallback decides.
+The threshold is measured when the centroids are built: the labelled examples of the
+task in classifier_labels.json are embedded and the threshold is set just above the
+largest margin of a misclassified one, so every labelled example the embeddings
+decide on their own is decided correctly.  A task without labelled examples always
+uses its fallback; CLASSIFIER_MIN_MARGIN overrides the measured value.  Results are
+cached by (task, message id), so a message is classified at most once however many
+conditions look at it.  benchmarks/classifier_eval.py prints the full margin sweep.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import config
+from utils.utils import get_embeddings
+
+import logging
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = 4096
+LABELS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "classifier_labels.json")
+
+
+@dataclass
+class ClassifierTask:
+    name: str
+    positives: List[str]
+    negatives: List[str]
+    fallback: Callable[[str], bool]
+    centroids: Optional[Tuple[np.ndarray, np.ndarray]] = field(default=None, repr=False)
+    min_margin: float = float("inf")
+
+
+_tasks: Dict[str, ClassifierTask] = {}
+_cache: "OrderedDict[Tuple[str, str], bool]" = OrderedDict()
+_lock = threading.Lock()
+_embeddings_failed = False
+
+
+def register_task(name: str, positives: List[str], negatives: List[str], fallback: Callable[[str], bool]) -> None:
+    _tasks[name] = ClassifierTask(name, positives, negatives, fallback)
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype="float32")
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True).clip(min=1e-12)
+
+
+def _embed(texts: List[str]) -> Optional[np.ndarray]:
+    global _embeddings_failed
+    if _embeddings_failed:
+        return None
+    try:
+        return _normalize(get_embeddings().embed_documents(texts))
+    except Exception as e:
+        # no local model (or no torch) on this host: all tasks use their LLM fallback
+        _embeddings_failed = True
+        logger.warning(f"Embedding classifier is unavailable, using LLM fallback: {e}")
+        return None
+
+
+def load_labels(path: str = LABELS_PATH) -> Dict[str, List[dict]]:
+    """{task: [{"text": ..., "label": bool}, ...]} of the labelled set."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Classifier labels {path} are not readable: {e}")
+        return {}
+
+
+def calibrate(margins: List[float], labels: List[bool]) -> float:
+    """Smallest threshold above which every labelled margin has the right sign (inf without labels)."""
+    if not margins:
+        return float("inf")
+    wrong = [abs(m) for m, y in zip(margins, labels) if (m > 0) != y]
+    return float(np.nextafter(max(wrong), np.inf)) if wrong else 0.0
+
+
+def _centroids(task: ClassifierTask) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    if task.centroids is None:
+        vectors = _embed(task.positives + task.negatives)
+        if vectors is None:
+            return None
+        split = len(task.positives)
+        centroids = (
+            _normalize(vectors[:split].mean(axis=0)),
+            _normalize(vectors[split:].mean(axis=0)),
+        )
+        examples = load_labels().get(task.name, [])
+        labelled = _embed([ex["text"] for ex in examples]) if examples else None
+        if labelled is not None:
+            margins = (labelled @ centroids[0] - labelled @ centroids[1]).tolist()
+            task.min_margin = calibrate(margins, [bool(ex["label"]) for ex in examples])
+            covered = sum(abs(m) >= task.min_margin for m in margins)
+            logger.info(f"Classifier '{task.name}': measured margin {task.min_margin:.4f}, "
+                        f"{covered}/{len(margins)} labelled examples decided without the LLM")
+        task.centroids = centroids
+    return task.centroids
+
+
+def min_margin(task_name: str) -> float:
+    """Threshold below which *task_name* asks its LLM fallback."""
+    if config.CLASSIFIER_MIN_MARGIN is not None:
+        return config.CLASSIFIER_MIN_MARGIN
+    return _tasks[task_name].min_margin
+
+
+def margin(task_name: str, text: str) -> Optional[float]:
+    """Similarity to the positive minus the negative centroid; None without embeddings."""
+    task = _tasks[task_name]
+    centroids = _centroids(task)
+    if centroids is None:
+        return None
+    vector = _embed([text])
+    if vector is None:
+        return None
+    return float(vector[0] @ centroids[0] - vector[0] @ centroids[1])
+
+
+def _predict(task: ClassifierTask, text: str) -> bool:
+    if config.CLASSIFIER_BACKEND == "embeddings":
+        value = margin(task.name, text)
+        if value is not None:
+            if abs(value) >= min_margin(task.name):
+                return value > 0
+            logger.debug(f"Classifier '{task.name}' is unsure (margin {value:.3f}), asking LLM")
+    return task.fallback(text)
+
+
+def classify(task_name: str, text: str, message_id: Optional[str] = None) -> bool:
+    """Binary decision of *task_name* for *text*, computed once per message."""
+    task = _tasks[task_name]
+    key = (task_name, message_id or hashlib.sha1(text.encode("utf-8")).hexdigest())
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    result = _predict(task, text)
+    with _lock:
+        _cache[key] = result
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -7,12 +7,15 @@ from agents.tools.tools import (get_list_of_complexes,
                    complexes
                    )
 import config
+from utils.blob_store import resolve_images_hook
+from utils.prompts import prompts, set_prompt_cache_key
 
 from langchain_gigachat import GigaChat
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
 
 agent_llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.3, frequency_penalty=0.6)
+set_prompt_cache_key(agent_llm, "completion_agent", "post_call_mode_prompt")
 #agent_llm = GigaChat(
 #            credentials=config.GIGA_CHAT_AUTH, 
 #            model="GigaChat-Pro",
@@ -20,18 +23,14 @@ agent_llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.3, frequency_penalty=
 #            temperature=0,
 #            scope = config.GIGA_CHAT_SCOPE)
 
-with open("prompts/post_call_mode_prompt.txt", encoding="utf-8") as f:
-    prompt_txt = f.read()
-
 #prompt = PromptTemplate.from_template(prompt_txt)
 #completion_agent = prompt | agent_llm
 
 completion_agent = create_react_agent(
     model=agent_llm,
     tools = [],
-    prompt=(
-        prompt_txt
-    ),
+    prompt=prompts.as_prompt("post_call_mode_prompt"),
+    pre_model_hook=resolve_images_hook,
     name="completion_agent",
     debug=config.DEBUG_WORKFLOW,
 )
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+Rule-based fast path in front of the supervisor.
+
+Short messages that are nothing but a greeting, thanks, a bare confirmation, a request
+for the list of complexes or a "start over" phrase are answered right here, without a
+call to the supervisor LLM.  Everything else goes on to compact_history -> supervisor.
+Hit rates are counted per intent, see ``fast_path_stats``; the bot exports them on the
+metrics endpoint as fast_path_* gauges (``collect_metrics``).
+"""
+import re
+import threading
+from typing import Dict, Literal, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages.modifier import RemoveMessage
+from langgraph.graph import END
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from langgraph.types import Command
+
+import config
+from agents.state.state import State
+from agents.tools.tools import get_list_of_complexes
+
+import logging
+logger = logging.getLogger(__name__)
+
+_TAIL = r"[\s!.,)]*"
+
+_GREETING_RE = re.compile(
+    r"^(здравствуйте|здравствуй|привет|добрый\s+(день|вечер)|доброе\s+утро|доброго\s+времени\s+суток|hello|hi)" + _TAIL + "$",
+    re.IGNORECASE)
+_THANKS_RE = re.compile(
+    r"^(спасибо|благодарю|спс|thanks|thank\s+you)(\s+(вам|большое|огромное|за\s+информацию|за\s+помощь))*" + _TAIL + "$",
+    re.IGNORECASE)
+_CONFIRM_RE = re.compile(
+    r"^(да|ок|окей|ok|хорошо|понятно|ясно|ага|угу|отлично|принято)" + _TAIL + "$",
+    re.IGNORECASE)
+_COMPLEX_LIST_RE = re.compile(
+    r"^(а\s+)?(какие|список|покажите|перечислите|в\s+каких)(\s+(у\s+вас|есть|вы))*"
+    r"\s+(жк|жилые\s+комплексы|комплексы|жилых\s+комплексах|объекты)"
+    r"(\s+(у\s+вас|есть|в\s+продаже|продаете|продаёте|строите|вы\s+предлагаете(\s+квартиры)?))*[\s?!.]*$",
+    re.IGNORECASE)
+_RESET_RE = re.compile(
+    r"^(давайте\s+|давай\s+)?(начн[её]м\s+(сначала|заново)|начать\s+(сначала|заново)|забудь(те)?\s+вс[её]|сброс(ить)?(\s+диалог)?)" + _TAIL + "$",
+    re.IGNORECASE)
+
+_GREETING_ANSWER = "Здравствуйте! Чем могу помочь? Расскажите, какую квартиру вы ищете."
+_THANKS_ANSWER = "Пожалуйста! Если появятся ещё вопросы — пишите, я на связи."
+_CONFIRM_ANSWER = "Хорошо! Если захотите узнать подробнее о квартирах или условиях покупки — просто напишите."
+_RESET_ANSWER = "Хорошо, начнём сначала. Что вас интересует?"
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, int] = {"total": 0}
+
+
+def fast_path_stats() -> Dict[str, object]:
+    """Counters of messages seen by the fast path and answered by each rule."""
+    with _stats_lock:
+        stats = dict(_stats)
+    hits = sum(v for k, v in stats.items() if k != "total")
+    return {
+        "total": stats["total"],
+        "hits": hits,
+        "hit_rate": hits / stats["total"] if stats["total"] else 0.0,
+        "by_intent": {k: v for k, v in stats.items() if k != "total"},
+    }
+
+
+def collect_metrics():
+    """fast_path_stats() as gauge samples for utils.instrumentation (MetricsRegistry.register_collector)."""
+    stats = fast_path_stats()
+    yield "fast_path_messages", {}, stats["total"]
+    yield "fast_path_hit_rate", {}, stats["hit_rate"]
+    for intent, hits in stats["by_intent"].items():
+        yield "fast_path_hits", {"intent": intent}, hits
+
+
+def _count(intent: Optional[str]) -> None:
+    with _stats_lock:
+        _stats["total"] += 1
+        if intent:
+            _stats[intent] = _stats.get(intent, 0) + 1
+
+
+def _format_complexes() -> str:
+    lines = []
+    for rec in get_list_of_complexes.invoke({}):
+        name = rec.get("name", "")
+        if rec.get("alternative_name"):
+            name = f"{name} ({rec['alternative_name']})"
+        details = ", ".join(str(rec[k]) for k in ("district", "ready_date", "comfort_level") if rec.get(k))
+        lines.append(f"• {name}" + (f" — {details}" if details else ""))
+    return "Сейчас в продаже квартиры в жилых комплексах:\n" + "\n".join(lines) + \
+        "\n\nО каком комплексе рассказать подробнее?"
+
+
+def _last_ai_closed(state: State) -> bool:
+    """The previous assistant turn was one of the closing replies below, i.e. certainly not waiting for a yes."""
+    for msg in reversed(state["messages"][:-1]):
+        if isinstance(msg, AIMessage) and isinstance(msg.content, str) and msg.content.strip():
+            return msg.content.strip() in (_THANKS_ANSWER, _CONFIRM_ANSWER)
+    return False
+
+
+def match_intent(state: State) -> Optional[str]:
+    msg = state["messages"][-1]
+    if not isinstance(msg.content, list) or len(msg.content) != 1 or msg.content[0].get("type") != "text":
+        return None
+    text = msg.content[0].get("text", "").strip()
+    if not text or len(text) > config.FAST_PATH_MAX_CHARS:
+        return None
+    if _RESET_RE.match(text):
+        return "reset"
+    if _GREETING_RE.match(text):
+        return "greeting"
+    if _THANKS_RE.match(text):
+        return "thanks"
+    if _COMPLEX_LIST_RE.match(text):
+        return "complex_list"
+    # "да" is usually the answer to something the assistant offered or asked (with or
+    # without a "?"), only an acknowledgement of a closing reply is safe to answer here
+    if _CONFIRM_RE.match(text) and _last_ai_closed(state):
+        return "confirmation"
+    return None
+
+
+def fast_path(state: State) -> Command[Literal["compact_history", "__end__"]]:
+    intent = match_intent(state) if config.FAST_PATH_ENABLED else None
+    _count(intent)
+    if intent is None:
+        return Command(goto="compact_history")
+
+    logger.info(f"Fast path answered intent '{intent}'")
+    if intent == "reset":
+        return Command(
+            goto=END,
+            update={
+                "messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), AIMessage(content=_RESET_ANSWER)],
+                "dialog_state": "started",
+                "summary": "",
+            },
+        )
+    answer = {
+        "greeting": _GREETING_ANSWER,
+        "thanks": _THANKS_ANSWER,
+        "confirmation": _CONFIRM_ANSWER,
+    }.get(intent) or _format_complexes()
+    return Command(goto=END, update={"messages": [AIMessage(content=answer)]})
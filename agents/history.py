@@ -0,0 +1,115 @@
+"""
+History compaction in front of the supervisor.
+
+Before each supervisor turn:
+  * tool / handoff chatter of previous turns is dropped (it has already been
+    turned into the agents' answers);
+  * once more than HISTORY_KEEP_TURNS + HISTORY_COMPACT_CHUNK turns have piled up
+    (or HISTORY_TOKEN_BUDGET is exceeded), everything but the last HISTORY_KEEP_TURNS
+    turns is folded into a running summary kept in state["summary"] and shown to the
+    model as one SystemMessage at the top of the history.
+So the prompt stays bounded on long conversations.  Folding in chunks means the
+summary LLM call runs once every HISTORY_COMPACT_CHUNK turns rather than on every
+turn, and between two folds the head of the prompt (summary + older turns) stays
+byte-identical, so the provider's prompt cache keeps hitting on it.  Between folds only
+the dropped chatter is removed (RemoveMessage by id); the whole list is rewritten only
+when a fold puts a new summary on top.  The summary call is bounded by
+HISTORY_SUMMARY_TIMEOUT; if it fails, the history is kept as it is and the fold is
+retried on the next turn.
+"""
+from typing import List
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.modifier import RemoveMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from langchain_openai import ChatOpenAI
+
+import config
+from agents.state.state import State
+
+import logging
+logger = logging.getLogger(__name__)
+
+SUMMARY_MESSAGE_ID = "history_summary"
+
+summary_llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0, timeout=config.HISTORY_SUMMARY_TIMEOUT, max_retries=1)
+
+
+def _is_chatter(msg: AnyMessage) -> bool:
+    if isinstance(msg, ToolMessage):
+        return True
+    if isinstance(msg, AIMessage):
+        return bool(msg.tool_calls) or bool(msg.response_metadata.get("__is_handoff_back"))
+    return False
+
+
+def _text(msg: AnyMessage) -> str:
+    if isinstance(msg.content, str):
+        return msg.content
+    return " ".join(part.get("text", "") for part in msg.content if isinstance(part, dict))
+
+
+def _split_turns(messages: List[AnyMessage]) -> List[List[AnyMessage]]:
+    turns: List[List[AnyMessage]] = []
+    for msg in messages:
+        if isinstance(msg, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(msg)
+    return turns
+
+
+def summarise(previous: str, messages: List[AnyMessage]) -> str:
+    dialog = "\n".join(
+        f"{'Клиент' if isinstance(m, HumanMessage) else 'Ассистент'}: {_text(m)}"
+        for m in messages if _text(m).strip()
+    )
+    prompt = (
+        "Ты ведёшь краткую сводку разговора консультанта по недвижимости с клиентом.\n"
+        "Обнови сводку, добавив в неё новые реплики. Сохрани все факты о клиенте (имя, семья, цель покупки, бюджет, "
+        "число комнат, интересующие ЖК и условия, договорённости о звонке) и ответы, которые уже дал консультант. "
+        "Пиши сжато, без вступлений.\n\n"
+        f"Текущая сводка:\n{previous or '(пусто)'}\n\n"
+        f"Новые реплики:\n{dialog}\n\n"
+        "Обновлённая сводка:"
+    )
+    return summary_llm.invoke(prompt).content.strip()
+
+
+def compact_history(state: State) -> State:
+    messages = state["messages"]
+    current, history = messages[-1], messages[:-1]
+    history = [m for m in history if m.id != SUMMARY_MESSAGE_ID]
+    cleaned = [m for m in history if not _is_chatter(m)]
+
+    turns = _split_turns(cleaned)
+    keep_count = max(config.HISTORY_KEEP_TURNS, 1)
+    over_budget = count_tokens_approximately(cleaned + [current]) > config.HISTORY_TOKEN_BUDGET
+    old, keep = [], turns
+    if over_budget or len(turns) > keep_count + max(config.HISTORY_COMPACT_CHUNK, 0):
+        old, keep = turns[:-keep_count], turns[-keep_count:]
+        # over the token budget: fold down to half of it so the next fold is not due on the next turn
+        target = config.HISTORY_TOKEN_BUDGET // 2 if over_budget else config.HISTORY_TOKEN_BUDGET
+        while len(keep) > 1 and count_tokens_approximately([m for t in keep for m in t] + [current]) > target:
+            old.append(keep.pop(0))
+
+    dropped = [RemoveMessage(id=m.id) for m in history if _is_chatter(m)]
+    if old:
+        try:
+            summary = summarise(state.get("summary", ""), [m for t in old for m in t])
+        except Exception as e:
+            logger.warning(f"History summary failed, keeping the full history for now: {e}")
+            old = []
+    if not old:
+        return {"messages": dropped} if dropped else {}
+
+    logger.info(f"Compacted {sum(len(t) for t in old)} messages into the running summary")
+    new_messages: List[AnyMessage] = [
+        RemoveMessage(id=REMOVE_ALL_MESSAGES),
+        SystemMessage(
+            id=SUMMARY_MESSAGE_ID,
+            content=f"Краткое содержание предыдущей части разговора с клиентом:\n{summary}",
+        ),
+    ]
+    new_messages += [m for t in keep for m in t] + [current]
+    return {"messages": new_messages, "summary": summary}
@@ -4,16 +4,20 @@ from v01.retriever import search_kb
 from agents.tools.tools import (get_list_of_complexes,
                    get_developer_info,
                    get_complex_info,
+                   get_complex_info_batch,
                    complexes
                    )
 import config
+from utils.prompts import set_prompt_cache_key
 
 from langchain_gigachat import GigaChat
 from langchain_openai import ChatOpenAI
 
+# part of the static system prompt: built once, in the order of the complexes file
 complexes_names = "',".join([f"{name['name']} (aka {name['alternative_name']})" for name in sub_dict(complexes, ["name", "alternative_name"])])
 
 agent_llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0)
+set_prompt_cache_key(agent_llm, "kb_agent")
 #agent_llm = GigaChat(
 #            credentials=config.GIGA_CHAT_AUTH, 
 #            model="GigaChat-Pro",
@@ -23,7 +27,7 @@ agent_llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0)
 
 kb_agent = create_react_agent(
     model=agent_llm, #"openai:gpt-4.1-mini",
-    tools=[get_list_of_complexes, get_developer_info, get_complex_info],# search_kb],
+    tools=[get_list_of_complexes, get_developer_info, get_complex_info, get_complex_info_batch],# search_kb],
     prompt=(
         "You are an agent retrieving information about building complexes. "
         "You can return information about (1) building complexes available for sales; (2) developers; (3) facilities available for the complex; (4) financial conditions like loan availability, discounts and so on.\n"
@@ -32,6 +36,8 @@ kb_agent = create_react_agent(
         "INSTRUCTIONS:\n"
         f"- Assist ONLY with tasks related to retrieval information about building complexes {complexes_names}\n"
         "- Do not answer questions related to pricing and details of flats available within building complexes\n"
+        "- When calling get_complex_info always pass the user question as `question` to get only relevant paragraphs\n"
+        "- If the task concerns several complexes or topics, use ONE get_complex_info_batch call instead of several get_complex_info calls\n"
         "- IMPORTANT: Always provide ONLY information returned by your tools. YOU ARE PROHIBITED to make up information!\n"
         "- If information provided by your tools does not contain information requested by user, answer that you do not hold this information.\n"
         "- After you're done with your tasks, respond to the supervisor directly\n"
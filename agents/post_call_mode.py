@@ -1,11 +1,12 @@
 # agents/post_call_mode.py
 
-from pathlib import Path
 from typing import Any, Dict
 
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from langchain_openai import ChatOpenAI
 
+from utils.prompts import prompts
+
 # ─────────────────────────────────────────────────────────────────────
 # Здесь создаём свои LLM-инстансы для работы внутри post_call_mode:
 # 1) classifier_llm — с temperature=0.0, чтобы надёжно распознавать «хочет ли клиент изменить звонок»
@@ -90,17 +91,13 @@ def cancel_post_call_condition(state: Dict[str, Any]) -> bool:
 def post_call_mode_handler(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Генерирует ответ в режиме «после согласования звонка»:
-      1) Считывает системный промпт из prompts/post_call_mode_prompt.txt.
+      1) Берёт системный промпт post_call_mode_prompt из реестра промптов.
       2) Отбирает из state["messages"]:
          а) все HumanMessage (сообщения от клиента),
          б) только те AIMessage, которые пришли от «supervisor» (без инструментов и без других агентов).
       3) Собирает цепочку: [SystemMessage(пост-звонковый-промпт), ...filtered_messages...]
       4) Вызывает response_llm и возвращает единственный AIMessage.
     """
-    # 1. Считываем системный промпт
-    prompt_path = Path("prompts/post_call_mode_prompt.txt")
-    prompt_txt = prompt_path.read_text(encoding="utf-8")
-
     # 2. Отбираем только нужные сообщения: HumanMessage и AIMessage одной «команды» (supervisor)
     filtered_messages = []
     for msg in state["messages"]:
@@ -118,9 +115,8 @@ def post_call_mode_handler(state: Dict[str, Any]) -> Dict[str, Any]:
             if tool_flag is None and (agent_flag is None or agent_flag == "supervisor"):
                 filtered_messages.append(msg)
 
-    # 3. Собираем цепочку для response_llm
-    llm_messages = [SystemMessage(content=prompt_txt)]
-    llm_messages.extend(iter(filtered_messages))
+    # 3. Собираем цепочку для response_llm (шаблон уже скомпилирован в реестре)
+    llm_messages = prompts.template("post_call_mode_prompt").invoke({"messages": filtered_messages}).to_messages()
     # 4. Запрашиваем ответ от response_llm
     response = response_llm(messages=llm_messages)
 
@@ -4,7 +4,7 @@ import config
 
 from langchain_openai import ChatOpenAI
 from langchain.chat_models import init_chat_model
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_community.tools.sql_database.tool import QuerySQLDatabaseTool
 from langchain_community.utilities import SQLDatabase
 
@@ -75,8 +75,15 @@ Only use the following tables:
 
 user_prompt = "Question: {input}"
 
-query_prompt_template = ChatPromptTemplate(
-    [("system", system_message), ("user", user_prompt)]
+# static instructions first, the question / query / rows of the call after them
+answer_instructions = (
+    "Given the following user question, corresponding SQL query, "
+    "and SQL result, provide relevant information from database.\n"
+    "If result is empty inform user that there are no records meeting given criteria.\n"
+    "Respond with list of flats satisfying criteria\n"
+    "Include into response all fields, except technical\n"
+    "Include into response price_value, rooms, area_total, renovation and add other fields requested by user\n"
+    "Do not include into response any technical fields (for example:ID)."
 )
 
 class QueryOutput(TypedDict):
@@ -95,57 +102,63 @@ def create_flat_info_retriever(complex_id: str):
     elif complex_id == "andersen":
         db = db_andersen
 
+    if db.name == "vesna":
+        top_k = 3
+        return_condition = ("\nInclude only 3 cheapest flats.\n"
+                            "Do not include into result rows where price_value IS NULL OR rooms IS NULL OR area_total IS NULL OR renovation IS NULL."
+                            )
+        #return_condition = ("\nWrite a SQLite query to retrieve three records with cherapest flats:\n"
+        #    "1. The cheapest entry.\n"
+        #    "2. The most expensive entry.\n"
+        #    "Combine the results using UNION ALL so that both rows are returned together.\n"
+        #    "**Important:** Ensure each part of the UNION uses a subquery or appropriate SQLite syntax, since each SELECT uses ORDER BY with LIMIT. Use aliases for any subqueries as needed. Provide the final SQL query only, no explanations.")
+
+    else:
+        top_k = 2
+        return_condition = ("\nInclude (1 cheapest flat and 1 most expensive flat with renovation == 'черновая отделка') and (1 cheapest flat and 1 most expensive flat with renovation == 'под ключ') ."
+            "Combine the results using UNION ALL so that both rows are returned together.\n"
+            "\nDo not include into result rows where price_value IS NULL OR rooms IS NULL OR area_total IS NULL OR renovation IS NULL.\n"
+            "**Important:** Ensure each part of the UNION uses a subquery or appropriate SQLite syntax, since each SELECT uses ORDER BY with LIMIT. Use aliases for any subqueries as needed. Provide the final SQL query only, no explanations.\n"
+            "Example properly formatted query with union:\n"
+            "  SELECT internal_id, price_value, rooms\n"
+            "    FROM (\n"
+            "    SELECT internal_id, price_value, rooms\n"
+            "        FROM Properties\n"
+            "        ORDER BY price_value ASC\n"
+            "        LIMIT 1\n"
+            "    ) AS cheapest\n"
+            "    UNION ALL\n"
+            "    SELECT internal_id, price_value, rooms\n"
+            "    FROM (\n"
+            "        SELECT internal_id, price_value, rooms\n"
+            "        FROM Properties\n"
+            "        ORDER BY price_value DESC\n"
+            "        LIMIT 1\n"
+            "    ) AS most_expensive;"
+            )
+        #return_condition = ("\nWrite a SQLite query to retrieve two records:\n"
+        #    "1. The cheapest flat.\n"
+        #    "2. The most expensive flat.\n"
+        #    "Combine the results using UNION ALL so that both rows are returned together.\n"
+        #    "**Important:** Ensure each part of the UNION uses a subquery or appropriate SQLite syntax, since each SELECT uses ORDER BY with LIMIT. Use aliases for any subqueries as needed. Provide the final SQL query only, no explanations.")
+
+    query_system = None
+
+    def query_system_prompt() -> SystemMessage:
+        # static prefix shared by write_query and fix_query (rules + schema), rendered once per complex
+        nonlocal query_system
+        if query_system is None:
+            query_system = SystemMessage(content=system_message.format(
+                dialect=db.dialect,
+                top_k=top_k,
+                table_info=db.get_table_info(),
+                return_condition=return_condition,
+            ))
+        return query_system
+
     def write_query(state: State):
         """Generate SQL query to fetch information."""
-        if db.name == "vesna":
-            top_k = 3
-            return_condition = ("\nInclude only 3 cheapest flats.\n"
-                                "Do not include into result rows where price_value IS NULL OR rooms IS NULL OR area_total IS NULL OR renovation IS NULL."
-                                )
-            #return_condition = ("\nWrite a SQLite query to retrieve three records with cherapest flats:\n"
-            #    "1. The cheapest entry.\n"
-            #    "2. The most expensive entry.\n"
-            #    "Combine the results using UNION ALL so that both rows are returned together.\n"
-            #    "**Important:** Ensure each part of the UNION uses a subquery or appropriate SQLite syntax, since each SELECT uses ORDER BY with LIMIT. Use aliases for any subqueries as needed. Provide the final SQL query only, no explanations.")
-
-        else:
-            top_k = 2
-            return_condition = ("\nInclude (1 cheapest flat and 1 most expensive flat with renovation == 'черновая отделка') and (1 cheapest flat and 1 most expensive flat with renovation == 'под ключ') ."
-                "Combine the results using UNION ALL so that both rows are returned together.\n"
-                "\nDo not include into result rows where price_value IS NULL OR rooms IS NULL OR area_total IS NULL OR renovation IS NULL.\n"
-                "**Important:** Ensure each part of the UNION uses a subquery or appropriate SQLite syntax, since each SELECT uses ORDER BY with LIMIT. Use aliases for any subqueries as needed. Provide the final SQL query only, no explanations.\n"
-                "Example properly formatted query with union:\n"
-                "  SELECT internal_id, price_value, rooms\n"
-                "    FROM (\n"
-                "    SELECT internal_id, price_value, rooms\n"
-                "        FROM Properties\n"
-                "        ORDER BY price_value ASC\n"
-                "        LIMIT 1\n"
-                "    ) AS cheapest\n"
-                "    UNION ALL\n"
-                "    SELECT internal_id, price_value, rooms\n"
-                "    FROM (\n"
-                "        SELECT internal_id, price_value, rooms\n"
-                "        FROM Properties\n"
-                "        ORDER BY price_value DESC\n"
-                "        LIMIT 1\n"
-                "    ) AS most_expensive;"
-                )
-            #return_condition = ("\nWrite a SQLite query to retrieve two records:\n"
-            #    "1. The cheapest flat.\n"
-            #    "2. The most expensive flat.\n"
-            #    "Combine the results using UNION ALL so that both rows are returned together.\n"
-            #    "**Important:** Ensure each part of the UNION uses a subquery or appropriate SQLite syntax, since each SELECT uses ORDER BY with LIMIT. Use aliases for any subqueries as needed. Provide the final SQL query only, no explanations.")
-
-        prompt = query_prompt_template.invoke(
-            {
-                "dialect": db.dialect,
-                "top_k": top_k,
-                "table_info": db.get_table_info(),
-                "input": state["question"],
-                "return_condition": return_condition
-            }
-        )
+        prompt = [query_system_prompt(), HumanMessage(content=user_prompt.format(input=state["question"]))]
         structured_llm = llm_query_gen.with_structured_output(QueryOutput)
         result = structured_llm.invoke(prompt)
         return {"query": result["query"]}
@@ -155,12 +168,16 @@ def create_flat_info_retriever(complex_id: str):
         The previous SQL failed.  Regenerate a new query
         taking the DB error into account.
         """
-        prompt = (
-            f"The following SQL produced an error:\n\n{state['query']}\n\n"
-            f"Database error:\n{state['error']}\n\n"
-            "Rewrite *only* the SQL so it will execute successfully, following "
-            "the same column-name and WHERE-clause rules you already know."
-        )
+        prompt = [
+            query_system_prompt(),
+            HumanMessage(content=(
+                f"{user_prompt.format(input=state['question'])}\n\n"
+                f"The following SQL produced an error:\n\n{state['query']}\n\n"
+                f"Database error:\n{state['error']}\n\n"
+                "Rewrite *only* the SQL so it will execute successfully, following "
+                "the same column-name and WHERE-clause rules."
+            )),
+        ]
 
         structured_llm = llm_query_gen.with_structured_output(QueryOutput)
         new_query = structured_llm.invoke(prompt)["query"]
@@ -194,18 +211,14 @@ def create_flat_info_retriever(complex_id: str):
 
     def generate_answer(state: State):
         """Answer question using retrieved information as context."""
-        prompt = (
-            "Given the following user question, corresponding SQL query, "
-            "and SQL result, provide relevant information from database.\n"
-            "If result is empty inform user that there are no records meeting given criteria.\n"
-            "Respond with list of flats satisfying criteria\n"
-            "Include into response all fields, except technical\n"
-            "Include into response price_value, rooms, area_total, renovation and add other fields requested by user\n"
-            "Do not include into response any technical fields (for example:ID).\n\n"
-            f'Question: {state["question"]}\n'
-            f'SQL Query: {state["query"]}\n'
-            f'SQL Result: {state["result"]}'
-        )
+        prompt = [
+            SystemMessage(content=answer_instructions),
+            HumanMessage(content=(
+                f'Question: {state["question"]}\n'
+                f'SQL Query: {state["query"]}\n'
+                f'SQL Result: {state["result"]}'
+            )),
+        ]
         result = agent_llm.invoke(prompt)
         answer = result.content
         return {"result": answer, "messages": [{"role": "assistant", "content": answer}]}
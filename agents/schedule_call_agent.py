@@ -140,10 +140,12 @@ from langchain_core.messages import HumanMessage, AIMessage
 from langchain_openai import ChatOpenAI
 
 import config
+from utils.prompts import set_prompt_cache_key
 
 
 
 agent_llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0)
+set_prompt_cache_key(agent_llm, "schedule_call_agent")
 schedule_call = scheduler_factory("manager_config.json")
 
 schedule_call_agent = create_react_agent(
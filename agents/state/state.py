@@ -1,17 +1,6 @@
 from typing import Annotated
 from typing_extensions import TypedDict
-from langgraph.graph.message import AnyMessage, add_messages, Messages
-
-
-def add_messages_no_img(msgs1: Messages, msgs2: Messages) -> Messages:
-    # Need to clean up all user messages excepting the last message with type "human" (after which can follow messages with other types)
-    msgs = [msg for msg in msgs1 if msg.type == "human"][::-1]
-    if len(msgs) > 1:
-        msg = msgs[1]
-        cleaned_content = [content for content in msg.content if content.get("type", "") != "image_url"]
-        msg.content = cleaned_content
-
-    return add_messages(msgs1, msgs2)
+from langgraph.graph.message import AnyMessage, add_messages
 
 
 class UserInfo(TypedDict):
@@ -43,7 +32,9 @@ class CustomerCtx(TypedDict):
 
 
 class State(TypedDict):
-    messages: Annotated[list[AnyMessage], add_messages_no_img]
+    # images enter as blob references (utils/blob_store.py), put into the store before the message
+    # reaches the graph; the reducer stays pure because checkpoint replays and subgraph merges re-run it
+    messages: Annotated[list[AnyMessage], add_messages]
     user_info: UserInfo
     
     dialog_state: Optional[str]
@@ -51,6 +42,8 @@ class State(TypedDict):
     need_intro: Optional[bool]
     intro: Optional[str]
 
+    summary: NotRequired[str]       # running summary of compacted history
+
     is_scheduled: bool              
     scheduled_time: NotRequired[str]
     scheduled_complex: NotRequired[str]
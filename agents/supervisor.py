@@ -2,13 +2,15 @@
 import uuid
 import os
 import datetime
+import threading
 
-os.environ["LANGCHAIN_ENDPOINT"]="https://api.smith.langchain.com"
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
+# LangSmith tracing stays on by default but can be switched off from the environment;
+# local metrics come from utils.instrumentation
+os.environ.setdefault("LANGCHAIN_ENDPOINT", "https://api.smith.langchain.com")
+os.environ.setdefault("LANGCHAIN_TRACING_V2", "true")
 
 from utils.utils import ModelType
 
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, StateGraph, START
 from langgraph.prebuilt import tools_condition
 from langchain_core.messages import AIMessage
@@ -17,6 +19,9 @@ from langchain_core.messages.modifier import RemoveMessage
 
 from agents.state.state import State
 from agents.user_info import user_info
+from agents.checkpointer import get_checkpointer
+from agents.history import compact_history
+from agents.fast_path import fast_path
 
 import config
 
@@ -28,6 +33,9 @@ from agents.tools.supervisor_tools import create_handoff_tool_no_history
 from agents.tools.tools import complexes
 
 from utils.utils import sub_dict
+from utils.blob_store import resolve_images_hook
+from utils.instrumentation import get_metrics_handler
+from utils.prompts import prompts, set_prompt_cache_key
 from agents.answers_checker import check_summary
 
 from langgraph_supervisor import create_supervisor
@@ -38,6 +46,8 @@ from langchain_openai import ChatOpenAI
 COMPLEX_LIST = sub_dict(complexes, ["id", "name", "alternative_name", "district", "ready_date", "number_of_houses", "comfort_level"])
 
 agent_llm = ChatOpenAI(model="gpt-4.1", temperature=1)
+# static prefix: system prompt + complex list, tool schemas; the dialog follows
+set_prompt_cache_key(agent_llm, "supervisor", "working_prompt_super")
 #agent_llm = ChatMistralAI(model="mistral-large-latest", temperature=1, frequency_penalty=0.3)
 
 #agent_llm = GigaChat(
@@ -48,6 +58,17 @@ agent_llm = ChatOpenAI(model="gpt-4.1", temperature=1)
 #            scope = config.GIGA_CHAT_SCOPE)
 
 
+SUPERVISOR_NAME = "neuro7"
+# agents whose LLM output is the user-facing answer (outer node name or supervisor agent name)
+ANSWERING_AGENTS = {SUPERVISOR_NAME, "completion"}
+
+def is_answer_token(metadata: dict) -> bool:
+    """True if a stream_mode="messages" chunk comes from an LLM call that answers the user."""
+    ns = metadata.get("langgraph_checkpoint_ns") or metadata.get("checkpoint_ns") or ""
+    names = {segment.split(":")[0] for segment in ns.split("|")}
+    # sub-agents (kb_agent, *_flat_info_retriever, ...) are siblings of the supervisor agent, not nested in it
+    return metadata.get("langgraph_node") == "agent" and not names.isdisjoint(ANSWERING_AGENTS)
+
 def reset_memory(state: State) -> State:
     """
     Delete every message currently stored in the thread’s state.
@@ -56,7 +77,8 @@ def reset_memory(state: State) -> State:
     # Returning RemoveMessage instances instructs the reducer to delete them
     return {
         "messages": [RemoveMessage(id=mid) for mid in all_msg_ids],
-        "dialog_state": "started"
+        "dialog_state": "started",
+        "summary": ""
     }
 
 def route_agent(state: State) -> str:
@@ -71,12 +93,12 @@ def route_agent(state: State) -> str:
     user_messages = [msg for msg in messages if hasattr(msg, 'type') and msg.type == 'human']
     
     # Представляемся только при первом сообщении пользователя и если еще не представлялись
-    if need_intro and len(user_messages) == 1:
+    if need_intro and len(user_messages) == 1 and not state.get("summary"):
         return "introduce_and_respond"
     elif state.get("dialog_state", "supervisor") == "completion":
         return "completion"
     else:
-        return "supervisor"
+        return "fast_path"
     
 def introduce_and_respond(state: State) -> State:
     """
@@ -84,11 +106,9 @@ def introduce_and_respond(state: State) -> State:
     Этот узел вызывается только один раз - при самом первом сообщении.
     """
 
-    with open("prompts/welcome_prompt.txt", encoding="utf-8") as f:
-        prompt_txt = f.read()
     # Первичное представление + ответ на вопрос пользователя
     intro_message = AIMessage(
-        content=prompt_txt
+        content=prompts.text("welcome_prompt")
     )
     
     # Устанавливаем флаг, что представление состоялось
@@ -101,7 +121,7 @@ def introduce_and_respond(state: State) -> State:
 
 def check_supervisor_answer(state: State) -> State:
     messages = state["messages"]
-    isSummarised = check_summary(messages[-1].content)
+    isSummarised = check_summary(messages[-1].content, messages[-1].id)
     dialog_state = "completion" if isSummarised == "YES" else "supervisor"
     return {
         "dialog_state": dialog_state
@@ -144,30 +164,28 @@ def initialize_agent(model: ModelType = ModelType.GPT):
         #get_flats_info_for_complex
     ]
 
-    with open("prompts/working_prompt_super.txt", encoding="utf-8") as f:
-        prompt_txt = f.read()
-    prompt_txt = f"{prompt_txt}\nСписок жилых комплексов: {COMPLEX_LIST}\n\n"
-
     supervisor_agent = create_supervisor(
         model=agent_llm, #init_chat_model("openai:gpt-4.1"),
         agents=[kb_agent, schedule_call_agent, db_vesna, db_andersen, db_7ya],
         #agents=[kb_agent, contact_agent],
-        prompt=prompt_txt,
+        prompt=prompts.as_prompt("working_prompt_super", f"\nСписок жилых комплексов: {COMPLEX_LIST}\n\n"),
         tools=ho_tools,
         add_handoff_messages=False,
         add_handoff_back_messages=True,
         output_mode="last_message",
         parallel_tool_calls=False,
-        supervisor_name="neuro7"
-    ).compile(name="neuro7", debug = config.DEBUG_WORKFLOW)
+        pre_model_hook=resolve_images_hook,
+        supervisor_name=SUPERVISOR_NAME
+    ).compile(name=SUPERVISOR_NAME, debug = config.DEBUG_WORKFLOW)
 
-    memory = MemorySaver()
     return (
         StateGraph(State)
         .add_node("fetch_user_info", user_info)
         #.add_node("intent_extract", update_customer_ctx)
         .add_node("reset_memory", reset_memory)
         .add_node("introduce_and_respond", introduce_and_respond)
+        .add_node("fast_path", fast_path)
+        .add_node("compact_history", compact_history)
         .add_node("supervisor", supervisor_agent)
         .add_node("completion", completion_agent)
         .add_node("check_supervisor_answer", check_supervisor_answer)
@@ -179,10 +197,29 @@ def initialize_agent(model: ModelType = ModelType.GPT):
 
         .add_edge("reset_memory", END)
         .add_edge("introduce_and_respond", "supervisor")
+        .add_edge("compact_history", "supervisor")
         .add_edge("supervisor", "check_supervisor_answer")
-    ).compile(checkpointer=memory, debug=config.DEBUG_WORKFLOW)
+    ).compile(checkpointer=get_checkpointer(), debug=config.DEBUG_WORKFLOW)
+
 
 
+_compiled_agents: dict[ModelType, object] = {}
+_compiled_agents_lock = threading.Lock()
+
+def get_agent(model: ModelType = ModelType.GPT):
+    """
+    Compiled graph shared by all chats of this process.
+    Conversations are isolated only by thread_id in the shared checkpointer.
+    """
+    if (agent := _compiled_agents.get(model)) is None:
+        with _compiled_agents_lock:
+            if (agent := _compiled_agents.get(model)) is None:
+                agent = initialize_agent(model)
+                if config.INSTRUMENTATION_ENABLED:
+                    agent = agent.with_config(callbacks=[get_metrics_handler()])
+                _compiled_agents[model] = agent
+    return agent
+
 
 if __name__ == "__main__":
     agent = initialize_agent(model=ModelType.GPT)
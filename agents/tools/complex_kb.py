@@ -0,0 +1,204 @@
+"""
+Paragraph-level index over data/residential_complexes.json.
+
+Every long text section of a complex (general_info, features, financial_conditions, ...)
+is split into addressable paragraphs ("<complex_id>.<field>.<n>") indexed both by
+keywords and, when the embedding model is available, by embeddings.  Tools return
+only the paragraphs relevant to the question instead of whole text blobs: ``fields``
+restricts the search to the requested text fields (None — all of them, an empty list —
+no text at all), and paragraphs longer than SNIPPET_MAX_CHARS are cut to the passages
+matching the question (semantic windows with embeddings, keyword-scored sentences without).
+"""
+from __future__ import annotations
+
+import math
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+import config
+from utils.utils import get_embeddings
+from utils.snippets import snippet_index
+
+import logging
+logger = logging.getLogger(__name__)
+
+TEXT_FIELDS = ("general_info", "features", "financial_conditions", "managers_info", "presentation")
+
+# short lines (headings, one-word bullets) are glued to the following line
+MIN_PARAGRAPH_CHARS = 60
+# weight of the embedding score versus the keyword score
+EMBEDDING_WEIGHT = 0.6
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SENTENCE_RE = re.compile(r"[^\n.!?]+[.!?]*")
+
+
+def _terms(text: str) -> set[str]:
+    # crude prefix stemming is good enough for Russian inflections ("ипотеку" → "ипоте")
+    return {w[:5] for w in _WORD_RE.findall(text.lower()) if len(w) > 2}
+
+
+@dataclass(slots=True, frozen=True)
+class Paragraph:
+    complex_id: str
+    field: str
+    idx: int
+    text: str
+
+    @property
+    def address(self) -> str:
+        return f"{self.complex_id}.{self.field}.{self.idx}"
+
+
+def split_paragraphs(text: str) -> List[str]:
+    paragraphs, pending = [], ""
+    for line in (ln.strip() for ln in text.splitlines()):
+        if not line:
+            continue
+        pending = f"{pending}\n{line}" if pending else line
+        if len(pending) >= MIN_PARAGRAPH_CHARS:
+            paragraphs.append(pending)
+            pending = ""
+    if pending:
+        if paragraphs:
+            paragraphs[-1] = f"{paragraphs[-1]}\n{pending}"
+        else:
+            paragraphs.append(pending)
+    return paragraphs
+
+
+class ComplexKnowledgeStore:
+    def __init__(self, complexes: Iterable[dict], use_embeddings: bool = True):
+        self.paragraphs: List[Paragraph] = []
+        self._by_complex: Dict[str, List[int]] = defaultdict(list)
+        self._inverted: Dict[str, set[int]] = defaultdict(set)
+        for rec in complexes:
+            for field in TEXT_FIELDS:
+                for idx, text in enumerate(split_paragraphs(rec.get(field) or "")):
+                    pos = len(self.paragraphs)
+                    self.paragraphs.append(Paragraph(rec["id"], field, idx, text))
+                    self._by_complex[rec["id"]].append(pos)
+                    for term in _terms(text):
+                        self._inverted[term].add(pos)
+        n = max(len(self.paragraphs), 1)
+        self._idf = {t: math.log(1 + n / len(ps)) for t, ps in self._inverted.items()}
+
+        self._use_embeddings = use_embeddings
+        self._vectors: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    # ───────── embeddings (lazy) ───────── #
+    def _embedding_matrix(self) -> Optional[np.ndarray]:
+        if not self._use_embeddings:
+            return None
+        with self._lock:
+            if self._vectors is None:
+                try:
+                    vectors = np.asarray(
+                        get_embeddings().embed_documents([p.text for p in self.paragraphs]), dtype=np.float32
+                    )
+                    self._vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+                except Exception as e:
+                    logger.warning(f"Complex KB embeddings unavailable, using keywords only: {e}")
+                    self._use_embeddings = False
+                    return None
+            return self._vectors
+
+    def _embed_queries(self, questions: List[str]) -> Optional[np.ndarray]:
+        if self._embedding_matrix() is None:
+            return None
+        q = np.asarray(get_embeddings().embed_documents(questions), dtype=np.float32)
+        return q / np.linalg.norm(q, axis=1, keepdims=True).clip(min=1e-12)
+
+    # ───────── scoring ───────── #
+    def _keyword_scores(self, question: str, candidates: List[int]) -> np.ndarray:
+        q_terms = _terms(question)
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        for i, pos in enumerate(candidates):
+            scores[i] = sum(self._idf[t] for t in q_terms if pos in self._inverted.get(t, ()))
+        top = scores.max() if len(scores) else 0.0
+        return scores / top if top > 0 else scores
+
+    def _candidates(self, complex_id: str, fields: Optional[Iterable[str]]) -> List[int]:
+        wanted = set(TEXT_FIELDS if fields is None else fields)
+        if not wanted:
+            return []
+        return [pos for pos in self._by_complex.get(complex_id, []) if self.paragraphs[pos].field in wanted]
+
+    def _trim_keywords(self, question: str, text: str, max_chars: int = config.SNIPPET_MAX_CHARS) -> str:
+        """Sentences of *text* sharing most (idf-weighted) terms with *question*, in text order, within *max_chars*."""
+        sentences = [(m.start(), m.end()) for m in _SENTENCE_RE.finditer(text) if m.group().strip()]
+        q_terms = _terms(question)
+        scores = [sum(self._idf.get(t, 0.0) for t in _terms(text[a:b]) & q_terms) for a, b in sentences]
+        # best sentences first; without any match the text is cut from its beginning
+        order = sorted(range(len(sentences)), key=lambda i: (-scores[i], i))
+        picked, total = [], 0
+        for i in order:
+            a, b = sentences[i]
+            if total + (b - a) > max_chars and picked:
+                break
+            picked.append(i)
+            total += b - a
+        parts, last = [], None
+        for i in sorted(picked):
+            a, b = sentences[i]
+            if last is not None and i != last + 1:
+                parts.append("…")
+            parts.append(text[a:b].strip())
+            last = i
+        return " ".join(parts)[:max_chars]
+
+    def _rank(self, question: str, candidates: List[int], q_vec: Optional[np.ndarray], top_k: int) -> List[Paragraph]:
+        if not candidates:
+            return []
+        scores = self._keyword_scores(question, candidates)
+        if q_vec is not None:
+            cos = self._vectors[candidates] @ q_vec
+            scores = EMBEDDING_WEIGHT * cos + (1 - EMBEDDING_WEIGHT) * scores
+        best = np.argsort(-scores)[:top_k]
+        # keep document order so the paragraphs read naturally
+        found = [self.paragraphs[candidates[i]] for i in sorted(best)]
+        # very long paragraphs (unstructured presentation text) are cut to the relevant passage
+        trim = self._trim_keywords if q_vec is None else snippet_index.trim
+        return [
+            replace(p, text=trim(question, p.text)) if len(p.text) > config.SNIPPET_MAX_CHARS else p
+            for p in found
+        ]
+
+    def search(
+        self,
+        complex_id: str,
+        question: str,
+        fields: Optional[Iterable[str]] = None,
+        top_k: int = config.COMPLEX_KB_TOP_K,
+    ) -> List[Paragraph]:
+        """Return up to *top_k* paragraphs of *complex_id* relevant to *question*."""
+        return self.search_batch([(complex_id, question, fields)], top_k=top_k)[0]
+
+    def search_batch(
+        self,
+        requests: List[tuple[str, str, Optional[Iterable[str]]]],
+        top_k: int = config.COMPLEX_KB_TOP_K,
+    ) -> List[List[Paragraph]]:
+        """Same as search() for (complex_id, question, fields) triples, embedding all questions in one batch."""
+        candidates = [self._candidates(complex_id, fields) for complex_id, _, fields in requests]
+        # requests without text fields to search are not embedded
+        searched = [i for i, c in enumerate(candidates) if c]
+        q_vecs = self._embed_queries([requests[i][1] for i in searched]) if searched else None
+        rows = {i: row for row, i in enumerate(searched)}
+        return [
+            self._rank(question, candidates[i], None if q_vecs is None or i not in rows else q_vecs[rows[i]], top_k)
+            for i, (_, question, _) in enumerate(requests)
+        ]
+
+
+def group_by_field(paragraphs: Iterable[Paragraph]) -> Dict[str, str]:
+    grouped: Dict[str, List[str]] = defaultdict(list)
+    for p in paragraphs:
+        grouped[p.field].append(p.text)
+    return {field: "\n".join(texts) for field, texts in grouped.items()}
@@ -4,12 +4,16 @@ import json
 
 from langchain_core.tools import tool
 from langgraph.types import Command
+from typing_extensions import TypedDict
 
+import config
 from utils.utils import sub_dict
 from agents.state.state import State
+from agents.tools.complex_kb import ComplexKnowledgeStore, TEXT_FIELDS, group_by_field
 
 complexes = json.loads(open("data/residential_complexes.json", "r", encoding="utf-8").read())
 complexes_idx = {rec["id"]: rec for rec in complexes}
+complexes_kb = ComplexKnowledgeStore(complexes, use_embeddings=config.COMPLEX_KB_EMBEDDINGS)
 
 @tool
 def get_list_of_complexes() -> list[dict]:
@@ -39,20 +43,59 @@ IMPORTANT: This tool does not contain information on building complexes!!!"""
                           "Бизнес центр Seven ул. Жируга 26а"]}
 
 @tool
-def get_complex_info(complex_id: str, list_of_fields: list[str]) -> dict:
+def get_complex_info(complex_id: str, list_of_fields: list[str], question: str = "") -> dict:
     """Возвращает расширенную информацию по определённому жилому комплексу (ЖК).
 Returns extended information of the residential complex by id.
+If question is given, text fields contain only paragraphs relevant to the question.
 
 Args:
     complex_id: id of the complex. Can be one of the following values: vesna, 7ya, andersen. 
-    list_of_fields: list of fields to return. Available fields: name, alternative_name, district, ready_date, number_of_houses, comfort_level, general_info, features, financial_conditions, managers_info, presentation"""
+    list_of_fields: list of fields to return. Available fields: name, alternative_name, district, ready_date, number_of_houses, comfort_level, general_info, features, financial_conditions, managers_info, presentation
+    question: user question the information is needed for (in Russian). Always provide it to get a short answer."""
     try:
         found_complex = complexes_idx[complex_id]
-        if "presentation" not in list_of_fields:
-            list_of_fields.append("presentation")
     except Exception:
-        found_complex = {} #complexes_idx['vesna']
-    return sub_dict([found_complex], list_of_fields)[0]
+        return {}
+    if not question:
+        return sub_dict([found_complex], list_of_fields)[0]
+
+    scalar_fields = [f for f in list_of_fields if f not in TEXT_FIELDS]
+    text_fields = [f for f in list_of_fields if f in TEXT_FIELDS]
+    result = sub_dict([found_complex], scalar_fields)[0]
+    if text_fields:
+        result |= group_by_field(complexes_kb.search(complex_id, question, text_fields))
+    return result
+
+
+class ComplexInfoRequest(TypedDict):
+    complex_id: Annotated[str, "id of the complex: vesna, 7ya, andersen"]
+    list_of_fields: Annotated[list[str], "fields to return, same as for get_complex_info"]
+    question: Annotated[str, "user question the information is needed for (in Russian)"]
+
+
+@tool
+def get_complex_info_batch(requests: list[ComplexInfoRequest]) -> list[dict]:
+    """Возвращает информацию сразу по нескольким жилым комплексам и/или вопросам за один вызов.
+Returns information for several (complex, question) pairs at once. Use it instead of several get_complex_info calls,
+e.g. for "инфраструктура и ипотека в Андерсен и Весна".
+
+Args:
+    requests: list of requests, each with complex_id, list_of_fields and question"""
+    known = [r for r in requests if r.get("complex_id") in complexes_idx]
+    found = iter(complexes_kb.search_batch(
+        [(r["complex_id"], r.get("question", ""), [f for f in r.get("list_of_fields", []) if f in TEXT_FIELDS]) for r in known]
+    ))
+    results = []
+    for r in requests:
+        if r.get("complex_id") not in complexes_idx:
+            results.append({"complex_id": r.get("complex_id"), "error": "unknown complex"})
+            continue
+        fields = r.get("list_of_fields", [])
+        result = {"complex_id": r["complex_id"], "question": r.get("question", "")}
+        result |= sub_dict([complexes_idx[r["complex_id"]]], [f for f in fields if f not in TEXT_FIELDS])[0]
+        result |= group_by_field(next(found))
+        results.append(result)
+    return results
 
 
 @tool
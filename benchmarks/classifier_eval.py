@@ -0,0 +1,97 @@
+"""
+Labelled evaluation of the per-turn classifier tasks (agents/classifier.py).
+
+For every task in agents/classifier_labels.json the embedding margin of each example
+is computed once; then for each candidate CLASSIFIER_MIN_MARGIN the report shows how
+many examples the embeddings decide on their own (coverage), how accurate those
+decisions are, and — with --llm — the end-to-end accuracy when the rest goes to the
+LLM fallback, next to the accuracy of the LLM alone.  "measured margin" is the
+threshold the classifier sets for itself at startup from the same labels.
+
+    python benchmarks/classifier_eval.py
+    python benchmarks/classifier_eval.py --llm --margins 0,0.02,0.04,0.06,0.08,0.1 --output classifier.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+# registering modules: importing them adds their tasks
+import agents.answers_checker  # noqa: F401
+from agents import classifier
+
+
+def evaluate(task_name: str, examples: List[dict], margins: List[float], use_llm: bool) -> Dict:
+    values = [classifier.margin(task_name, ex["text"]) for ex in examples]
+    if any(v is None for v in values):
+        raise SystemExit(f"Embedding model {config.EMBEDDING_MODEL} is not available")
+    labels = [bool(ex["label"]) for ex in examples]
+    llm = [classifier._tasks[task_name].fallback(ex["text"]) for ex in examples] if use_llm else None
+
+    rows = []
+    for threshold in margins:
+        confident = [abs(v) >= threshold for v in values]
+        correct = [(v > 0) == y for v, y in zip(values, labels)]
+        decided = sum(confident)
+        row = {
+            "margin": threshold,
+            "coverage": decided / len(examples),
+            "confident_accuracy": sum(c for c, ok in zip(confident, correct) if ok) / decided if decided else None,
+        }
+        if llm is not None:
+            final = [(v > 0) if c else l for v, c, l in zip(values, confident, llm)]
+            row["accuracy"] = sum(p == y for p, y in zip(final, labels)) / len(examples)
+        rows.append(row)
+
+    return {
+        "task": task_name,
+        "examples": len(examples),
+        "positives": sum(labels),
+        "llm_accuracy": sum(p == y for p, y in zip(llm, labels)) / len(examples) if llm is not None else None,
+        "rows": rows,
+        "measured_margin": classifier.calibrate(values, labels),
+        "errors": [
+            {"text": ex["text"], "label": y, "margin": round(v, 4)}
+            for ex, v, y in zip(examples, values, labels) if (v > 0) != y
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--eval", default=classifier.LABELS_PATH)
+    parser.add_argument("--margins", default="0,0.01,0.02,0.03,0.05,0.07,0.1")
+    parser.add_argument("--llm", action="store_true", help="also run the LLM fallback on every example")
+    parser.add_argument("--output", default="", help="append JSON lines with the results to this file")
+    args = parser.parse_args()
+
+    dataset = classifier.load_labels(args.eval)
+    margins = sorted(float(m) for m in args.margins.split(","))
+
+    for task_name, examples in dataset.items():
+        report = evaluate(task_name, examples, margins, args.llm)
+        print(f"\n=== {task_name}: {report['examples']} examples, {report['positives']} positive ===")
+        if report["llm_accuracy"] is not None:
+            print(f"LLM only: accuracy={report['llm_accuracy']:.3f}")
+        print(f"{'margin':>7} {'coverage':>9} {'conf_acc':>9} {'accuracy':>9}")
+        for r in report["rows"]:
+            conf = f"{r['confident_accuracy']:.3f}" if r["confident_accuracy"] is not None else "-"
+            acc = f"{r['accuracy']:.3f}" if "accuracy" in r else "-"
+            print(f"{r['margin']:>7.3f} {r['coverage']:>9.2f} {conf:>9} {acc:>9}")
+        print(f"measured margin: {report['measured_margin']:.4f}")
+        for err in report["errors"]:
+            print(f"  misclassified (label={err['label']}, margin={err['margin']}): {err['text'][:90]}")
+        if args.output:
+            record = {"timestamp": datetime.now().isoformat(timespec="seconds"),
+                      "embedding_model": config.EMBEDDING_MODEL, **report}
+            with open(args.output, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+OpenAI-compatible stub of /v1/chat/completions for offline load tests.
+
+Answers come back after a configurable latency with a canned text, or with a tool
+call when a rule matches:
+    {"tool": "transfer_to_kb_agent", "match": "ЖК|комплекс", "arguments": {"task": "..."}}
+A rule fires only for the first model call of a turn (the last message is the
+user's) and only if the request offers that tool; missing arguments are filled
+from the tool's JSON schema.  Forced tool_choice and response_format requests
+(with_structured_output) get schema-shaped JSON.  stream=true is served as SSE.
+
+    python benchmarks/fake_openai.py --port 8808 --latency 0.8 --jitter 0.3
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+DEFAULT_RULES = [
+    {"tool": "transfer_to_kb_agent", "match": r"ЖК|комплекс|застройщик|ипотек|скидк|район|сда[её]т",
+     "arguments": {"task": "Ответить на вопрос клиента о жилых комплексах"}},
+]
+
+ANSWER = ("Спасибо за вопрос! В наших жилых комплексах есть квартиры разных планировок. "
+          "Подскажите, пожалуйста, какой бюджет и сколько комнат вы рассматриваете?")
+
+
+def _sample(schema: Dict[str, Any], defs: Dict[str, Any]) -> Any:
+    """Minimal value satisfying a JSON schema (enough for pydantic / TypedDict outputs)."""
+    if "$ref" in schema:
+        return _sample(defs.get(schema["$ref"].split("/")[-1], {}), defs)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            return _sample(schema[key][0], defs)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "default" in schema:
+        return schema["default"]
+    kind = schema.get("type", "object")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        return {name: _sample(prop, defs) for name, prop in schema.get("properties", {}).items()}
+    return {"string": "SELECT 1", "integer": 0, "number": 0, "boolean": False, "array": [], "null": None}.get(kind)
+
+
+def _schema_value(schema: Dict[str, Any], overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    value = _sample(schema, schema.get("$defs", schema.get("definitions", {}))) or {}
+    return {**value, **(overrides or {})}
+
+
+def _last_text(messages: List[Dict[str, Any]]) -> str:
+    content = messages[-1].get("content") if messages else ""
+    if isinstance(content, list):
+        return " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+    return content or ""
+
+
+class StubBehaviour:
+    def __init__(self, latency: float = 0.5, jitter: float = 0.2, rules: Optional[List[Dict[str, Any]]] = None,
+                 chunk_delay: float = 0.01):
+        self.latency = latency
+        self.jitter = jitter
+        self.rules = [dict(rule, pattern=re.compile(rule.get("match", ".*"), re.IGNORECASE))
+                      for rule in (DEFAULT_RULES if rules is None else rules)]
+        self.chunk_delay = chunk_delay
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def delay(self) -> None:
+        with self._lock:
+            self.requests += 1
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def respond(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Assistant message dict: {"content": ...} or {"tool_calls": [...]}."""
+        messages = body.get("messages", [])
+        tools = {t["function"]["name"]: t["function"] for t in body.get("tools", []) if t.get("type") == "function"}
+
+        forced = body.get("tool_choice")
+        if isinstance(forced, dict) and forced.get("function", {}).get("name") in tools:
+            name = forced["function"]["name"]
+            return {"tool_calls": [self._tool_call(name, _schema_value(tools[name].get("parameters", {})))]}
+
+        fmt = body.get("response_format") or {}
+        if fmt.get("type") == "json_schema":
+            return {"content": json.dumps(_schema_value(fmt["json_schema"].get("schema", {})), ensure_ascii=False)}
+        if fmt.get("type") == "json_object":
+            return {"content": "{}"}
+
+        if messages and messages[-1].get("role") == "user":
+            text = _last_text(messages)
+            for rule in self.rules:
+                if rule["tool"] in tools and rule["pattern"].search(text):
+                    params = tools[rule["tool"]].get("parameters", {})
+                    return {"tool_calls": [self._tool_call(rule["tool"], _schema_value(params, rule.get("arguments")))]}
+        return {"content": ANSWER}
+
+    @staticmethod
+    def _tool_call(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        return {"id": f"call_{uuid.uuid4().hex[:24]}", "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)}}
+
+
+def _usage(body: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, int]:
+    prompt_tokens = len(json.dumps(body.get("messages", []), ensure_ascii=False)) // 4
+    completion_tokens = len(json.dumps(message, ensure_ascii=False)) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0}}
+
+
+def make_handler(behaviour: StubBehaviour):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status: int, payload: Dict[str, Any]) -> None:
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._json(200, {"object": "list", "data": [{"id": "gpt-4.1", "object": "model"}]})
+            else:
+                self._json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._json(404, {"error": {"message": f"{self.path} is not served by the stub"}})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            behaviour.delay()
+            message = behaviour.respond(body)
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            model = body.get("model", "gpt-4.1")
+            finish_reason = "tool_calls" if "tool_calls" in message else "stop"
+            if body.get("stream"):
+                self._stream(body, message, completion_id, model, finish_reason)
+                return
+            self._json(200, {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": finish_reason,
+                             "message": {"role": "assistant", "content": message.get("content"),
+                                         **({"tool_calls": message["tool_calls"]} if "tool_calls" in message else {})}}],
+                "usage": _usage(body, message),
+            })
+
+        def _stream(self, body, message, completion_id, model, finish_reason) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            def send(delta, finish=None, usage=None):
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish}]}
+                if usage:
+                    chunk["usage"] = usage
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            send({"role": "assistant", "content": ""})
+            if "tool_calls" in message:
+                send({"tool_calls": [dict(call, index=i) for i, call in enumerate(message["tool_calls"])]})
+            else:
+                for word in re.findall(r"\S+\s*", message["content"]):
+                    send({"content": word})
+                    time.sleep(behaviour.chunk_delay)
+            send({}, finish=finish_reason)
+            if (body.get("stream_options") or {}).get("include_usage"):
+                send({}, usage=_usage(body, message))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_server(behaviour: StubBehaviour, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the stub in a daemon thread; port 0 picks a free port (see server.server_address)."""
+    server = ThreadingHTTPServer((host, port), make_handler(behaviour))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--rules", help="JSON file with tool-call rules (default: handoff to kb_agent)")
+    args = parser.parse_args()
+
+    rules = json.load(open(args.rules, encoding="utf-8")) if args.rules else None
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(StubBehaviour(args.latency, args.jitter, rules)))
+    print(f"Fake OpenAI listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Offline end-to-end load test of the conversation graph (agents.supervisor.get_agent).
+
+Many scripted conversations run concurrently against the compiled graph, with every
+OpenAI call served by the local stub (benchmarks/fake_openai.py), so scaling limits
+can be measured on a laptop without API keys.  The report contains throughput,
+turn latency percentiles, memory growth per conversation (tracemalloc and RSS) and
+the serialized checkpoint size per thread.  The graph is driven directly; the
+Telegram layer (dispatcher, streaming edits) is not part of the measurement.
+
+Knowledge-base data and local models must be present, as for the bot itself.
+    python benchmarks/load_test.py --conversations 50 --concurrency 10 --latency 0.8
+    python benchmarks/load_test.py --script my_dialogs.json --checkpointer sqlite --output load.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_openai import StubBehaviour, start_server
+
+DEFAULT_SCRIPT = [
+    "Здравствуйте! Подбираю квартиру для семьи.",
+    "В каких ЖК вы предлагаете квартиры?",
+    "А Андерсен в каком районе?",
+    "А когда сдаёте его?",
+    "Какие есть скидки и ипотека?",
+    "У меня двое детей, что там есть рядом для них?",
+    "Бюджет до 10 млн, нужна двушка от 50 метров",
+    "Давайте созвонимся завтра после 17:00",
+]
+
+
+def _configure_env(args, base_url: str) -> None:
+    # must happen before config / agents are imported
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_BASE"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "sk-load-test")
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    os.environ["CHECKPOINTER"] = args.checkpointer
+    if args.checkpointer == "sqlite":
+        os.environ["CHECKPOINT_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="neuro7-load-"), "checkpoints.sqlite")
+    os.environ["CHECKPOINT_COMPACT_INTERVAL"] = "0"
+    # yes/no checks go to the stub instead of loading the embedding model
+    os.environ.setdefault("CLASSIFIER_BACKEND", "llm")
+    os.environ.setdefault("TRACE_FILE", os.path.join(tempfile.gettempdir(), "neuro7-load-trace.jsonl"))
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    import numpy as np
+    if not values:
+        return {}
+    return {f"p{q}": float(np.percentile(values, q)) for q in (50, 90, 95, 99)} | {"max": max(values)}
+
+
+async def run_load(agent, checkpointer, script: List[str], conversations: int, concurrency: int) -> Dict[str, Any]:
+    from langchain_core.messages import HumanMessage
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: List[str] = []
+    threads: List[Dict[str, Any]] = []
+
+    async def conversation(n: int) -> None:
+        cfg = {"configurable": {"thread_id": f"load-{n}-{uuid.uuid4().hex[:8]}", "user_info": n}}
+        threads.append(cfg)
+        async with semaphore:
+            for question in script:
+                start = time.perf_counter()
+                try:
+                    await agent.ainvoke({"messages": [HumanMessage(content=[{"type": "text", "text": question}])]}, cfg)
+                    latencies.append(time.perf_counter() - start)
+                except Exception as e:
+                    errors.append(f"{type(e).__name__}: {e}")
+
+    tracemalloc.start()
+    heap_before, rss_before = tracemalloc.get_traced_memory()[0], _rss_mb()
+    started = time.perf_counter()
+    await asyncio.gather(*(conversation(n) for n in range(conversations)))
+    elapsed = time.perf_counter() - started
+    heap_after, rss_after = tracemalloc.get_traced_memory()[0], _rss_mb()
+    tracemalloc.stop()
+
+    sizes = []
+    for cfg in threads:
+        saved = checkpointer.get_tuple(cfg)
+        if saved is not None:
+            sizes.append(len(checkpointer.serde.dumps_typed(saved.checkpoint)[1]))
+
+    turns = len(latencies)
+    return {
+        "conversations": conversations,
+        "concurrency": concurrency,
+        "turns": turns,
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "elapsed_s": elapsed,
+        "turns_per_s": turns / elapsed if elapsed else 0.0,
+        "turn_latency_s": _percentiles(latencies),
+        "heap_growth_per_thread_kb": (heap_after - heap_before) / 1024 / max(conversations, 1),
+        "rss_growth_per_thread_mb": (rss_after - rss_before) / max(conversations, 1),
+        "checkpoint_bytes": _percentiles(sizes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent scripted conversations against a stubbed LLM")
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--script", help="JSON list of user messages replayed by every conversation")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub seconds per LLM call")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--rules", help="JSON file with stub tool-call rules")
+    parser.add_argument("--base-url", help="use an already running stub instead of starting one")
+    parser.add_argument("--checkpointer", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--label", default="")
+    parser.add_argument("--output", help="append the report as a JSON line")
+    args = parser.parse_args()
+
+    behaviour = None
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        rules = json.load(open(args.rules, encoding="utf-8")) if args.rules else None
+        behaviour = StubBehaviour(args.latency, args.jitter, rules)
+        host, port = start_server(behaviour).server_address[:2]
+        base_url = f"http://{host}:{port}/v1"
+    _configure_env(args, base_url)
+
+    from agents.checkpointer import get_checkpointer
+    from agents.supervisor import get_agent
+    from utils.utils import ModelType
+
+    script = json.load(open(args.script, encoding="utf-8")) if args.script else DEFAULT_SCRIPT
+    agent = get_agent(ModelType.GPT)
+    report = asyncio.run(run_load(agent, get_checkpointer(), script, args.conversations, args.concurrency))
+    report.update({
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "label": args.label,
+        "checkpointer": args.checkpointer,
+        "stub_latency_s": args.latency,
+        "llm_calls": behaviour.requests if behaviour else None,
+    })
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Throughput benchmark of the local generation backend (hf_tools/local_generation.py).
+
+``--clients`` threads each send requests back to back to one GenerationScheduler
+until ``--requests`` have been served; the prompts share a long system prefix, as the
+agent prompts do.  Every scheduler configuration in ``--batch-sizes`` x ``--prefix-cache``
+runs the same workload with greedy decoding and a fixed ``--max-new-tokens``, and the
+report shows requests/s, generated tokens/s and p50/p95 request latency, so
+``max_batch_size=1`` (no micro-batching) is the baseline of the other rows.
+
+Runs are fully offline (local model folders only).  ``--random-model`` replaces the model
+with a small randomly initialised Llama (4 layers, hidden 256) and the chat prompts with
+random token ids (400-token shared prefix + 8..24 own tokens), to check the scheduler
+itself where no weights are available.  Examples:
+    python benchmarks/local_generation_benchmark.py --model /models/YandexGPT-5-Lite-8B-instruct
+    python benchmarks/local_generation_benchmark.py --model /models/Qwen2.5-1.5B-Instruct --clients 8 \\
+        --batch-sizes 1,2,4,8 --prefix-cache 0,2 --output generation.jsonl
+    python benchmarks/local_generation_benchmark.py --random-model --batch-sizes 1,4 --prefix-cache 0,2 \\
+        --max-new-tokens 32
+
+Measured with --random-model (32 requests, 4 clients, 32 new tokens, 1 CPU thread,
+torch 2.14 / transformers 5.20); the batched rows reuse the shared prefix and give the
+same greedy tokens as unbatched generation:
+    batch cache   req/s    tok/s   p50_s   p95_s
+        1     0    5.58    178.6    0.72    0.76
+        4     0    7.50    239.9    0.54    0.60
+        1     2    7.02    224.5    0.54    0.72
+        4     2   14.95    478.4    0.26    0.29
+Numbers for the production model have to be measured on its GPU host.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer, LlamaConfig, LlamaForCausalLM
+
+import config
+from hf_tools.local_generation import GenerationScheduler
+
+SYSTEM_PROMPT = (
+    "Ты — консультант застройщика жилых комплексов. Отвечай коротко и по делу, "
+    "уточняй бюджет, состав семьи и сроки покупки, предлагай созвон с менеджером. "
+) * 8
+QUESTIONS = [
+    "Какие квартиры есть в ЖК «Весна»?",
+    "Сколько стоит двухкомнатная квартира в ЖК «Андерсен»?",
+    "Есть ли рядом с ЖК «7Я» школа и детский сад?",
+    "Можно ли купить квартиру по семейной ипотеке?",
+    "Когда сдаётся вторая очередь?",
+    "Есть ли квартиры с отделкой под ключ?",
+    "Какой первоначальный взнос при рассрочке?",
+    "Есть ли подземный паркинг?",
+]
+
+
+def _prompts(tokenizer, count: int) -> List[List[int]]:
+    prompts = []
+    for i in range(count):
+        messages = [{"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": QUESTIONS[i % len(QUESTIONS)]}]
+        prompts.append(tokenizer.apply_chat_template(messages, add_generation_prompt=True, tokenize=True))
+    return prompts
+
+
+class _RandomTokenizer:
+    """What GenerationScheduler needs of a tokenizer, for --random-model."""
+    eos_token_id = 1
+    pad_token_id = 0
+
+    def decode(self, ids, skip_special_tokens: bool = True) -> str:
+        return " ".join(str(i) for i in ids)
+
+
+def _random_setup(count: int):
+    torch.manual_seed(0)
+    model = LlamaForCausalLM(LlamaConfig(vocab_size=1000, hidden_size=256, intermediate_size=1024,
+                                         num_hidden_layers=4, num_attention_heads=8, num_key_value_heads=4,
+                                         max_position_embeddings=2048)).eval()
+    rnd = random.Random(0)
+    system = [rnd.randrange(2, 1000) for _ in range(400)]
+    prompts = [system + [rnd.randrange(2, 1000) for _ in range(rnd.randrange(8, 24))] for _ in range(count)]
+    return model, _RandomTokenizer(), prompts
+
+
+def run(scheduler: GenerationScheduler, prompts: List[List[int]], clients: int) -> Dict:
+    latencies: List[float] = []
+    generated = [0]
+    lock = threading.Lock()
+    pending = iter(prompts)
+
+    def client() -> None:
+        while True:
+            with lock:
+                ids = next(pending, None)
+            if ids is None:
+                return
+            started = time.perf_counter()
+            out = scheduler.generate(ids)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                generated[0] += len(out)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for future in [pool.submit(client) for _ in range(clients)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "requests_per_s": len(latencies) / elapsed,
+        "tokens_per_s": generated[0] / elapsed,
+        "p50_s": float(np.percentile(latencies, 50)),
+        "p95_s": float(np.percentile(latencies, 95)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=config.LOCAL_MODEL_NAME, help="local transformers model folder")
+    parser.add_argument("--random-model", action="store_true",
+                        help="small random Llama and random token prompts instead of --model")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--clients", type=int, default=4, help="concurrent callers")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--batch-sizes", default=f"1,{config.LOCAL_MAX_BATCH_SIZE}")
+    parser.add_argument("--batch-wait-ms", type=float, default=config.LOCAL_BATCH_WAIT_MS)
+    parser.add_argument("--prefix-cache", default=str(config.LOCAL_PREFIX_CACHE_SIZE),
+                        help="comma-separated prefix_cache_size values (0 disables the cache)")
+    parser.add_argument("--label", default="", help="free-form run label stored in the output")
+    parser.add_argument("--output", default="", help="append JSON lines with the results to this file")
+    args = parser.parse_args()
+
+    # greedy decoding: every configuration generates (nearly) the same tokens, so the rows do the same work
+    gen_cfg = {"max_new_tokens": args.max_new_tokens, "do_sample": False}
+    if args.random_model:
+        model, tokenizer, prompts = _random_setup(args.requests)
+        args.model = "random-llama"
+        gen_cfg["min_new_tokens"] = args.max_new_tokens  # random weights hit EOS at random
+    else:
+        tokenizer = AutoTokenizer.from_pretrained(args.model, trust_remote_code=True)
+        if tokenizer.pad_token_id is None:
+            tokenizer.pad_token_id = tokenizer.eos_token_id
+        model = AutoModelForCausalLM.from_pretrained(args.model, device_map="auto", torch_dtype="auto",
+                                                     trust_remote_code=True)
+        prompts = _prompts(tokenizer, args.requests)
+
+    print(f"{args.requests} requests from {args.clients} clients, prompt ~{len(prompts[0])} tokens, "
+          f"device {model.device}, torch {torch.__version__}")
+    print(f"{'batch':>5} {'cache':>5} {'req/s':>7} {'tok/s':>8} {'p50_s':>7} {'p95_s':>7}")
+    for cache_size in (int(v) for v in args.prefix_cache.split(",")):
+        for batch_size in (int(v) for v in args.batch_sizes.split(",")):
+            scheduler = GenerationScheduler(model, tokenizer, gen_cfg, max_batch_size=batch_size,
+                                            batch_wait_ms=args.batch_wait_ms, prefix_cache_size=cache_size)
+            scheduler.generate(prompts[0])  # warm-up: CUDA kernels, first cache entry
+            report = run(scheduler, prompts, args.clients)
+            print(f"{batch_size:>5} {cache_size:>5} {report['requests_per_s']:>7.2f} {report['tokens_per_s']:>8.1f} "
+                  f"{report['p50_s']:>7.2f} {report['p95_s']:>7.2f}")
+            if args.output:
+                record = {"timestamp": datetime.now().isoformat(timespec="seconds"), "label": args.label,
+                          "model": args.model, "clients": args.clients, "max_new_tokens": args.max_new_tokens,
+                          "max_batch_size": batch_size, "batch_wait_ms": args.batch_wait_ms,
+                          "prefix_cache_size": cache_size, **report}
+                with open(args.output, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
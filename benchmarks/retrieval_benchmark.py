@@ -0,0 +1,196 @@
+"""
+Retrieval quality / latency benchmark for the knowledge base (v01/retriever.py pipeline).
+
+For each golden question the pipeline is run stage by stage:
+    embed  → embed the question
+    search → ANN search in FAISS (k candidates)
+    rerank → cross-encoder scores for all candidates
+and recall@k / MRR are computed both for the raw ANN order and after reranking,
+together with p50/p95 latency per stage.  A chunk counts as relevant when its id
+matches one of the question's ``relevant_ids`` glob patterns (paragraph ids
+"<complex_id>.<field>.<n>" written by kb_builder/build_index.py) and contains one
+of its ``expected`` phrases (case-insensitive); either label may be omitted, but
+not both.
+
+Runs are fully offline (local model folders only).  Examples:
+    python benchmarks/retrieval_benchmark.py
+    python benchmarks/retrieval_benchmark.py --index-types flat,hnsw --output bench.jsonl
+    python benchmarks/retrieval_benchmark.py --embedding-model /models/multilingual-e5-base --index-types flat
+"""
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+
+from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+
+import config
+from utils.utils import get_embeddings
+from v01.index_store import IVFPQ_MIN_VECTORS, build_vectorstore, load_vectorstore
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_questions.json")
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def _is_relevant(doc, item: dict) -> bool:
+    patterns = item.get("relevant_ids")
+    if patterns and not any(fnmatch.fnmatchcase(doc.id or "", p) for p in patterns):
+        return False
+    expected = item.get("expected")
+    if expected:
+        text = doc.page_content.lower()
+        return any(e.lower() in text for e in expected)
+    return True
+
+
+def _first_relevant_rank(docs, item: dict) -> int | None:
+    for rank, doc in enumerate(docs, start=1):
+        if _is_relevant(doc, item):
+            return rank
+    return None
+
+
+def _quality(ranks: List[int | None], ks: List[int]) -> Dict[str, float]:
+    n = max(len(ranks), 1)
+    metrics = {f"recall@{k}": sum(1 for r in ranks if r is not None and r <= k) / n for k in ks}
+    metrics["mrr"] = sum(1.0 / r for r in ranks if r is not None) / n
+    return metrics
+
+
+def run_benchmark(vectorstore, reranker, golden: List[dict], k: int, ks: List[int], repeat: int = 1) -> dict:
+    timings = {"embed": [], "search": [], "rerank": []}
+    ann_ranks, rerank_ranks = [], []
+    embeddings = vectorstore.embedding_function
+
+    for item in golden:
+        question = item["question"]
+        for attempt in range(repeat):
+            t0 = time.perf_counter()
+            q = np.asarray([embeddings.embed_query(question)], dtype=np.float32)
+            if vectorstore._normalize_L2:
+                faiss.normalize_L2(q)
+            t1 = time.perf_counter()
+            _, indices = vectorstore.index.search(q, k)
+            t2 = time.perf_counter()
+            docs = [vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]) for i in indices[0] if i != -1]
+            scores = reranker.score([(question, doc.page_content) for doc in docs]) if docs else []
+            t3 = time.perf_counter()
+
+            timings["embed"].append(t1 - t0)
+            timings["search"].append(t2 - t1)
+            timings["rerank"].append(t3 - t2)
+
+        reranked = [doc for _, doc in sorted(zip(scores, docs), key=lambda x: x[0], reverse=True)]
+        ann_ranks.append(_first_relevant_rank(docs, item))
+        rerank_ranks.append(_first_relevant_rank(reranked, item))
+
+    latency = {
+        stage: {"p50_ms": _percentile(values, 50), "p95_ms": _percentile(values, 95)}
+        for stage, values in timings.items()
+    }
+    total = [sum(t) for t in zip(*timings.values())]
+    latency["total"] = {"p50_ms": _percentile(total, 50), "p95_ms": _percentile(total, 95)}
+    return {
+        "questions": len(golden),
+        "ann": _quality(ann_ranks, ks),
+        "reranked": _quality(rerank_ranks, ks),
+        "latency": latency,
+        "missed": [g["question"] for g, r in zip(golden, rerank_ranks) if r is None or r > max(ks)],
+    }
+
+
+def _print_report(label: str, report: dict) -> None:
+    print(f"\n=== {label} ({report['questions']} questions) ===")
+    for stage in ("ann", "reranked"):
+        row = "  ".join(f"{name}={value:.3f}" for name, value in report[stage].items())
+        print(f"{stage:>9}: {row}")
+    for stage, values in report["latency"].items():
+        print(f"{stage:>9}: p50={values['p50_ms']:.1f}ms  p95={values['p95_ms']:.1f}ms")
+    if report["missed"]:
+        print("   missed:", *report["missed"], sep="\n    - ")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", default=config.ASSISTANT_INDEX_FOLDER, help="index folder to benchmark")
+    parser.add_argument("--index-types", default="",
+                        help="comma separated flat,hnsw,ivfpq: rebuild the index in memory for each type and compare")
+    parser.add_argument("--embedding-model", default=config.EMBEDDING_MODEL)
+    parser.add_argument("--reranker", default=config.RERANKING_MODEL)
+    parser.add_argument("--golden", default=GOLDEN_PATH)
+    parser.add_argument("--k", type=int, default=5, help="ANN candidates passed to the reranker (MAX_RETRIEVALS)")
+    parser.add_argument("--ks", default="1,2,3,5", help="cut-offs for recall@k (top_n candidates)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed repetitions per question")
+    parser.add_argument("--label", default="", help="free-form run label stored in the output")
+    parser.add_argument("--output", default="", help="append JSON lines with the results to this file")
+    args = parser.parse_args()
+
+    with open(args.golden, encoding="utf-8") as f:
+        golden = json.load(f)
+    unlabelled = [g["question"] for g in golden if not g.get("relevant_ids") and not g.get("expected")]
+    if unlabelled:
+        parser.error(f"golden questions without relevant_ids/expected: {unlabelled}")
+    ks = sorted({int(k) for k in args.ks.split(",")})
+
+    embeddings = get_embeddings(args.embedding_model)
+    reranker = HuggingFaceCrossEncoder(model_name=args.reranker)
+    base = load_vectorstore(args.index, embeddings)
+    if not any(fnmatch.fnmatchcase(doc_id, "*.*.*") for doc_id in base.index_to_docstore_id.values()):
+        print(f"Index {args.index} has no paragraph ids; rebuild it with kb_builder/build_index.py, "
+              f"otherwise only questions labelled by phrases alone can match")
+
+    variants = {}
+    if base.index.d == len(embeddings.embed_query("проверка")):
+        variants["as_stored"] = base
+    else:
+        # the stored index was built with another embedding model – only rebuilt variants are comparable
+        print(f"Index {args.index} dimension differs from {args.embedding_model}, benchmarking rebuilt indexes only")
+        args.index_types = args.index_types or "flat"
+    if args.index_types:
+        ids = list(base.index_to_docstore_id.values())
+        documents = [base.docstore.search(doc_id) for doc_id in ids]
+        for doc_id, doc in zip(ids, documents):
+            doc.id = doc_id
+        for index_type in (t.strip() for t in args.index_types.split(",")):
+            if index_type == "ivfpq" and len(documents) < IVFPQ_MIN_VECTORS:
+                print(f"Skipping ivfpq: the corpus has {len(documents)} vectors, PQ training needs {IVFPQ_MIN_VECTORS}")
+                continue
+            variants[index_type] = build_vectorstore(documents, embeddings, index_type=index_type)
+
+    for variant, vectorstore in variants.items():
+        report = run_benchmark(vectorstore, reranker, golden, k=args.k, ks=ks, repeat=args.repeat)
+        label = f"{args.label or os.path.basename(args.embedding_model)}/{variant}"
+        _print_report(label, report)
+        if args.output:
+            record = {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "label": label,
+                "index": args.index,
+                "index_type": variant,
+                "embedding_model": args.embedding_model,
+                "reranker": args.reranker,
+                "k": args.k,
+                **report,
+            }
+            with open(args.output, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,13 @@ USERNAME = '7810155'
 PASSWORD = os.environ.get('IL_PWD') 
 
 LOCAL_MODEL_NAME='/models/Meta-Llama-3.1-8B-Instruct-Q8_0'
+# local transformers model: micro-batching of concurrent requests and prompt-prefix KV-cache reuse
+LOCAL_MAX_BATCH_SIZE = int(os.environ.get('LOCAL_MAX_BATCH_SIZE') or 4)
+LOCAL_BATCH_WAIT_MS = float(os.environ.get('LOCAL_BATCH_WAIT_MS') or 20)
+LOCAL_PREFIX_CACHE_SIZE = int(os.environ.get('LOCAL_PREFIX_CACHE_SIZE') or 2)
+# GGUF model on llama.cpp (LOCAL_MODEL_NAME: .gguf file, path without extension or directory)
+GGUF_N_CTX = int(os.environ.get('GGUF_N_CTX') or 8192)
+GGUF_N_THREADS = int(os.environ.get('GGUF_N_THREADS') or 0)   # 0 → number of cores
 
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_NEURO_BOT_TOKEN')
 #EMBEDDING_MODEL='sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
@@ -54,9 +61,29 @@ JINA_API_KEY=os.environ.get('JINA_API_KEY')
 
 WHISPER_MODEL = os.environ.get('WHISPER_MODEL', default='small')
 WHISPER_MODEL_PATH=os.environ.get('WHISPER_MODEL_PATH')
+# speech recognition: "whisper" (openai-whisper, fp32) or "faster-whisper" (CTranslate2, int8 + VAD)
+ASR_BACKEND = os.environ.get('ASR_BACKEND') or "whisper"
+ASR_LANGUAGE = os.environ.get('ASR_LANGUAGE') or "ru"
+ASR_COMPUTE_TYPE = os.environ.get('ASR_COMPUTE_TYPE') or "int8"
+ASR_CPU_THREADS = int(os.environ.get('ASR_CPU_THREADS') or 0)
+ASR_VAD = (os.environ.get('ASR_VAD', default='True').lower() == 'true')
+# voice recognition worker processes of the bot, bounded queue of recognitions and per-job timeout
+ASR_WORKERS = int(os.environ.get('ASR_WORKERS') or 2)
+ASR_MAX_QUEUE = int(os.environ.get('ASR_MAX_QUEUE') or 16)
+ASR_TIMEOUT = float(os.environ.get('ASR_TIMEOUT') or 120)
+# start ASR workers (and load their models) in the background right after the bot starts
+ASR_PREWARM = (os.environ.get('ASR_PREWARM', default='True').lower() == 'true')
 
 UPD_TIMEOUT = os.environ.get('UPD_TIMEOUT') or 300
 
+# async bot runtime: concurrent turns across chats and bounded per-chat / total queues
+BOT_MAX_CONCURRENCY = int(os.environ.get('BOT_MAX_CONCURRENCY') or 8)
+BOT_CHAT_QUEUE_SIZE = int(os.environ.get('BOT_CHAT_QUEUE_SIZE') or 3)
+BOT_MAX_PENDING = int(os.environ.get('BOT_MAX_PENDING') or 200)
+# token-level delivery of the final answer through message edits
+STREAM_RESPONSES = (os.environ.get('STREAM_RESPONSES', default='True').lower() == 'true')
+STREAM_EDIT_INTERVAL = float(os.environ.get('STREAM_EDIT_INTERVAL') or 1.0)
+
 def reload_admin_config():
     global CHECK_RIGHTS
     env_vars = dotenv_values(os.path.join(documents_path, 'gv.env'))
@@ -70,5 +97,60 @@ CHATS_INDEX_FOLDER = os.environ.get('CHATS_INDEX_FOLDER') or "./data/chats_idx"
 ASSISTANT_INDEX_FOLDER = os.environ.get('ASSISTANT_INDEX_FOLDER') or "./data/index/neuro_index"
 RERANKING_MODEL = os.environ.get('RERANKING_MODEL') or '/models/bge-reranker-large'
 
+# FAISS index persistence: "auto" picks flat / hnsw / ivfpq by corpus size
+FAISS_INDEX_TYPE = os.environ.get('FAISS_INDEX_TYPE') or 'auto'
+FAISS_MMAP = (os.environ.get('FAISS_MMAP', default='True').lower() == 'true')
+FAISS_HNSW_M = int(os.environ.get('FAISS_HNSW_M') or 32)
+FAISS_HNSW_EF_SEARCH = int(os.environ.get('FAISS_HNSW_EF_SEARCH') or 64)
+FAISS_IVF_NPROBE = int(os.environ.get('FAISS_IVF_NPROBE') or 16)
+
+# paragraph-level search in residential complexes descriptions (get_complex_info)
+COMPLEX_KB_EMBEDDINGS = (os.environ.get('COMPLEX_KB_EMBEDDINGS', default='True').lower() == 'true')
+COMPLEX_KB_TOP_K = int(os.environ.get('COMPLEX_KB_TOP_K') or 6)
+# sliding-window snippet search used to trim long descriptions
+SNIPPET_SPAN = int(os.environ.get('SNIPPET_SPAN') or 80)
+SNIPPET_MAX_CHARS = int(os.environ.get('SNIPPET_MAX_CHARS') or 1500)
+
+
+# conversation state persistence: "sqlite" (durable, shared by all chats) or "memory"
+CHECKPOINTER = os.environ.get('CHECKPOINTER') or 'sqlite'
+CHECKPOINT_DB_PATH = os.environ.get('CHECKPOINT_DB_PATH') or "./data/checkpoints.sqlite"
+CHECKPOINT_KEEP_LAST = int(os.environ.get('CHECKPOINT_KEEP_LAST') or 20)
+CHECKPOINT_COMPACT_INTERVAL = int(os.environ.get('CHECKPOINT_COMPACT_INTERVAL') or 600)
+
+# supervisor history: recent turns kept verbatim, older ones folded into a running summary
+HISTORY_KEEP_TURNS = int(os.environ.get('HISTORY_KEEP_TURNS') or 6)
+HISTORY_TOKEN_BUDGET = int(os.environ.get('HISTORY_TOKEN_BUDGET') or 8000)
+# turns are folded into the summary in chunks: the history grows to KEEP + CHUNK turns, then CHUNK turns are folded at once
+HISTORY_COMPACT_CHUNK = int(os.environ.get('HISTORY_COMPACT_CHUNK') or 6)
+# seconds for the summary LLM call; on timeout the history is kept and folded on a later turn
+HISTORY_SUMMARY_TIMEOUT = float(os.environ.get('HISTORY_SUMMARY_TIMEOUT') or 20)
+
+# trivial short messages (greetings, thanks, "да", list of complexes) are answered without the supervisor LLM
+FAST_PATH_ENABLED = (os.environ.get('FAST_PATH_ENABLED', default='True').lower() == 'true')
+FAST_PATH_MAX_CHARS = int(os.environ.get('FAST_PATH_MAX_CHARS') or 60)
+
+# per-turn yes/no checks: "embeddings" (local nearest-centroid with LLM fallback on low margin) or "llm";
+# the fallback margin is measured on agents/classifier_labels.json at startup, CLASSIFIER_MIN_MARGIN overrides it
+CLASSIFIER_BACKEND = os.environ.get('CLASSIFIER_BACKEND') or "embeddings"
+CLASSIFIER_MIN_MARGIN = float(os.environ['CLASSIFIER_MIN_MARGIN']) if os.environ.get('CLASSIFIER_MIN_MARGIN') else None
+
+# local per-node / per-LLM-call metrics (utils/instrumentation.py)
+INSTRUMENTATION_ENABLED = (os.environ.get('INSTRUMENTATION_ENABLED', default='True').lower() == 'true')
+TRACE_FILE = os.environ.get('TRACE_FILE') or "./logs/trace.jsonl"
+METRICS_PORT = int(os.environ.get('METRICS_PORT') or 0)
+# prompt files, loaded once by utils/prompts.py (reload with SIGHUP)
+PROMPTS_DIR = os.environ.get('PROMPTS_DIR') or "./prompts"
+
+# user images are kept out of graph state in a content-addressed store
+IMAGE_STORE_PATH = os.environ.get('IMAGE_STORE_PATH') or "./data/images"
+IMAGE_STORE_TTL_DAYS = float(os.environ.get('IMAGE_STORE_TTL_DAYS') or 30)
+# photo preprocessing: bounded resolution, perceptual-hash caption cache, "openai" or "local" captioner
+IMAGE_MAX_SIDE = int(os.environ.get('IMAGE_MAX_SIDE') or 1024)
+IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY') or 85)
+IMAGE_HASH_DISTANCE = int(os.environ.get('IMAGE_HASH_DISTANCE') or 4)
+IMAGE_CAPTION_CACHE_SIZE = int(os.environ.get('IMAGE_CAPTION_CACHE_SIZE') or 512)
+IMAGE_CAPTIONER = os.environ.get('IMAGE_CAPTIONER') or "openai"
+IMAGE_CAPTION_MODEL = os.environ.get('IMAGE_CAPTION_MODEL') or "Salesforce/blip-image-captioning-base"
 
 DEBUG_WORKFLOW = (os.environ.get('DEBUG_WORKFLOW', default='False').lower() == 'true')
\ No newline at end of file
@@ -12,7 +12,7 @@ from collections import defaultdict
 
 from agents.supervisor import initialize_agent
 
-from utils.utils import _print_response, summarise_image, image_to_uri
+from utils.utils import _print_response
 
 def _get_response(event: dict, _printed: set, max_length=1500):
     if message := event.get("messages"):
@@ -0,0 +1,141 @@
+"""
+GGUF chat model on llama-cpp-python with the same .bind_tools / tool-calling contract
+as ChatLocalTools (Hermes ``<tool_call>`` and Yandex ``[TOOL_CALL_START]`` formats, see
+hf_tools.tool_calling).
+
+The prompt is rendered with the chat template stored in the GGUF metadata
+(``tokenizer.chat_template``), tools included, exactly as transformers'
+apply_chat_template would.  llama.cpp keeps the KV state of the previous call and
+re-evaluates only the tokens after the common prefix, so the system prompt and the
+tool schemas are not re-encoded between tool-loop iterations.
+"""
+from __future__ import annotations
+import glob, logging, os, threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+from pydantic import PrivateAttr
+
+from langchain_core.messages import BaseMessage
+from langchain_core.tools import BaseTool
+
+from hf_tools.tool_calling import LocalToolsChatModel, _msgs_to_hf
+
+
+def resolve_gguf_path(name: str) -> str:
+    """Path of the .gguf file for *name*: the file itself, ``name + ".gguf"`` or the first .gguf in a directory."""
+    if os.path.isfile(name):
+        return name
+    if os.path.isfile(f"{name}.gguf"):
+        return f"{name}.gguf"
+    if os.path.isdir(name):
+        # split models are loaded from their first shard; projector files are not language models
+        files = sorted(
+            f for f in glob.glob(os.path.join(name, "*.gguf"))
+            if "mmproj" not in os.path.basename(f).lower()
+        )
+        if files:
+            return files[0]
+    raise FileNotFoundError(f"No .gguf model found for {name}")
+
+
+def _raise_exception(message: str):
+    raise ValueError(message)
+
+
+def _strftime_now(fmt: str) -> str:
+    return datetime.now().strftime(fmt)
+
+
+# ─────────────────────── main class ─────────────────────── #
+class ChatGGUFTools(LocalToolsChatModel):
+    """llama.cpp (GGUF) chat wrapper with .bind_tools and automatic tool‑calling."""
+
+    _llm: Any = PrivateAttr()
+    _template: Any = PrivateAttr()
+    _bos_token: str = PrivateAttr(default="")
+    _eos_token: str = PrivateAttr(default="")
+    _gen_cfg: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    _lock: Any = PrivateAttr()
+
+    # ───────────────── init ───────────────── #
+    def __init__(
+        self,
+        model_path: str,
+        tools: Optional[Sequence[BaseTool | callable]] = None,
+        generation_kwargs: Optional[Dict[str, Any]] = None,
+        n_ctx: int = 8192,
+        n_threads: Optional[int] = None,
+        n_batch: int = 512,
+        n_gpu_layers: int = 0,
+        chat_template: Optional[str] = None,
+        max_tool_calls: int = 3,
+        verbose: bool = False,
+        **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        from llama_cpp import Llama
+
+        llm = Llama(
+            model_path=resolve_gguf_path(model_path),
+            n_ctx=n_ctx,
+            n_threads=n_threads or None,   # None → llama.cpp picks the number of cores
+            n_batch=n_batch,
+            n_gpu_layers=n_gpu_layers,
+            verbose=verbose,
+        )
+        template = chat_template or llm.metadata.get("tokenizer.chat_template")
+        if not template:
+            raise ValueError(f"{model_path} has no tokenizer.chat_template; pass chat_template=")
+
+        env = ImmutableSandboxedEnvironment(trim_blocks=True, lstrip_blocks=True)
+        env.globals["raise_exception"] = _raise_exception
+        env.globals["strftime_now"] = _strftime_now
+
+        object.__setattr__(self, "_llm", llm)
+        object.__setattr__(self, "_template", env.from_string(template))
+        object.__setattr__(self, "_bos_token", self._token_text(llm.token_bos()))
+        object.__setattr__(self, "_eos_token", self._token_text(llm.token_eos()))
+        object.__setattr__(self, "_gen_cfg", generation_kwargs or {"max_tokens": 4*1024, "temperature": 1})
+        object.__setattr__(self, "_max_calls", max_tool_calls)
+        object.__setattr__(self, "_verbose", verbose)
+        # a llama.cpp context is not thread-safe; shared by bind_tools() clones
+        object.__setattr__(self, "_lock", threading.Lock())
+
+        self._register_tools(tools or [])
+
+    def _token_text(self, token_id: int) -> str:
+        if token_id < 0:
+            return ""
+        return self._llm.detokenize([token_id], special=True).decode("utf-8", errors="ignore")
+
+    # ───────── BaseChatModel plumbing ───────── #
+    def _get_token_ids(self, text: str) -> List[int]:
+        return self._llm.tokenize(text.encode("utf-8"), add_bos=False)
+
+    @property
+    def _llm_type(self) -> str:
+        return "chat_gguf_tools"
+
+    # ───────── one completion for the shared tool loop ───────── #
+    def _complete(self, history: List[BaseMessage]) -> str:
+        prompt = self._template.render(
+            messages=_msgs_to_hf(history),
+            tools=self._tools_schema or None,
+            add_generation_prompt=True,
+            bos_token=self._bos_token,
+            eos_token=self._eos_token,
+        )
+        if self._verbose:
+            logging.debug(f"prompt raw → {prompt}")
+
+        # the rendered template already starts with BOS
+        tokens = self._llm.tokenize(prompt.encode("utf-8"), add_bos=False, special=True)
+        with self._lock:
+            out = self._llm.create_completion(
+                prompt=tokens,
+                stop=[self._eos_token] if self._eos_token else None,
+                **self._gen_cfg,
+            )
+        return out["choices"][0]["text"]
@@ -0,0 +1,310 @@
+"""
+Generation backend of ChatLocalTools.
+
+* PrefixKVCache keeps the KV caches of the last few prompts.  A new prompt reuses the
+  cache of its longest common token prefix (system prompt + tool schemas, or the
+  previous tool-call iteration), so only the new suffix is encoded.
+* GenerationScheduler owns the model on one worker thread and micro-batches
+  concurrent requests: requests arriving within ``batch_wait_ms`` of each other go
+  into one ``generate`` call.  The prefix all prompts of a batch share is taken from
+  (or prefilled once into) the prefix cache and expanded to the batch; the differing
+  suffixes follow it, padded on the left.  Streaming requests (with a transformers
+  streamer) always run alone.
+* With ``stop_checker`` every generation stops as soon as the generated text satisfies
+  it (ChatLocalTools: a complete tool call), instead of running to EOS.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from transformers import DynamicCache, StoppingCriteria, StoppingCriteriaList
+
+logger = logging.getLogger(__name__)
+
+# shorter shared prefixes are not worth a cache copy
+MIN_PREFIX_TOKENS = 32
+
+
+class PrefixKVCache:
+    def __init__(self, size: int = 2):
+        self.size = size
+        self._entries: "OrderedDict[Tuple[int, ...], DynamicCache]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _common_prefix(a: Sequence[int], b: Sequence[int]) -> int:
+        n = min(len(a), len(b))
+        diff = np.flatnonzero(np.asarray(a[:n]) != np.asarray(b[:n]))
+        return int(diff[0]) if diff.size else n
+
+    def lookup(self, ids: List[int], limit: Optional[int] = None) -> Tuple[int, Optional[DynamicCache]]:
+        """Copy of the cache for the longest cached prefix of *ids*, at most *limit* tokens
+        (by default at least one token is left to encode)."""
+        limit = len(ids) - 1 if limit is None else limit
+        with self._lock:
+            best_len, best_key = 0, None
+            for key in self._entries:
+                length = min(self._common_prefix(key, ids), limit)
+                if length > best_len:
+                    best_len, best_key = length, key
+            if best_key is None or best_len < MIN_PREFIX_TOKENS:
+                return 0, None
+            self._entries.move_to_end(best_key)
+            stored = self._entries[best_key]
+        # stored caches are never modified, so the copy needs no lock; only the prefix is copied
+        return best_len, prefix_copy(stored, best_len)
+
+    def store(self, ids: List[int], cache: DynamicCache) -> None:
+        if self.size <= 0:
+            return
+        key = tuple(ids[: cache.get_seq_length()])
+        with self._lock:
+            self._entries[key] = cache
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+def prefix_copy(cache: DynamicCache, length: int) -> DynamicCache:
+    """New DynamicCache with copies of the first *length* positions of every layer of *cache*."""
+    if hasattr(cache, "layers"):
+        layers = [(layer.keys, layer.values) for layer in cache.layers]  # transformers >= 4.56
+    else:
+        layers = list(zip(cache.key_cache, cache.value_cache))
+    out = DynamicCache()
+    for idx, (keys, values) in enumerate(layers):
+        out.update(keys[:, :, :length].clone(), values[:, :, :length].clone(), idx)
+    return out
+
+
+class TextStoppingCriteria(StoppingCriteria):
+    """Stops a row once ``checker(generated text)`` holds; only rows whose last token contains a trigger are decoded."""
+
+    def __init__(self, tokenizer: Any, start: int, checker: Callable[[str], bool], triggers: Sequence[str] = ()):
+        self.tokenizer = tokenizer
+        self.start = start
+        self.checker = checker
+        self.triggers = tuple(triggers)
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs: Any) -> torch.BoolTensor:
+        done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        for row in range(input_ids.shape[0]):
+            if self.triggers:
+                last = self.tokenizer.decode(input_ids[row, -1:], skip_special_tokens=True)
+                if not any(t in last for t in self.triggers):
+                    continue
+            text = self.tokenizer.decode(input_ids[row, self.start:], skip_special_tokens=True)
+            done[row] = self.checker(text)
+        return done
+
+
+@dataclass
+class GenerationRequest:
+    input_ids: List[int]
+    future: Future = field(default_factory=Future)
+    # transformers streamer (e.g. TextIteratorStreamer); such requests are never batched
+    streamer: Optional[Any] = None
+
+
+class GenerationScheduler:
+    def __init__(
+        self,
+        model: Any,
+        tokenizer: Any,
+        gen_cfg: Dict[str, Any],
+        max_batch_size: int = 4,
+        batch_wait_ms: float = 20.0,
+        prefix_cache_size: int = 2,
+        stop_checker: Optional[Callable[[str], bool]] = None,
+        stop_triggers: Sequence[str] = (),
+    ):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.gen_cfg = gen_cfg
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_wait = batch_wait_ms / 1000.0
+        self.prefix_cache = PrefixKVCache(prefix_cache_size)
+        self._use_prefix_cache = prefix_cache_size > 0
+        self._use_batch_prefix = prefix_cache_size > 0
+        self.stop_checker = stop_checker
+        self.stop_triggers = stop_triggers
+        self._queue: "queue.Queue[GenerationRequest]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    # ───────── client side ───────── #
+    def generate(self, input_ids: List[int]) -> List[int]:
+        """Generated token ids for *input_ids*; blocks until the scheduler has run the request."""
+        return self.submit(GenerationRequest(input_ids)).result()
+
+    def submit(self, request: GenerationRequest) -> Future:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="local-llm-scheduler", daemon=True)
+                    self._thread.start()
+        self._queue.put(request)
+        return request.future
+
+    # ───────── scheduler thread ───────── #
+    def _collect(self) -> List[GenerationRequest]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            plain = [r for r in batch if r.streamer is None]
+            groups = [[r] for r in batch if r.streamer is not None]
+            if plain:
+                groups.append(plain)
+            for group in groups:
+                self._run(group)
+
+    def _run(self, batch: List[GenerationRequest]) -> None:
+        try:
+            if len(batch) == 1:
+                results = [self._generate_single(batch[0])]
+            else:
+                results = self._generate_batch(batch)
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+        except Exception as e:
+            logger.exception("Local generation failed")
+            for request in batch:
+                if request.streamer is not None:
+                    request.streamer.end()  # release the consumer blocked on the streamer
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+    def _common_kwargs(self, prompt_len: int) -> Dict[str, Any]:
+        kwargs = {
+            "eos_token_id": self.tokenizer.eos_token_id,
+            "pad_token_id": self.tokenizer.pad_token_id,
+            **self.gen_cfg,
+        }
+        if self.stop_checker is not None:
+            kwargs["stopping_criteria"] = StoppingCriteriaList(
+                [TextStoppingCriteria(self.tokenizer, prompt_len, self.stop_checker, self.stop_triggers)]
+            )
+        return kwargs
+
+    def _generate_single(self, request: GenerationRequest, **extra: Any) -> List[int]:
+        ids = request.input_ids
+        device = self.model.device
+        kwargs = {
+            "input_ids": torch.tensor([ids], device=device),
+            "attention_mask": torch.ones((1, len(ids)), dtype=torch.long, device=device),
+            **self._common_kwargs(len(ids)),
+            **extra,
+        }
+        if request.streamer is not None:
+            kwargs["streamer"] = request.streamer
+        if not self._use_prefix_cache:
+            with torch.no_grad():
+                out = self.model.generate(**kwargs)
+            return out[0, len(ids):].tolist()
+
+        reused, cache = self.prefix_cache.lookup(ids)
+        try:
+            with torch.no_grad():
+                out = self.model.generate(
+                    **kwargs,
+                    past_key_values=cache if cache is not None else DynamicCache(),
+                    return_dict_in_generate=True,
+                )
+        except (TypeError, ValueError, AttributeError) as e:
+            # remote-code models without Cache support: plain generation from now on
+            logger.warning(f"Prefix KV-cache disabled for this model: {e}")
+            self._use_prefix_cache = False
+            if request.streamer is not None and hasattr(request.streamer, "next_tokens_are_prompt"):
+                request.streamer.next_tokens_are_prompt = True  # the retry puts the prompt again
+            return self._generate_single(request, **extra)
+
+        sequence = out.sequences[0].tolist()
+        if isinstance(out.past_key_values, DynamicCache):
+            self.prefix_cache.store(sequence, out.past_key_values)
+        logger.debug(f"Local generation: {reused}/{len(ids)} prompt tokens from prefix cache")
+        return sequence[len(ids):]
+
+    def _shared_prefix(self, batch: List[GenerationRequest]) -> Tuple[int, Optional[DynamicCache]]:
+        """Length and KV cache of the prefix all prompts of *batch* share (0, None if not worth it)."""
+        first = batch[0].input_ids
+        # every row keeps at least one token of its own to encode
+        shared = min(len(r.input_ids) for r in batch) - 1
+        for r in batch[1:]:
+            shared = min(shared, PrefixKVCache._common_prefix(first, r.input_ids))
+        if shared < MIN_PREFIX_TOKENS:
+            return 0, None
+        reused, cache = self.prefix_cache.lookup(first, limit=shared)
+        if reused < shared:
+            # prefill the shared prefix once (instead of once per row) and keep it for later batches
+            with torch.no_grad():
+                out = self.model(
+                    input_ids=torch.tensor([first[:shared]], device=self.model.device),
+                    past_key_values=DynamicCache(),
+                    use_cache=True,
+                )
+            self.prefix_cache.store(first[:shared], out.past_key_values)
+            reused, cache = shared, prefix_copy(out.past_key_values, shared)
+        return reused, cache
+
+    def _generate_batch(self, batch: List[GenerationRequest]) -> List[List[int]]:
+        prefix_len, cache = 0, None
+        if self._use_batch_prefix:
+            try:
+                prefix_len, cache = self._shared_prefix(batch)
+            except (TypeError, ValueError, AttributeError) as e:
+                logger.warning(f"Batched prefix cache disabled for this model: {e}")
+                self._use_batch_prefix = False
+        if cache is not None:
+            try:
+                return self._generate_rows(batch, prefix_len, cache)
+            except (TypeError, ValueError, AttributeError, RuntimeError) as e:
+                logger.warning(f"Batched prefix cache disabled for this model: {e}")
+                self._use_batch_prefix = False
+        return self._generate_rows(batch, 0, None)
+
+    def _generate_rows(self, batch: List[GenerationRequest], prefix_len: int, cache: Optional[DynamicCache]) -> List[List[int]]:
+        # rows: shared prefix | left padding | own suffix, so every prompt ends at the same position;
+        # the attention mask hides the padding and positions are derived from the mask
+        suffixes = [r.input_ids[prefix_len:] for r in batch]
+        prefix = batch[0].input_ids[:prefix_len]
+        width = max(len(s) for s in suffixes)
+        pad = self.tokenizer.pad_token_id
+        input_ids = [prefix + [pad] * (width - len(s)) + s for s in suffixes]
+        attention = [[1] * prefix_len + [0] * (width - len(s)) + [1] * len(s) for s in suffixes]
+        total = prefix_len + width
+        extra: Dict[str, Any] = {}
+        if cache is not None:
+            cache.batch_repeat_interleave(len(batch))
+            extra["past_key_values"] = cache
+        device = self.model.device
+        with torch.no_grad():
+            out = self.model.generate(
+                input_ids=torch.tensor(input_ids, device=device),
+                attention_mask=torch.tensor(attention, dtype=torch.long, device=device),
+                **self._common_kwargs(total),
+                **extra,
+            )
+        logger.debug(f"Local generation: batch of {len(batch)}, {prefix_len} shared prefix tokens from cache, "
+                     f"suffixes padded to {width} tokens")
+        return [row[total:].tolist() for row in out]
@@ -0,0 +1,206 @@
+"""
+Tool-calling contract shared by the local chat models (ChatLocalTools, ChatGGUFTools).
+
+The model sees the tools through its chat template; a reply containing a tool call
+(Hermes ``<tool_call>{...}</tool_call>``, Yandex ``[TOOL_CALL_START]name\\n{...}``
+or a bare ``{"name": ..., "parameters": ...}`` object as emitted by Llama 3.1) is
+executed right away and generation continues with the tool result, up to
+``max_tool_calls`` times.  Subclasses only implement ``_complete(history) -> str``.
+"""
+from __future__ import annotations
+import asyncio, copy, json, logging, re, uuid
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from pydantic import PrivateAttr
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage,
+)
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+# ─────────────────────── regex for tool‑calls ───────────────────── #
+_HERMES_RE = re.compile(r"<tool_call>\s*(\{.*?\})\s*</tool_call>", re.DOTALL)
+#_YANDEX_RE = re.compile(r"\[TOOL_CALL_START\](\w+)\s*\n\s*(\{.*?\})", re.DOTALL)
+_YANDEX_RE = re.compile(r"\[TOOL_CALL_START\]\s*(\w+)\s*\r?\n\s*(\{.*?\})",  re.DOTALL)
+_BARE_JSON_RE = re.compile(r"^\s*(\{.*\})\s*$", re.DOTALL)
+
+
+# a complete tool call always ends with one of these (</tool_call> or the closing brace of the JSON)
+TOOL_CALL_TRIGGERS = (">", "}")
+_TOOL_MARKERS = ("<tool_call>", "[TOOL_CALL_START]")
+
+
+def _parse_tool_call(text: str) -> Optional[Dict[str, Any]]:
+    if m := _HERMES_RE.search(text):
+        data = json.loads(m.group(1))
+        return {"name": data["name"], "arguments": data.get("arguments", {})}
+    if m := _YANDEX_RE.search(text):
+        # raw_decode instead of the regex group: the arguments may contain nested objects
+        args, _ = json.JSONDecoder().raw_decode(text[m.start(2):].replace("'", '"'))
+        return {"name": m.group(1).strip(), "arguments": args}
+    if m := _BARE_JSON_RE.match(text):
+        data = json.loads(m.group(1))
+        if isinstance(data, dict) and "name" in data and ("parameters" in data or "arguments" in data):
+            return {"name": data["name"], "arguments": data.get("parameters", data.get("arguments", {}))}
+    return None
+
+
+def parse_tool_call(text: str) -> Optional[Dict[str, Any]]:
+    """{"name": ..., "arguments": {...}} of the first tool call in *text*, or None."""
+    try:
+        return _parse_tool_call(text)
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        logging.warning("Malformed tool call in model output: %s", e)
+    return None
+
+
+def tool_call_complete(text: str) -> bool:
+    """True once *text* holds a whole, parseable tool call (used to stop generation early)."""
+    try:
+        return _parse_tool_call(text) is not None
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return False
+
+
+def emittable_length(text: str) -> int:
+    """Length of the prefix of *text* that can be streamed: everything before a (possibly partial) tool-call marker."""
+    if text.lstrip().startswith("{"):
+        return 0  # may turn out to be a bare JSON tool call
+    cut = len(text)
+    for marker in _TOOL_MARKERS:
+        idx = text.find(marker)
+        if idx >= 0:
+            cut = min(cut, idx)
+            continue
+        for k in range(min(len(marker) - 1, len(text)), 0, -1):
+            if text.endswith(marker[:k]):
+                cut = min(cut, len(text) - k)
+                break
+    return cut
+
+
+# ───────────────────── helpers ───────────────────── #
+def _coerce_content(raw: Any) -> str:
+    if isinstance(raw, str):
+        return raw
+    if isinstance(raw, list):
+        return " ".join(
+            (p["text"] if isinstance(p, dict) and "text" in p else str(p))
+            for p in raw
+        )
+    return str(raw)
+
+
+def _msgs_to_hf(msgs: Sequence[BaseMessage]) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for m in msgs:
+        if isinstance(m, (SystemMessage, HumanMessage)):
+            #out.append({"role": "system", "content": _coerce_content(m.content)})
+            out.append({"role": "user", "content": _coerce_content(m.content)})
+        elif isinstance(m, ToolMessage):
+            out.append({"role": "tool", "content": _coerce_content(m.content), "name": m.name})
+        elif isinstance(m, AIMessage):
+            entry: Dict[str, Any] = {
+                "role": "assistant",
+                "content": _coerce_content(m.content or ""),
+            }
+            entry |= m.additional_kwargs
+            out.append(entry)
+        else:
+            raise ValueError(f"Unknown message type: {type(m)}")
+    return out
+
+
+# ─────────────────────── base class ─────────────────────── #
+class LocalToolsChatModel(BaseChatModel):
+    """Tool registry, .bind_tools and the automatic tool-calling loop of local chat models."""
+
+    _tool_registry: Dict[str, Union[BaseTool, callable]] = PrivateAttr(default_factory=dict)
+    _tools_schema: List[Dict[str, Any]] = PrivateAttr(default_factory=list)
+    _max_calls: int = PrivateAttr(default=3)
+    _verbose: bool = PrivateAttr(default=False)
+
+    # ───────── tool registry / bind_tools ───────── #
+    def _register_tools(self, tools: Sequence[BaseTool | callable]) -> None:
+        reg = dict(getattr(self, "_tool_registry", {}))
+        for t in tools:
+            reg[t.name if isinstance(t, BaseTool) else t.__name__] = t
+        schema = [convert_to_openai_tool(t) for t in reg.values()]
+        object.__setattr__(self, "_tool_registry", reg)
+        object.__setattr__(self, "_tools_schema", schema)
+
+    def bind_tools(self, tools: Sequence[BaseTool | callable]) -> "LocalToolsChatModel":
+        clone: "LocalToolsChatModel" = copy.copy(self)
+        clone._register_tools(tools)
+        return clone
+
+    # ───────── backend ───────── #
+    def _complete(self, history: List[BaseMessage]) -> str:
+        """Render *history* with the model's chat template and return the generated text."""
+        raise NotImplementedError
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, **kw):
+        # generation and tools are blocking: keep them off the event loop
+        return await asyncio.to_thread(self._generate, messages, stop=stop, **kw)
+
+    # ───────── the tool loop ───────── #
+    def _run_tool(self, name: str, args: Dict[str, Any]) -> List[BaseMessage]:
+        tool_fn = self._tool_registry[name]
+        try:
+            if isinstance(tool_fn, BaseTool):
+                result = tool_fn.invoke(args)          # ⬅️ ключевая строка
+            else:
+                result = tool_fn(**args)
+        except Exception as e:
+            logging.exception("Tool %s failed: %s", name, e)
+            result = f"ERROR: {e}"
+
+        call_id = str(uuid.uuid4())
+        if self._verbose:
+            logging.debug("Tool %s → %s", name, result)
+        return [
+            AIMessage(
+                content="",
+                additional_kwargs={
+                    "function_call": {"name": name, "arguments": json.dumps(args, ensure_ascii=False)},
+                    "tool_calls": [
+                        {
+                            "id": call_id,
+                            "type": "function",
+                            "function": {"name": name, "arguments": json.dumps(args, ensure_ascii=False)},
+                        }
+                    ],
+                },
+            ),
+            ToolMessage(name=name, content=str(result), tool_call_id=call_id),
+        ]
+
+    def _apply_tool_call(self, text: str, history: List[BaseMessage]) -> bool:
+        """Run the tool called in *text* and append the call and its result to *history*."""
+        tool_data = parse_tool_call(text)
+        if not tool_data:
+            return False
+        if tool_data["name"] not in self._tool_registry:
+            logging.warning("Unknown tool: %s", tool_data["name"])
+            return False
+        history.extend(self._run_tool(tool_data["name"], tool_data["arguments"] or {}))
+        return True
+
+    def _generate(self, messages: List[BaseMessage], stop=None, **kw) -> ChatResult:
+        history = list(messages)
+        remaining = self._max_calls
+
+        while True:
+            text = self._complete(history)
+            if self._verbose:
+                logging.debug("LLM raw → %s", text)
+
+            if remaining > 0 and self._apply_tool_call(text, history):
+                remaining -= 1
+                continue  # regenerate final answer
+
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
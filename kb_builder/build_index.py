@@ -0,0 +1,53 @@
+"""
+Builds the assistant FAISS index (config.ASSISTANT_INDEX_FOLDER) from the complexes KB.
+
+Every text section of a complex is split into the same paragraphs the complex KB tools
+use; a paragraph becomes one document with id "<complex_id>.<field>.<n>" (what
+benchmarks/golden_questions.json refers to).  The folder is written by
+v01/index_store.save_vectorstore: index.faiss + docstore.sqlite, no pickle.
+
+    python kb_builder/build_index.py
+    python kb_builder/build_index.py data/residential_complexes.json ./data/index/neuro_index hnsw
+"""
+import json, os, sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.docstore.document import Document
+
+import config
+from agents.tools.complex_kb import TEXT_FIELDS, split_paragraphs
+from utils.utils import get_embeddings
+from v01.index_store import build_vectorstore, save_vectorstore
+
+import logging
+logger = logging.getLogger(__name__)
+
+JSON_PATH = "data/residential_complexes.json"
+
+
+def complex_documents(complexes: list[dict]) -> list[Document]:
+    documents = []
+    for rec in complexes:
+        for field in TEXT_FIELDS:
+            for idx, text in enumerate(split_paragraphs(rec.get(field) or "")):
+                documents.append(Document(
+                    id=f"{rec['id']}.{field}.{idx}",
+                    page_content=f"{rec['name']}. {text}",
+                    metadata={"complex_id": rec["id"], "field": field},
+                ))
+    return documents
+
+
+def build_index(json_path: str = JSON_PATH, folder: str = config.ASSISTANT_INDEX_FOLDER, index_type: str | None = None) -> None:
+    with open(json_path, encoding="utf-8") as f:
+        complexes = json.load(f)
+    documents = complex_documents(complexes)
+    vectorstore = build_vectorstore(documents, get_embeddings(), index_type=index_type)
+    save_vectorstore(vectorstore, folder)
+    print(f"✓ Indexed {len(documents)} paragraphs of {len(complexes)} complexes into {folder}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build_index(*sys.argv[1:4])
@@ -4,70 +4,131 @@ logging.basicConfig(level=logging.INFO)
 
 import config
 
-import telebot
-from telebot import types
-from telebot.apihelper import ApiTelegramException
-from langchain_core.messages import HumanMessage
+import asyncio
 
 import time, uuid, json, os, base64
-from collections import defaultdict
 
 os.environ["CUDA_VISIBLE_DEVICES"] = ""
 
-from vrecog.vrecog import recognise_text    
-
-from thread_settings import ThreadSettings
-
-from utils.utils import _send_response, summarise_image, image_to_uri, ModelType
+# ASR worker processes are spawned and re-import this module as __mp_main__:
+# only what they need is imported at module level, the bot stack is imported in run_bot()
+from vrecog.asr_service import ASRService, ASRQueueFull
 
 #from palimpsest.logger_factory import setup_logging
 
 
 def run_bot():
+    from telebot.async_telebot import AsyncTeleBot
+    from telebot import types
+    from telebot.apihelper import ApiTelegramException
+    from langchain_core.messages import HumanMessage
+
+    from thread_settings import ThreadSettings
+    from agents.supervisor import get_agent, is_answer_token
+    from agents.fast_path import collect_metrics as fast_path_metrics
+
+    from utils.utils import _asend_response, ModelType, StreamingReply
+    from utils.images import describe_image
+    from utils.dispatcher import ChatDispatcher
+    from utils.blob_store import image_ref_part, prune_blobs
+    from utils.instrumentation import serve_metrics, get_metrics_handler
+    from utils.prompts import install_reload_signal
+
+    bot = AsyncTeleBot(config.TELEGRAM_BOT_TOKEN)
+    chats = {}
+    dispatcher = None
+    asr = None
+
+    async def stream_answer(chat_id, payload, usr_msg=None):
+        assistant = chats[chat_id].assistant
+        if not config.STREAM_RESPONSES:
+            events = assistant.astream(
+                payload, chats[chat_id].get_config(), stream_mode="values"
+            )
+            _printed = set()
+            async for event in events:
+                await bot.send_chat_action(chat_id=chat_id, action="typing", timeout=30)
+                await _asend_response(event, _printed, thread=chats[chat_id], bot=bot, usr_msg=usr_msg)
+            return
+
+        # tokens of the answering LLM call go straight into an edited message;
+        # messages that were not streamed (static intro, etc.) are sent from "values" events.
+        # Text the supervisor writes before a handoff is not an answer: once a tool call
+        # shows up in the same message, what was streamed of it is deleted.
+        events = assistant.astream(
+            payload, chats[chat_id].get_config(), stream_mode=["messages", "values"]
+        )
+        _printed = set()
+        _dropped = set()
+        reply, reply_id, reply_to = None, None, None
+        async for mode, event in events:
+            if mode == "messages":
+                chunk, metadata = event
+                if getattr(chunk, "tool_call_chunks", None) or getattr(chunk, "tool_calls", None):
+                    _dropped.add(chunk.id)
+                    _printed.add(chunk.id)
+                    if reply and chunk.id == reply_id:
+                        await reply.discard()
+                        reply, usr_msg = None, reply_to
+                    continue
+                if chunk.id in _dropped:
+                    continue
+                if not chunk.content or not isinstance(chunk.content, str) or not is_answer_token(metadata):
+                    continue
+                if chunk.id != reply_id:
+                    if reply:
+                        await reply.finish()
+                    reply, reply_id, reply_to = StreamingReply(bot, chat_id, usr_msg), chunk.id, usr_msg
+                    usr_msg = None
+                    _printed.add(chunk.id)
+                await reply.append(chunk.content)
+            else:
+                await bot.send_chat_action(chat_id=chat_id, action="typing", timeout=30)
+                await _asend_response(event, _printed, thread=chats[chat_id], bot=bot, usr_msg=usr_msg)
+        if reply:
+            await reply.finish()
+
+    async def reset_thread(chat_id):
+        #resetting memory
+        await chats[chat_id].assistant.ainvoke(
+            {"messages": [HumanMessage(content=[{"type": "reset", "text": "RESET"}])]}, chats[chat_id].get_config(), stream_mode="values"
+        )
 
-    bot = telebot.TeleBot(config.TELEGRAM_BOT_TOKEN)
-    chats = defaultdict(ThreadSettings)
+    async def enqueue(message, job):
+        if not dispatcher.submit(message.chat.id, job):
+            await bot.reply_to(message, "Пожалуйста, подождите: я ещё отвечаю на ваши предыдущие сообщения.")
 
     @bot.message_handler(commands=['start'])
-    def send_welcome(message):
+    async def send_welcome(message):
         user_id = message.from_user.id
         chat_id = message.chat.id
-        chats[chat_id] = ThreadSettings(user_id=user_id, chat_id=chat_id, model=ModelType.GPT)
 
-        assistant = chats[chat_id].assistant
-        #resetting memory
-        assistant.invoke(
-                {"messages": [HumanMessage(content=[{"type": "reset", "text": "RESET"}])]}, chats[chat_id].get_config(), stream_mode="values"
-        )
+        async def job():
+            chats[chat_id] = ThreadSettings(user_id=user_id, chat_id=chat_id, model=ModelType.GPT)
+            await reset_thread(chat_id)
 
-        #Generating welcome message
-        query = "Здравствуйте! Представьтесь пожалуйста и расскажите о себе."
-        messages = HumanMessage(
-            content=[{"type": "text", "text": query}]
-        )
-        events = assistant.stream(
-            {"messages": [messages]}, chats[chat_id].get_config(), stream_mode="values"
-        )
-        _printed = set()
-        for event in events:
-            bot.send_chat_action(chat_id=chat_id, action="typing", timeout=30)
-            _send_response(event, _printed, thread=chats[chat_id], bot=bot)
+            #Generating welcome message
+            query = "Здравствуйте! Представьтесь пожалуйста и расскажите о себе."
+            messages = HumanMessage(
+                content=[{"type": "text", "text": query}]
+            )
+            await stream_answer(chat_id, {"messages": [messages]})
+
+        await enqueue(message, job)
 
     @bot.message_handler(commands=['reset'])
-    def reset_memory(message):
+    async def reset_memory(message):
         user_id = message.from_user.id
         chat_id = message.chat.id
-        chats[chat_id] = ThreadSettings(user_id=user_id, chat_id=chat_id)
 
-        #resetting memory
-        assistant = chats[chat_id].assistant
-        assistant.invoke(
-            {"messages": [HumanMessage(content=[{"type": "reset", "text": "RESET"}])]}, chats[chat_id].get_config(), stream_mode="values"
-        )
-        bot.send_message(user_id, "Память бота очищена.")
+        async def job():
+            chats[chat_id] = ThreadSettings(user_id=user_id, chat_id=chat_id)
+            await reset_thread(chat_id)
+            await bot.send_message(user_id, "Память бота очищена.")
 
-    @bot.message_handler(content_types=['text', 'voice', 'photo', 'document'])
-    def handle_message(message):
+        await enqueue(message, job)
+
+    async def process_message(message):
         chat_id = message.chat.id
         user_id = message.from_user.id
         image_uri = []
@@ -76,24 +137,23 @@ def run_bot():
         if message.content_type == 'voice':
             #bot.send_message(user_id, "Распознаю голосовое сообщение...")
             try:
-                bot.send_chat_action(chat_id=chat_id, action="upload_voice", timeout=30)
-                file_info = bot.get_file(message.voice.file_id)
-                downloaded_file = bot.download_file(file_info.file_path)
-                ogg_file_path = f"voice_{user_id}_{uuid.uuid4()}.ogg"
-                with open(ogg_file_path, 'wb') as f:
-                    f.write(downloaded_file)
+                await bot.send_chat_action(chat_id=chat_id, action="upload_voice", timeout=30)
+                file_info = await bot.get_file(message.voice.file_id)
+                downloaded_file = await bot.download_file(file_info.file_path)
 
-                # Передаём путь к OGG-файлу в recognise_text
-                query = recognise_text(ogg_file_path)
-                os.remove(ogg_file_path)
+                # OGG декодируется в памяти, распознавание — в пуле процессов ASR
+                query = await asr.transcribe(downloaded_file)
 
                 if not query:
-                    bot.send_message(user_id, "Не удалось распознать голосовое сообщение. Пожалуйста, отправьте текст вручную или попробуйте снова.")
+                    await bot.send_message(user_id, "Не удалось распознать голосовое сообщение. Пожалуйста, отправьте текст вручную или попробуйте снова.")
                     return
                 logging.info(f"Распознанный текст:\n{query}")
+            except ASRQueueFull:
+                await bot.send_message(user_id, "Сейчас слишком много голосовых сообщений. Пожалуйста, попробуйте чуть позже или напишите текстом.")
+                return
             except Exception as e:
                 logging.error(f"Error processing voice message: {str(e)}")
-                bot.send_message(user_id, "Не удалось распознать голосовое сообщение. Пожалуйста, отправьте текст вручную или попробуйте снова.")
+                await bot.send_message(user_id, "Не удалось распознать голосовое сообщение. Пожалуйста, отправьте текст вручную или попробуйте снова.")
                 return
         elif message.content_type in ('photo', 'document'):
 
@@ -102,7 +162,7 @@ def run_bot():
             summary = ""
             query = message.any_text or ""
             try:
-                bot.send_chat_action(chat_id=chat_id, action="upload_photo", timeout=30)
+                await bot.send_chat_action(chat_id=chat_id, action="upload_photo", timeout=30)
                 if message.content_type == 'photo':
                     # photo array is sorted by size; take the last (largest) thumb
                     file_id = message.photo[-1].file_id
@@ -110,60 +170,72 @@ def run_bot():
                     # document
                     file_id = message.document.file_id
 
-                file_info = bot.get_file(file_id)
-                img_bytes = bot.download_file(file_info.file_path)
+                file_info = await bot.get_file(file_id)
+                img_bytes = await bot.download_file(file_info.file_path)
 
-                # Convert to Base‑64 data‑URI
-                uri = image_to_uri(base64.b64encode(img_bytes).decode())
+                # downsized JPEG + caption (cached for repeated pictures)
                 #bot.send_message(user_id, "Обрабатываю изображение…")
-                summary = summarise_image(uri)
+                img_bytes, summary = await asyncio.to_thread(describe_image, img_bytes)
                 query = query + "\n\n" + summary
-                image_uri = [{"type": "image_url", "image_url": {"url": uri}}]
+                # the state only keeps a reference to the stored image
+                image_uri = [await asyncio.to_thread(image_ref_part, img_bytes)]
                 #bot.send_message(chat_id, f"🖼️  Вот краткое описание изображения:\n\n{summary}")
             except Exception as e:
                 logging.exception("Error processing image")
-                bot.send_message(user_id,
+                await bot.send_message(user_id,
                                 "Не удалось обработать изображение. "
                                 "Попробуйте отправить другое или повторить позже.")
         else:
             query = message.text
 
-
-        assistant = chats[chat_id].assistant
-        #if not message.reply_to_message:
-        #    assistant.invoke(
-        #        {"messages": [HumanMessage(content=[{"type": "reset", "text": "RESET"}])]}, chats[chat_id].get_config(), stream_mode="values"
-        #    )
-
         messages = HumanMessage(
             content=[{"type": "text", "text": query}] + image_uri
         )
+        await stream_answer(chat_id, {"messages": [messages]}, usr_msg=message)
 
-        events = assistant.stream(
-            {"messages": [messages]}, chats[chat_id].get_config(), stream_mode="values"
+    @bot.message_handler(content_types=['text', 'voice', 'photo', 'document'])
+    async def handle_message(message):
+        await enqueue(message, lambda: process_message(message))
+
+    async def main():
+        nonlocal dispatcher, asr
+        dispatcher = ChatDispatcher(
+            max_concurrency=config.BOT_MAX_CONCURRENCY,
+            max_queue_per_chat=config.BOT_CHAT_QUEUE_SIZE,
+            max_pending=config.BOT_MAX_PENDING,
         )
-        _printed = set()
-        for event in events:
-            bot.send_chat_action(chat_id=chat_id, action="typing", timeout=30)
-            _send_response(event, _printed, thread=chats[chat_id], bot=bot, usr_msg=message)
-
-    while True:
-        try:
-            bot.polling(none_stop=True, timeout=60)
-        except ApiTelegramException as e:
-            logging.error(f"Telegram API error: {e}")
-            time.sleep(5)
-        except HTTPException as e:
-            logging.error(f"HTTP error: {e}")
-            time.sleep(5)
-        except ConnectionError:
-            logging.error(f"Connection error: {e}")
-            time.sleep(5)
-        except Exception as e:
-            logging.error(f"Unexpected error in bot polling: {e}")
-            time.sleep(5)
+        asr = ASRService()
+        get_metrics_handler().registry.register_collector(asr.collect_metrics)
+        get_metrics_handler().registry.register_collector(fast_path_metrics)
+        # build the shared graph before the first message arrives
+        await asyncio.to_thread(get_agent, ModelType.GPT)
+        logging.info(f"Pruned {await asyncio.to_thread(prune_blobs)} expired images")
+        install_reload_signal()
+        if config.ASR_PREWARM:
+            # loads the ASR models while polling already serves text messages
+            asyncio.create_task(asr.prewarm())
+        if config.INSTRUMENTATION_ENABLED and config.METRICS_PORT:
+            serve_metrics(config.METRICS_PORT)
+
+        while True:
+            try:
+                await bot.polling(non_stop=True, timeout=60)
+            except ApiTelegramException as e:
+                logging.error(f"Telegram API error: {e}")
+                await asyncio.sleep(5)
+            except HTTPException as e:
+                logging.error(f"HTTP error: {e}")
+                await asyncio.sleep(5)
+            except ConnectionError as e:
+                logging.error(f"Connection error: {e}")
+                await asyncio.sleep(5)
+            except Exception as e:
+                logging.error(f"Unexpected error in bot polling: {e}")
+                await asyncio.sleep(5)
+
+    asyncio.run(main())
 
 
 if __name__ == '__main__':
     #setup_logging("sd_assistant", project_console_level=logging.DEBUG, other_console_level=logging.WARNING)
-    run_bot()
\ No newline at end of file
+    run_bot()
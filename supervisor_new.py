@@ -5,8 +5,8 @@ import os
 from typing import Literal
 
 # ── 1. ENVIRONMENT ─────────────────────────────────────────────────────────────
-os.environ["LANGCHAIN_ENDPOINT"]    = "https://api.smith.langchain.com"
-os.environ["LANGCHAIN_TRACING_V2"]  = "true"
+os.environ.setdefault("LANGCHAIN_ENDPOINT", "https://api.smith.langchain.com")
+os.environ.setdefault("LANGCHAIN_TRACING_V2", "true")
 
 from langchain_openai import ChatOpenAI
 from langgraph_supervisor import create_supervisor
@@ -0,0 +1,40 @@
+"""
+Shared setup of the unit tests: the repository root on sys.path, no network calls.
+
+Run from the repository root:
+    python -m pytest
+"""
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# ChatOpenAI clients are built at import time; the tests never reach the API
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("COMPLEX_KB_EMBEDDINGS", "False")
+
+import pytest
+
+COMPLEXES = [
+    {"id": "vesna", "name": "Весна", "alternative_name": "Весна-парк", "district": "Северный",
+     "ready_date": "2026", "comfort_level": "комфорт",
+     "general_info": "Поселок-парк у реки с собственной набережной и прогулочной зоной для всей семьи.",
+     "financial_conditions": "Семейная ипотека от 6% на весь срок кредита, рассрочка без переплаты на год."},
+    {"id": "7ya", "name": "7Я", "district": "Центральный", "ready_date": "2027",
+     "general_info": "Квартал с детским садом и школой во дворе, закрытая территория без машин."},
+]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def complexes_data(tmp_path_factory):
+    """agents.tools.tools reads data/residential_complexes.json relative to the working directory."""
+    workdir = tmp_path_factory.mktemp("workdir")
+    os.makedirs(workdir / "data")
+    with open(workdir / "data" / "residential_complexes.json", "w", encoding="utf-8") as f:
+        json.dump(COMPLEXES, f, ensure_ascii=False)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    yield workdir
+    os.chdir(cwd)
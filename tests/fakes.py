@@ -0,0 +1,30 @@
+"""Deterministic stand-ins for the embedding model."""
+import re
+import zlib
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class BagOfWordsEmbeddings:
+    """Hashed bag of word prefixes: texts sharing words get similar vectors."""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.calls = 0
+
+    def _vector(self, text: str) -> list:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in _WORD_RE.findall(text.lower()):
+            vector[zlib.crc32(word[:5].encode("utf-8")) % self.dim] += 1.0
+        vector[0] += 1e-3  # no all-zero vectors
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self._vector(text)
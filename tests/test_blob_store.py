@@ -0,0 +1,58 @@
+import base64
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+import pytest
+
+from utils import blob_store
+
+PNG = b"\x89PNG\r\n\x1a\n fake image"
+DATA_URI = "data:image/png;base64," + base64.b64encode(PNG).decode()
+
+
+@pytest.fixture(autouse=True)
+def image_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store.config, "IMAGE_STORE_PATH", str(tmp_path / "images"))
+
+
+def _with_image(text="что это за планировка?", url=DATA_URI):
+    return HumanMessage(content=[{"type": "text", "text": text}, {"type": "image_url", "image_url": {"url": url}}])
+
+
+def test_evict_images_stores_blob_and_keeps_original():
+    msg = _with_image()
+    evicted = blob_store.evict_images(msg)
+    assert msg.content[1]["type"] == "image_url"  # a copy, the input is not modified
+    ref = evicted.content[1]
+    assert ref["type"] == "image_ref" and ref["mime_type"] == "image/png"
+    assert blob_store.get_blob(ref["ref"]) == PNG
+    assert evicted.content[0] == msg.content[0]
+
+
+def test_evict_images_leaves_other_messages_alone():
+    remote = _with_image(url="https://example.com/plan.png")
+    assert blob_store.evict_images(remote) is remote
+    answer = AIMessage(content="Это двухкомнатная квартира.")
+    assert blob_store.evict_images(answer) is answer
+    broken = _with_image(url="data:image/png;base64,@@@")
+    assert blob_store.evict_images(broken) is broken
+
+
+def test_hook_inlines_only_the_newest_image():
+    old = blob_store.evict_images(_with_image("старое фото"))
+    answer = AIMessage(content="Это студия.")
+    new = blob_store.evict_images(_with_image("а это?"))
+    state = {"messages": [old, answer, new]}
+    resolved = blob_store.resolve_images_hook(state)["llm_input_messages"]
+    assert resolved[0].content == [{"type": "text", "text": "старое фото"}]
+    assert resolved[1] is answer
+    assert resolved[2].content[1] == {"type": "image_url", "image_url": {"url": DATA_URI}}
+    # the state itself still holds references only
+    assert state["messages"][2].content[1]["type"] == "image_ref"
+
+
+def test_hook_skips_missing_blob():
+    msg = HumanMessage(content=[{"type": "text", "text": "фото"},
+                                {"type": "image_ref", "ref": "0" * 64, "mime_type": "image/jpeg"}])
+    resolved = blob_store.resolve_images_hook({"messages": [msg]})["llm_input_messages"]
+    assert resolved[0].content == [{"type": "text", "text": "фото"}]
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+
+import pytest
+
+from agents import classifier
+
+from fakes import BagOfWordsEmbeddings
+
+POSITIVES = ["Итак, подведём итог: вы выбрали квартиру в ЖК Весна, созвон завтра в 17:00.",
+             "Резюмирую: двушка до 10 млн, семейная ипотека, менеджер перезвонит."]
+NEGATIVES = ["Какой у вас бюджет на покупку?", "В ЖК Весна есть квартиры с отделкой."]
+
+
+@pytest.fixture
+def task(monkeypatch):
+    embeddings = BagOfWordsEmbeddings()
+    monkeypatch.setattr(classifier, "get_embeddings", lambda: embeddings)
+    monkeypatch.setattr(classifier, "_cache", OrderedDict())
+    monkeypatch.setattr(classifier, "_embeddings_failed", False)
+    monkeypatch.setattr(classifier, "load_labels", lambda path=classifier.LABELS_PATH: {})
+    monkeypatch.setattr(classifier.config, "CLASSIFIER_BACKEND", "embeddings")
+    monkeypatch.setattr(classifier.config, "CLASSIFIER_MIN_MARGIN", None)
+    calls = []
+
+    def fallback(text):
+        calls.append(text)
+        return True
+
+    monkeypatch.setitem(classifier._tasks, "test", classifier.ClassifierTask("test", POSITIVES, NEGATIVES, fallback))
+    return calls
+
+
+def test_result_is_cached_per_message_id(task):
+    assert classifier.classify("test", "Подведём итог разговора", message_id="m1") is True
+    assert classifier.classify("test", "Подведём итог разговора", message_id="m1") is True
+    assert len(task) == 1
+    classifier.classify("test", "Подведём итог разговора", message_id="m2")
+    assert len(task) == 2
+
+
+def test_text_hash_is_the_key_without_message_id(task):
+    classifier.classify("test", "Какой бюджет?")
+    classifier.classify("test", "Какой бюджет?")
+    classifier.classify("test", "Когда созвонимся?")
+    assert task == ["Какой бюджет?", "Когда созвонимся?"]
+
+
+def test_task_without_labels_always_asks_the_fallback(task):
+    # no labelled examples: the threshold stays at inf, the embeddings never decide alone
+    classifier.classify("test", POSITIVES[0], message_id="m1")
+    assert classifier.min_margin("test") == float("inf")
+    assert task == [POSITIVES[0]]
+
+
+def test_confident_margin_skips_the_fallback(task, monkeypatch):
+    monkeypatch.setattr(classifier.config, "CLASSIFIER_MIN_MARGIN", 0.05)
+    assert classifier.classify("test", NEGATIVES[0], message_id="m1") is False
+    assert task == []
+
+
+def test_fallback_without_embeddings(task, monkeypatch):
+    def broken():
+        raise OSError("no local model")
+
+    monkeypatch.setattr(classifier, "get_embeddings", broken)
+    monkeypatch.setattr(classifier.config, "CLASSIFIER_MIN_MARGIN", 0.0)
+    assert classifier.margin("test", "что угодно") is None
+    assert classifier.classify("test", "что угодно", message_id="m1") is True
+    assert task == ["что угодно"]
+
+
+@pytest.mark.parametrize("margins, labels, expected", [
+    ([], [], float("inf")),
+    ([0.3, -0.2], [True, False], 0.0),
+    ([0.3, 0.05, -0.1, -0.02], [True, False, False, True], 0.05),
+])
+def test_calibrate(margins, labels, expected):
+    threshold = classifier.calibrate(margins, labels)
+    assert threshold == pytest.approx(expected)
+    assert all(abs(m) < threshold or (m > 0) == y for m, y in zip(margins, labels))
+
+
+def test_threshold_is_measured_on_labelled_examples(task, monkeypatch):
+    labels = {"test": [{"text": POSITIVES[0], "label": True}, {"text": NEGATIVES[1], "label": False},
+                       {"text": "Итак, в ЖК Весна есть квартиры с отделкой.", "label": False}]}
+    monkeypatch.setattr(classifier, "load_labels", lambda path=classifier.LABELS_PATH: labels)
+    classifier.classify("test", NEGATIVES[0], message_id="m1")
+    measured = classifier._tasks["test"].min_margin
+    assert 0.0 <= measured < float("inf")
+    assert measured == classifier.min_margin("test")
@@ -0,0 +1,126 @@
+import asyncio
+
+from utils.dispatcher import ChatDispatcher
+
+
+async def _until(predicate, timeout: float = 1.0) -> None:
+    async def poll():
+        while not predicate():
+            await asyncio.sleep(0.005)
+    await asyncio.wait_for(poll(), timeout)
+
+
+async def _drain(dispatcher: ChatDispatcher) -> None:
+    # idle workers only: a worker cancelled while taking a job off its queue may miss the cancellation
+    await _until(lambda: dispatcher.pending == 0 and dispatcher.active == 0)
+
+
+def test_jobs_of_one_chat_run_in_order():
+    async def scenario():
+        dispatcher = ChatDispatcher(max_concurrency=4)
+        done, log = asyncio.Event(), []
+
+        def job(i):
+            async def run():
+                await asyncio.sleep(0.01 * (3 - i))  # later jobs are faster: order comes from the queue only
+                log.append(i)
+                if i == 2:
+                    done.set()
+            return run
+
+        for i in range(3):
+            assert dispatcher.submit(1, job(i))
+        await asyncio.wait_for(done.wait(), 1)
+        await _drain(dispatcher)
+        return log
+
+    assert asyncio.run(scenario()) == [0, 1, 2]
+
+
+def test_semaphore_bounds_concurrent_chats():
+    async def scenario():
+        dispatcher = ChatDispatcher(max_concurrency=2)
+        peak, finished = [0], []
+
+        async def job():
+            peak[0] = max(peak[0], dispatcher.active)
+            await asyncio.sleep(0.02)
+            finished.append(1)
+
+        for chat_id in range(5):
+            assert dispatcher.submit(chat_id, job)
+        await _until(lambda: len(finished) == 5)
+        return peak[0]
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_full_chat_queue_is_rejected():
+    async def scenario():
+        dispatcher = ChatDispatcher(max_queue_per_chat=1)
+        release = asyncio.Event()
+
+        async def job():
+            await release.wait()
+
+        accepted = [dispatcher.submit(1, job)]
+        await _until(lambda: dispatcher.active == 1)  # the worker took the first job, the queue is empty again
+        accepted += [dispatcher.submit(1, job), dispatcher.submit(1, job)]
+        other_chat = dispatcher.submit(2, job)
+        release.set()
+        await _drain(dispatcher)
+        return accepted, other_chat
+
+    assert asyncio.run(scenario()) == ([True, True, False], True)
+
+
+def test_overload_rejects_all_chats():
+    async def scenario():
+        dispatcher = ChatDispatcher(max_concurrency=1, max_pending=2)
+        release = asyncio.Event()
+
+        async def job():
+            await release.wait()
+
+        results = [dispatcher.submit(chat_id, job) for chat_id in range(3)]
+        release.set()
+        await _drain(dispatcher)
+        return results
+
+    # nothing has started yet, so the first two jobs are pending and the third one is over the limit
+    assert asyncio.run(scenario()) == [True, True, False]
+
+
+def test_failing_job_does_not_stop_the_chat():
+    async def scenario():
+        dispatcher = ChatDispatcher()
+        done = asyncio.Event()
+
+        async def broken():
+            raise RuntimeError("boom")
+
+        async def ok():
+            done.set()
+
+        dispatcher.submit(1, broken)
+        dispatcher.submit(1, ok)
+        await asyncio.wait_for(done.wait(), 1)
+        await _drain(dispatcher)
+        return dispatcher.active
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_idle_worker_is_removed():
+    async def scenario():
+        dispatcher = ChatDispatcher(idle_timeout=0.02)
+
+        async def job():
+            pass
+
+        dispatcher.submit(1, job)
+        worker = dispatcher._workers[1]
+        await asyncio.wait_for(worker, 1)
+        return 1 in dispatcher._queues, 1 in dispatcher._workers, dispatcher.submit(1, job)
+
+    assert asyncio.run(scenario()) == (False, False, True)
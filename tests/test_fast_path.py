@@ -0,0 +1,55 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def fast_path(complexes_data):
+    from agents import fast_path
+    return fast_path
+
+
+def _state(text, previous=()):
+    return {"messages": [*previous, HumanMessage(content=[{"type": "text", "text": text}])]}
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("Здравствуйте!", "greeting"),
+    ("добрый вечер", "greeting"),
+    ("Спасибо большое за информацию!", "thanks"),
+    ("Какие ЖК у вас есть?", "complex_list"),
+    ("А в каких жилых комплексах вы предлагаете квартиры?", "complex_list"),
+    ("Давайте начнём сначала", "reset"),
+    ("Здравствуйте, сколько стоит двушка в Весне?", None),
+    ("Спасибо, а есть ли рассрочка?", None),
+    ("Какие ЖК сдаются в этом году и по какой цене?", None),
+])
+def test_match_intent(fast_path, text, intent):
+    assert fast_path.match_intent(_state(text)) == intent
+
+
+def test_confirmation_only_after_closing_reply(fast_path):
+    offer = AIMessage(content="Хотите, я подберу варианты с отделкой?")
+    closing = AIMessage(content=fast_path._THANKS_ANSWER)
+    assert fast_path.match_intent(_state("да", [offer])) is None
+    assert fast_path.match_intent(_state("да", [closing])) == "confirmation"
+
+
+def test_only_plain_short_text(fast_path, monkeypatch):
+    monkeypatch.setattr(fast_path.config, "FAST_PATH_MAX_CHARS", 10)
+    assert fast_path.match_intent(_state("Спасибо большое за информацию!")) is None
+    image = {"type": "image_ref", "ref": "abc", "mime_type": "image/jpeg"}
+    with_image = {"messages": [HumanMessage(content=[{"type": "text", "text": "привет"}, image])]}
+    assert fast_path.match_intent(with_image) is None
+
+
+def test_complex_list_answer_and_stats(fast_path):
+    before = fast_path.fast_path_stats()
+    command = fast_path.fast_path(_state("Какие ЖК у вас есть?"))
+    assert command.goto == "__end__"
+    answer = command.update["messages"][0].content
+    assert "Весна (Весна-парк)" in answer and "7Я" in answer
+    after = fast_path.fast_path_stats()
+    assert after["total"] == before["total"] + 1
+    assert after["by_intent"]["complex_list"] == before["by_intent"].get("complex_list", 0) + 1
+    assert fast_path.fast_path(_state("Сколько стоит двушка?")).goto == "compact_history"
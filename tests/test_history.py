@@ -0,0 +1,74 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.modifier import RemoveMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES, add_messages
+
+import pytest
+
+import config
+from agents import history
+
+
+@pytest.fixture(autouse=True)
+def small_budget(monkeypatch):
+    monkeypatch.setattr(config, "HISTORY_KEEP_TURNS", 2)
+    monkeypatch.setattr(config, "HISTORY_COMPACT_CHUNK", 2)
+    monkeypatch.setattr(config, "HISTORY_TOKEN_BUDGET", 100_000)
+
+
+def _turn(i: int, tools: bool = False):
+    msgs = [HumanMessage(id=f"h{i}", content=f"вопрос {i}")]
+    if tools:
+        msgs += [
+            AIMessage(id=f"c{i}", content="", tool_calls=[{"name": "kb", "args": {}, "id": f"t{i}"}]),
+            ToolMessage(id=f"r{i}", content="результат", tool_call_id=f"t{i}"),
+        ]
+    return msgs + [AIMessage(id=f"a{i}", content=f"ответ {i}")]
+
+
+def _state(*turns):
+    messages = [m for t in turns for m in t] + [HumanMessage(id="now", content="новый вопрос")]
+    return {"messages": messages, "summary": ""}
+
+
+def test_nothing_to_do():
+    assert history.compact_history(_state(_turn(0), _turn(1))) == {}
+
+
+def test_chatter_is_removed_by_id_without_fold(monkeypatch):
+    monkeypatch.setattr(history, "summarise", lambda *a: pytest.fail("no fold expected"))
+    state = _state(_turn(0, tools=True), _turn(1))
+    update = history.compact_history(state)
+    assert [m.id for m in update["messages"]] == ["c0", "r0"]
+    assert all(isinstance(m, RemoveMessage) for m in update["messages"])
+    merged = add_messages(state["messages"], update["messages"])
+    assert [m.id for m in merged] == ["h0", "a0", "h1", "a1", "now"]
+
+
+def test_fold_replaces_old_turns_with_summary(monkeypatch):
+    seen = []
+
+    def summarise(previous, messages):
+        seen.append([m.id for m in messages])
+        return "клиент ищет двушку"
+
+    monkeypatch.setattr(history, "summarise", summarise)
+    state = _state(*(_turn(i, tools=i == 4) for i in range(5)))
+    update = history.compact_history(state)
+    assert seen == [["h0", "a0", "h1", "a1", "h2", "a2"]]
+    assert update["summary"] == "клиент ищет двушку"
+    assert update["messages"][0].id == REMOVE_ALL_MESSAGES
+    merged = add_messages(state["messages"], update["messages"])
+    assert isinstance(merged[0], SystemMessage) and merged[0].id == history.SUMMARY_MESSAGE_ID
+    assert "клиент ищет двушку" in merged[0].content
+    assert [m.id for m in merged[1:]] == ["h3", "a3", "h4", "a4", "now"]
+
+
+def test_failed_summary_keeps_history(monkeypatch):
+    def summarise(previous, messages):
+        raise TimeoutError("summary LLM timed out")
+
+    monkeypatch.setattr(history, "summarise", summarise)
+    state = _state(*(_turn(i, tools=i == 1) for i in range(5)))
+    update = history.compact_history(state)
+    assert "summary" not in update
+    assert [m.id for m in update["messages"]] == ["c1", "r1"]
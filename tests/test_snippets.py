@@ -0,0 +1,63 @@
+import config
+from agents.tools.complex_kb import ComplexKnowledgeStore
+from utils.snippets import SnippetIndex
+
+from fakes import BagOfWordsEmbeddings
+
+FILLER = "Во дворе высажены деревья и кустарники, есть лавочки и урны. "
+MORTGAGE = "Семейная ипотека оформляется под шесть процентов годовых на весь срок. "
+PARKING = "Подземный паркинг на двести машиномест расположен под домом. "
+TEXT = FILLER * 20 + MORTGAGE + FILLER * 20 + PARKING + FILLER * 20
+
+
+def test_short_text_is_not_trimmed():
+    index = SnippetIndex(embeddings=BagOfWordsEmbeddings(), span=20)
+    assert index.trim("ипотека", "Короткий текст.", max_chars=100) == "Короткий текст."
+
+
+def test_trim_keeps_relevant_windows_in_text_order():
+    index = SnippetIndex(embeddings=BagOfWordsEmbeddings(), span=12, stride=6)
+    trimmed = index.trim("семейная ипотека процентов и подземный паркинг машиномест", TEXT, max_chars=400)
+    assert len(trimmed) <= 400 + len(" … ") * 4
+    assert "ипотека" in trimmed and "паркинг" in trimmed
+    assert trimmed.index("ипотека") < trimmed.index("паркинг")
+    assert " … " in trimmed
+
+
+def test_window_embeddings_are_cached_per_text():
+    embeddings = BagOfWordsEmbeddings()
+    index = SnippetIndex(embeddings=embeddings, span=12)
+    index.trim("ипотека", TEXT, max_chars=300)
+    after_first = embeddings.calls
+    index.trim("паркинг", TEXT, max_chars=300)
+    assert embeddings.calls == after_first + 1  # only the new query is embedded
+
+
+def _store(text: str) -> ComplexKnowledgeStore:
+    return ComplexKnowledgeStore([{"id": "vesna", "presentation": text}], use_embeddings=False)
+
+
+def test_keyword_trim_picks_matching_sentences():
+    store = _store(TEXT)
+    trimmed = store._trim_keywords("Какие условия по семейной ипотеке?", TEXT, max_chars=200)
+    # the matching sentence comes first, the rest of the budget is filled from the beginning of the text
+    assert trimmed.endswith("… " + MORTGAGE.strip())
+    assert len(trimmed) <= 200
+
+
+def test_keyword_trim_without_match_keeps_the_beginning():
+    store = _store(TEXT)
+    trimmed = store._trim_keywords("бассейн", TEXT, max_chars=200)
+    assert trimmed.startswith(FILLER.strip())
+    assert len(trimmed) <= 200
+
+
+def test_search_trims_long_paragraphs_without_embeddings():
+    long_text = FILLER * 15 + MORTGAGE + FILLER * 15
+    assert len(long_text) > config.SNIPPET_MAX_CHARS
+    store = _store(long_text)
+    found = store.search("vesna", "семейная ипотека")
+    assert len(found) == 1
+    assert MORTGAGE.strip() in found[0].text
+    assert len(found[0].text) <= config.SNIPPET_MAX_CHARS
+    assert store.search("vesna", "семейная ипотека", fields=[]) == []
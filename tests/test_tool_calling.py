@@ -0,0 +1,42 @@
+import pytest
+
+from hf_tools.tool_calling import emittable_length, parse_tool_call, tool_call_complete
+
+
+@pytest.mark.parametrize("text, complete", [
+    ('<tool_call>{"name": "kb", "arguments": {"q": "ипотека"}}</tool_call>', True),
+    ('<tool_call>{"name": "kb", "arguments": {"q": "ипо', False),
+    ('<tool_call>{"name": "kb", "arguments": {}}', False),
+    ('[TOOL_CALL_START]kb\n{"q": {"complex": "vesna"}}', True),
+    ('[TOOL_CALL_START]kb\n{"q": {"complex": "ves', False),
+    ('{"name": "kb", "parameters": {"q": "ипотека"}}', True),
+    ('{"name": "kb", "parameters": {"q": ', False),
+    ("Обычный ответ без вызова инструментов.", False),
+])
+def test_tool_call_complete(text, complete):
+    assert tool_call_complete(text) is complete
+
+
+def test_parsed_yandex_call_keeps_nested_arguments():
+    call = parse_tool_call('[TOOL_CALL_START]kb\n{"q": {"complex": "vesna"}, "top": 3}')
+    assert call == {"name": "kb", "arguments": {"q": {"complex": "vesna"}, "top": 3}}
+
+
+@pytest.mark.parametrize("text, length", [
+    ("Квартиры есть в ЖК Весна.", len("Квартиры есть в ЖК Весна.")),
+    ("Сейчас проверю. <tool_call>{", len("Сейчас проверю. ")),
+    ("Сейчас проверю. <tool", len("Сейчас проверю. ")),
+    ("Сейчас [TOOL_CALL", len("Сейчас ")),
+    ("Цена < 10 млн", len("Цена < 10 млн")),
+    ('  {"name": "kb"', 0),
+])
+def test_emittable_length(text, length):
+    assert emittable_length(text) == length
+
+
+def test_streamed_prefix_never_grows_into_a_marker():
+    text = 'Секунду, уточню. <tool_call>{"name": "kb", "arguments": {}}</tool_call>'
+    emitted = 0
+    for end in range(1, len(text) + 1):
+        emitted = max(emitted, emittable_length(text[:end]))
+    assert text[:emitted] == "Секунду, уточню. "
@@ -1,5 +1,5 @@
 from utils.utils import ModelType
-from agents.supervisor import initialize_agent
+from agents.supervisor import get_agent
 
 class ThreadSettings():
     def __init__(self, user_id, chat_id, model=ModelType.GPT):
@@ -18,7 +18,7 @@ class ThreadSettings():
     @property
     def assistant(self): 
         if self._assistant is None:
-            self._assistant = initialize_agent(self.model)
+            self._assistant = get_agent(self.model)
 
         return self._assistant
     
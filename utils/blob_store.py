@@ -0,0 +1,111 @@
+"""
+Content-addressed local store for user images.
+
+Graph state never holds image bytes: a HumanMessage carries
+    {"type": "image_ref", "ref": "<sha256>", "mime_type": "image/jpeg"}
+and the reference is resolved into a data URI only in the LLM input of the turn
+where the image was sent (see ``resolve_images_hook``).  Images are stored when a
+message is built, before it enters the graph: ``image_ref_part`` for raw bytes
+(the bot), ``evict_images`` for a message that already carries data URIs.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import time
+from typing import Any, Dict, List
+
+from langchain_core.messages import AnyMessage, HumanMessage
+
+import config
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def _blob_path(ref: str) -> str:
+    return os.path.join(config.IMAGE_STORE_PATH, ref[:2], ref)
+
+
+def put_blob(data: bytes) -> str:
+    ref = hashlib.sha256(data).hexdigest()
+    path = _blob_path(ref)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return ref
+
+
+def get_blob(ref: str) -> bytes:
+    with open(_blob_path(ref), "rb") as f:
+        return f.read()
+
+
+def prune_blobs(max_age_days: float = config.IMAGE_STORE_TTL_DAYS) -> int:
+    """Delete blobs not written for *max_age_days*; returns the number of removed files."""
+    if not os.path.isdir(config.IMAGE_STORE_PATH):
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for root, _, files in os.walk(config.IMAGE_STORE_PATH):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def image_ref_part(data: bytes, mime_type: str = "image/jpeg") -> Dict[str, Any]:
+    return {"type": "image_ref", "ref": put_blob(data), "mime_type": mime_type}
+
+
+def evict_images(msg: AnyMessage) -> AnyMessage:
+    """Replace inline base64 image parts of a HumanMessage with blob references (returns a copy)."""
+    if not isinstance(msg, HumanMessage) or not isinstance(msg.content, list):
+        return msg
+    parts, changed = [], False
+    for part in msg.content:
+        url = part.get("image_url", {}).get("url", "") if isinstance(part, dict) and part.get("type") == "image_url" else ""
+        if url.startswith("data:") and ";base64," in url:
+            header, payload = url.split(",", 1)
+            try:
+                parts.append(image_ref_part(base64.b64decode(payload, validate=True), header[5:].split(";")[0] or "image/jpeg"))
+                changed = True
+                continue
+            except binascii.Error:
+                logger.warning("Malformed base64 image in message, keeping it inline")
+        parts.append(part)
+    return msg.model_copy(update={"content": parts}) if changed else msg
+
+
+def resolve_images(messages: List[AnyMessage]) -> List[AnyMessage]:
+    """Inline images of the newest human message as data URIs, drop image refs from older ones."""
+    last_human = next((i for i in range(len(messages) - 1, -1, -1) if isinstance(messages[i], HumanMessage)), None)
+    resolved = []
+    for i, msg in enumerate(messages):
+        if not isinstance(msg, HumanMessage) or not isinstance(msg.content, list) \
+                or not any(isinstance(p, dict) and p.get("type") == "image_ref" for p in msg.content):
+            resolved.append(msg)
+            continue
+        parts = []
+        for part in msg.content:
+            if not (isinstance(part, dict) and part.get("type") == "image_ref"):
+                parts.append(part)
+            elif i == last_human:
+                try:
+                    data = base64.b64encode(get_blob(part["ref"])).decode()
+                except FileNotFoundError:
+                    logger.warning(f"Image blob {part['ref']} is missing")
+                    continue
+                parts.append({"type": "image_url", "image_url": {"url": f"data:{part['mime_type']};base64,{data}"}})
+        resolved.append(msg.model_copy(update={"content": parts}))
+    return resolved
+
+
+def resolve_images_hook(state: Dict[str, Any]) -> Dict[str, Any]:
+    """pre_model_hook for react agents: images reach the LLM without ever entering the state."""
+    return {"llm_input_messages": resolve_images(state["messages"])}
@@ -0,0 +1,72 @@
+"""
+Per-chat ordering for the async bot: messages of one chat are processed strictly
+one after another, different chats run concurrently up to ``max_concurrency``
+turns at a time.  Queues are bounded, so a flooding chat (or overall overload)
+is rejected instead of piling up unbounded work.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict
+
+import logging
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[None]]
+
+
+class ChatDispatcher:
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        max_queue_per_chat: int = 3,
+        max_pending: int = 200,
+        idle_timeout: float = 300.0,
+    ):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._max_queue_per_chat = max_queue_per_chat
+        self._max_pending = max_pending
+        self._idle_timeout = idle_timeout
+        self._queues: Dict[int, asyncio.Queue] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self.active = 0
+
+    @property
+    def pending(self) -> int:
+        return sum(q.qsize() for q in self._queues.values())
+
+    def submit(self, chat_id: int, job: Job) -> bool:
+        """Queue *job* for *chat_id*; returns False when the chat or the whole bot is overloaded."""
+        if self.pending >= self._max_pending:
+            logger.warning(f"Dispatcher overloaded: {self.pending} pending jobs, rejecting chat {chat_id}")
+            return False
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = asyncio.Queue(self._max_queue_per_chat)
+            self._workers[chat_id] = asyncio.create_task(self._worker(chat_id, queue))
+        try:
+            queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _worker(self, chat_id: int, queue: asyncio.Queue) -> None:
+        while True:
+            try:
+                job = await asyncio.wait_for(queue.get(), self._idle_timeout)
+            except asyncio.TimeoutError:
+                if queue.empty():
+                    # no await between the check and the removal, so nothing can be queued meanwhile
+                    del self._queues[chat_id]
+                    del self._workers[chat_id]
+                    return
+                continue
+            try:
+                async with self._semaphore:
+                    self.active += 1
+                    try:
+                        await job()
+                    finally:
+                        self.active -= 1
+            except Exception:
+                logger.exception(f"Error processing message in chat {chat_id}")
+            finally:
+                queue.task_done()
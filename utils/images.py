@@ -0,0 +1,130 @@
+"""
+Preprocessing and captioning of user photos.
+
+    describe_image(raw bytes) -> (prepared JPEG bytes, caption)
+
+Photos are rotated by EXIF, downsized to IMAGE_MAX_SIDE and re-encoded as JPEG in
+memory, so both the captioning request and the stored image stay small.  Captions
+are cached by perceptual hash (dHash): re-sent or slightly re-compressed copies of
+a picture within IMAGE_HASH_DISTANCE bits reuse the caption.  Captions come from a
+shared gpt-4.1-nano client with detail="low", or from a local transformers
+image-to-text model when IMAGE_CAPTIONER == "local".  Local captioners (BLIP) only
+write English, so their captions are labelled as such before they are appended to
+the user's Russian message.
+"""
+import base64
+import io
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+
+import config
+
+import logging
+logger = logging.getLogger(__name__)
+
+CAPTION_PROMPT = "generate up to four key words describing the image in Russian language"
+# the local caption is English text in a Russian dialog: tell the agent what it is
+LOCAL_CAPTION_LABEL = "Описание изображения (на английском): "
+
+caption_llm = ChatOpenAI(model="gpt-4.1-nano")
+
+
+def image_to_uri(image_data: str) -> str:
+    return f"data:image/jpeg;base64,{image_data}"
+
+
+def prepare_image(data: bytes, max_side: int = config.IMAGE_MAX_SIDE) -> Tuple[Image.Image, bytes]:
+    """Decode, apply EXIF orientation, bound the resolution and re-encode as JPEG."""
+    with Image.open(io.BytesIO(data)) as src:
+        image = ImageOps.exif_transpose(src).convert("RGB")
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=config.IMAGE_JPEG_QUALITY, optimize=True)
+    return image, out.getvalue()
+
+
+def dhash(image: Image.Image, size: int = 8) -> int:
+    """Difference hash: 64 bits of horizontal gradient signs of a 9x8 grayscale thumbnail."""
+    pixels = list(image.convert("L").resize((size + 1, size), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left, right = pixels[row * (size + 1) + col], pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class CaptionCache:
+    """LRU of captions looked up by Hamming distance between perceptual hashes."""
+
+    def __init__(self, max_size: int = config.IMAGE_CAPTION_CACHE_SIZE, max_distance: int = config.IMAGE_HASH_DISTANCE):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self._items: "OrderedDict[int, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, image_hash: int) -> Optional[str]:
+        with self._lock:
+            for key, caption in self._items.items():
+                if bin(key ^ image_hash).count("1") <= self.max_distance:
+                    self._items.move_to_end(key)
+                    return caption
+        return None
+
+    def put(self, image_hash: int, caption: str) -> None:
+        with self._lock:
+            self._items[image_hash] = caption
+            self._items.move_to_end(image_hash)
+            if len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+caption_cache = CaptionCache()
+
+
+def caption_openai(jpeg: bytes) -> str:
+    message = HumanMessage(
+        content=[
+            {"type": "text", "text": CAPTION_PROMPT},
+            {
+                "type": "image_url",
+                # the downsized image is enough for keywords; "low" is billed as a fixed small tile
+                "image_url": {"url": image_to_uri(base64.b64encode(jpeg).decode()), "detail": "low"},
+            },
+        ],
+    )
+    return caption_llm.invoke([message]).content
+
+
+@lru_cache(maxsize=1)
+def _local_captioner():
+    from transformers import pipeline
+
+    logger.info(f"Loading local image captioner {config.IMAGE_CAPTION_MODEL}")
+    return pipeline("image-to-text", model=config.IMAGE_CAPTION_MODEL, device=-1)
+
+
+def caption_local(image: Image.Image) -> str:
+    result = _local_captioner()(image, max_new_tokens=30)
+    caption = result[0]["generated_text"].strip() if result else ""
+    return LOCAL_CAPTION_LABEL + caption if caption else ""
+
+
+def describe_image(data: bytes) -> Tuple[bytes, str]:
+    """Prepared JPEG bytes of the photo and its caption (cached for near-duplicates)."""
+    image, jpeg = prepare_image(data)
+    image_hash = dhash(image)
+    caption = caption_cache.get(image_hash)
+    if caption is not None:
+        logger.info("Image caption served from cache")
+        return jpeg, caption
+
+    caption = caption_local(image) if config.IMAGE_CAPTIONER == "local" else caption_openai(jpeg)
+    caption_cache.put(image_hash, caption)
+    return jpeg, caption
@@ -0,0 +1,326 @@
+"""
+Local instrumentation of the LangGraph workflow, no hosted service needed.
+
+``MetricsCallbackHandler`` is attached to the compiled graph (see agents.supervisor.get_agent)
+and records:
+  * wall time of every graph node, labelled by its path ("supervisor/kb_agent/agent");
+  * wall time, token usage, cached prompt tokens and estimated cost of every LLM call;
+  * errors (the OpenAI client retries internally, so retries are not visible here).
+Metrics are kept in-process and rendered in the Prometheus text format (optionally
+served on METRICS_PORT); every finished run is also appended to the JSONL trace TRACE_FILE.
+
+    python -m utils.instrumentation logs/trace.jsonl     # p50/p95 per node and per model
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+import config
+
+import logging
+logger = logging.getLogger(__name__)
+
+# USD per 1M tokens: (input, cached input, output)
+MODEL_PRICES = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+# latency samples kept per series for the quantiles
+MAX_SAMPLES = 2048
+
+Labels = Tuple[Tuple[str, str], ...]
+# (metric name, labels, value) reported by a collector at scrape time
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self._samples: Dict[str, Dict[Labels, deque]] = defaultdict(dict)
+        self._totals: Dict[str, Dict[Labels, List[float]]] = defaultdict(dict)
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def register_collector(self, collect: Callable[[], Iterable[Sample]]) -> None:
+        """*collect* is called on every render and its samples are exported as gauges."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        with self._lock:
+            self._counters[name][tuple(sorted(labels.items()))] += value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._samples[name].setdefault(key, deque(maxlen=MAX_SAMPLES)).append(value)
+            total = self._totals[name].setdefault(key, [0.0, 0])
+            total[0] += value
+            total[1] += 1
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                lines += [f"{name}{_fmt_labels(key)} {value:g}" for key, value in series.items()]
+            for name, series in sorted(self._samples.items()):
+                lines.append(f"# TYPE {name} summary")
+                for key, samples in series.items():
+                    for q in (0.5, 0.95):
+                        lines.append(f"{name}{_fmt_labels(key + (('quantile', str(q)),))} {np.quantile(samples, q):.6f}")
+                    total, count = self._totals[name][key]
+                    lines.append(f"{name}_sum{_fmt_labels(key)} {total:.6f}")
+                    lines.append(f"{name}_count{_fmt_labels(key)} {count}")
+            collectors = list(self._collectors)
+        gauges: Dict[str, List[str]] = defaultdict(list)
+        for collect in collectors:
+            try:
+                for name, labels, value in collect():
+                    if value is not None:
+                        gauges[name].append(f"{name}{_fmt_labels(tuple(sorted(labels.items())))} {value:g}")
+            except Exception as e:
+                logger.warning(f"Metrics collector {collect!r} failed: {e}")
+        for name, series in sorted(gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines += series
+        return "\n".join(lines) + "\n"
+
+
+def _fmt_labels(key: Labels) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in key) + "}"
+
+
+class TraceWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if not self.path:
+            return
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def _node_path(metadata: Dict[str, Any]) -> str:
+    ns = metadata.get("langgraph_checkpoint_ns") or metadata.get("checkpoint_ns") or ""
+    if not ns:
+        return metadata.get("langgraph_node", "")
+    return "/".join(segment.split(":")[0] for segment in ns.split("|"))
+
+
+def _usage(response: LLMResult) -> Dict[str, int]:
+    for generations in response.generations:
+        for gen in generations:
+            usage = getattr(getattr(gen, "message", None), "usage_metadata", None)
+            if usage:
+                return {
+                    "input_tokens": usage.get("input_tokens", 0),
+                    "output_tokens": usage.get("output_tokens", 0),
+                    "cache_read": (usage.get("input_token_details") or {}).get("cache_read", 0),
+                }
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return {
+        "input_tokens": usage.get("prompt_tokens", 0),
+        "output_tokens": usage.get("completion_tokens", 0),
+        "cache_read": (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0),
+    }
+
+
+def estimate_cost(model: str, usage: Dict[str, int]) -> float:
+    # "gpt-4.1-mini-2025-04-14" -> longest known prefix
+    prices = next((MODEL_PRICES[m] for m in sorted(MODEL_PRICES, key=len, reverse=True) if model.startswith(m)), None)
+    if prices is None:
+        return 0.0
+    uncached = usage["input_tokens"] - usage["cache_read"]
+    return (uncached * prices[0] + usage["cache_read"] * prices[1] + usage["output_tokens"] * prices[2]) / 1e6
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records node and LLM timings, tokens, cache hits and errors of every graph run."""
+
+    def __init__(self, registry: MetricsRegistry, trace: TraceWriter):
+        self.registry = registry
+        self.trace = trace
+        self._lock = threading.Lock()
+        self._runs: Dict[UUID, Tuple[str, str, float, Dict[str, Any]]] = {}
+
+    def _start(self, run_id: UUID, kind: str, name: str, **extra: Any) -> None:
+        with self._lock:
+            self._runs[run_id] = (kind, name, time.perf_counter(), extra)
+
+    def _finish(self, run_id: UUID) -> Optional[Tuple[str, str, float, Dict[str, Any]]]:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        kind, name, start, extra = run
+        return kind, name, time.perf_counter() - start, extra
+
+    # ───────── graph nodes ───────── #
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        # a node's own run carries its name; runnables inside the node share the metadata
+        if node and kwargs.get("name") == node:
+            self._start(run_id, "node", _node_path(metadata), thread_id=str(metadata.get("thread_id", "")))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end_node(run_id, "ok")
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end_node(run_id, type(error).__name__)
+
+    def _end_node(self, run_id: UUID, status: str) -> None:
+        run = self._finish(run_id)
+        if run is None:
+            return
+        _, node, elapsed, extra = run
+        # Command/interrupts surface as exceptions in LangGraph but are part of normal control flow
+        if status in ("ParentCommand", "GraphInterrupt"):
+            status = "ok"
+        self.registry.observe("graph_node_latency_seconds", elapsed, node=node)
+        if status != "ok":
+            self.registry.inc("graph_node_errors_total", node=node, error=status)
+        self.trace.write({"ts": time.time(), "kind": "node", "name": node, "latency": elapsed, "status": status, **extra})
+
+    # ───────── LLM calls ───────── #
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        self._start_llm(run_id, metadata or {}, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        self._start_llm(run_id, metadata or {}, kwargs)
+
+    def _start_llm(self, run_id: UUID, metadata: Dict[str, Any], kwargs: Dict[str, Any]) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or metadata.get("ls_model_name") or "unknown"
+        self._start(run_id, "llm", model, node=_node_path(metadata), thread_id=str(metadata.get("thread_id", "")))
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs):
+        run = self._finish(run_id)
+        if run is None:
+            return
+        _, model, elapsed, extra = run
+        usage = _usage(response)
+        cost = estimate_cost(model, usage)
+        labels = {"model": model, "node": extra["node"]}
+        self.registry.observe("llm_call_latency_seconds", elapsed, **labels)
+        self.registry.inc("llm_input_tokens_total", usage["input_tokens"], **labels)
+        self.registry.inc("llm_output_tokens_total", usage["output_tokens"], **labels)
+        self.registry.inc("llm_cached_tokens_total", usage["cache_read"], **labels)
+        self.registry.inc("llm_cost_usd_total", cost, **labels)
+        if usage["input_tokens"]:
+            logger.debug(f"Prompt cache {model}: {usage['cache_read']}/{usage['input_tokens']} input tokens cached")
+        self.trace.write({"ts": time.time(), "kind": "llm", "name": model, "latency": elapsed,
+                          "status": "ok", "cost": cost, **usage, **extra})
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._finish(run_id)
+        if run is None:
+            return
+        _, model, elapsed, extra = run
+        self.registry.inc("llm_errors_total", model=model, node=extra["node"], error=type(error).__name__)
+        self.trace.write({"ts": time.time(), "kind": "llm", "name": model, "latency": elapsed,
+                          "status": type(error).__name__, **extra})
+
+
+_handler: Optional[MetricsCallbackHandler] = None
+_handler_lock = threading.Lock()
+
+
+def get_metrics_handler() -> MetricsCallbackHandler:
+    """Process-wide handler; all graphs and the metrics endpoint share its registry."""
+    global _handler
+    if _handler is None:
+        with _handler_lock:
+            if _handler is None:
+                _handler = MetricsCallbackHandler(MetricsRegistry(), TraceWriter(config.TRACE_FILE))
+    return _handler
+
+
+def serve_metrics(port: int = config.METRICS_PORT) -> ThreadingHTTPServer:
+    """Expose /metrics for a Prometheus scraper in a daemon thread."""
+    registry = get_metrics_handler().registry
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving metrics on :{port}/metrics")
+    return server
+
+
+# ───────── trace summary ───────── #
+def summarise_trace(path: str) -> List[Dict[str, Any]]:
+    groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                rec = json.loads(line)
+                groups[(rec["kind"], rec["name"])].append(rec)
+
+    rows = []
+    for (kind, name), recs in groups.items():
+        latencies = np.array([r["latency"] for r in recs])
+        rows.append({
+            "kind": kind,
+            "name": name,
+            "count": len(recs),
+            "errors": sum(r.get("status") != "ok" for r in recs),
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "total": float(latencies.sum()),
+            "input_tokens": sum(r.get("input_tokens", 0) for r in recs),
+            "cache_read": sum(r.get("cache_read", 0) for r in recs),
+            "output_tokens": sum(r.get("output_tokens", 0) for r in recs),
+            "cost": sum(r.get("cost", 0.0) for r in recs),
+        })
+    return sorted(rows, key=lambda r: (r["kind"], -r["total"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="p50/p95 per graph node and LLM model from a JSONL trace")
+    parser.add_argument("trace", nargs="?", default=config.TRACE_FILE)
+    args = parser.parse_args()
+
+    rows = summarise_trace(args.trace)
+    header = f"{'kind':<5} {'name':<45} {'count':>6} {'err':>4} {'p50,s':>8} {'p95,s':>8} {'total,s':>9} {'in_tok':>9} {'cached':>8} {'out_tok':>8} {'cost,$':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{r['kind']:<5} {r['name'][:45]:<45} {r['count']:>6} {r['errors']:>4} {r['p50']:>8.3f} {r['p95']:>8.3f} "
+              f"{r['total']:>9.1f} {r['input_tokens']:>9} {r['cache_read']:>8} {r['output_tokens']:>8} {r['cost']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
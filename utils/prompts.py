@@ -0,0 +1,146 @@
+"""
+Registry of the prompt files in prompts/.
+
+All *.txt prompts are read and validated once; nodes get the text or a compiled
+ChatPromptTemplate (system prompt + history placeholder) from memory instead of
+reading files on every turn, so the prompt prefix stays byte-identical between
+calls.  Every prompt has a short sha256 ``version`` usable in cache keys.
+``reload()`` (also bound to SIGHUP by ``install_reload_signal``) re-reads the
+directory; a reload that fails validation keeps the previous prompts.  Whatever is
+derived from prompt versions registers an ``on_reload`` callback to follow them;
+``set_prompt_cache_key`` does so for the OpenAI prompt-cache routing key of an agent LLM.
+"""
+import hashlib
+import os
+import signal
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+import config
+
+import logging
+logger = logging.getLogger(__name__)
+
+# prompts the graph cannot start without
+REQUIRED_PROMPTS = ("welcome_prompt", "working_prompt_super", "post_call_mode_prompt")
+
+
+class PromptError(Exception):
+    pass
+
+
+@dataclass
+class Prompt:
+    name: str
+    text: str
+    version: str
+    _templates: Dict[str, ChatPromptTemplate] = field(default_factory=dict, repr=False)
+
+    def template(self, suffix: str = "") -> ChatPromptTemplate:
+        """System prompt (+ optional static suffix) followed by the "messages" placeholder."""
+        if suffix not in self._templates:
+            # SystemMessage instead of a template string: braces in prompt files are not variables
+            self._templates[suffix] = ChatPromptTemplate.from_messages(
+                [SystemMessage(content=self.text + suffix), MessagesPlaceholder("messages")]
+            )
+        return self._templates[suffix]
+
+
+class PromptRegistry:
+    def __init__(self, directory: str = config.PROMPTS_DIR, required: Tuple[str, ...] = REQUIRED_PROMPTS):
+        self.directory = directory
+        self.required = required
+        self._prompts: Dict[str, Prompt] = {}
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[], None]] = []
+        self.load()
+
+    def on_reload(self, callback: Callable[[], None]) -> None:
+        """*callback* runs after every successful reload."""
+        self._listeners.append(callback)
+
+    def _read_all(self) -> Dict[str, Prompt]:
+        prompts = {}
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".txt"):
+                continue
+            name = filename[:-4]
+            with open(os.path.join(self.directory, filename), "rb") as f:
+                raw = f.read()
+            try:
+                text = raw.decode("utf-8")
+            except UnicodeDecodeError as e:
+                raise PromptError(f"Prompt {filename} is not valid UTF-8: {e}")
+            if not text.strip():
+                raise PromptError(f"Prompt {filename} is empty")
+            prompts[name] = Prompt(name, text, hashlib.sha256(raw).hexdigest()[:12])
+        missing = [name for name in self.required if name not in prompts]
+        if missing:
+            raise PromptError(f"Missing prompts in {self.directory}: {', '.join(missing)}")
+        return prompts
+
+    def load(self) -> None:
+        prompts = self._read_all()
+        with self._lock:
+            self._prompts = prompts
+        logger.info("Loaded prompts: " + ", ".join(f"{p.name}@{p.version}" for p in prompts.values()))
+
+    def reload(self) -> bool:
+        try:
+            self.load()
+        except (OSError, PromptError) as e:
+            logger.error(f"Prompt reload failed, keeping previous prompts: {e}")
+            return False
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Prompt reload listener {callback!r} failed: {e}")
+        return True
+
+    def get(self, name: str) -> Prompt:
+        with self._lock:
+            return self._prompts[name]
+
+    def text(self, name: str) -> str:
+        return self.get(name).text
+
+    def version(self, name: str) -> str:
+        return self.get(name).version
+
+    def template(self, name: str, suffix: str = "") -> ChatPromptTemplate:
+        return self.get(name).template(suffix)
+
+    def as_prompt(self, name: str, suffix: str = "") -> Callable[[Dict[str, Any]], List[BaseMessage]]:
+        """``prompt=`` for create_react_agent / create_supervisor that follows reloads."""
+        def _prompt(state: Dict[str, Any]) -> List[BaseMessage]:
+            return self.template(name, suffix).invoke({"messages": state["messages"]}).to_messages()
+        return _prompt
+
+
+prompts = PromptRegistry()
+
+
+def set_prompt_cache_key(llm: Any, key: str, prompt_name: Optional[str] = None) -> None:
+    """Route the requests of *llm* (ChatOpenAI) that share one static prompt prefix to the same cache.
+
+    With *prompt_name* the key carries the prompt version and is renewed after every reload;
+    ChatOpenAI reads ``extra_body`` on each request, so the new key applies to the next call.
+    """
+    def update() -> None:
+        value = f"neuro7-{key}-{prompts.version(prompt_name)}" if prompt_name else f"neuro7-{key}"
+        llm.extra_body = {**(llm.extra_body or {}), "prompt_cache_key": value}
+
+    update()
+    if prompt_name:
+        prompts.on_reload(update)
+
+
+def install_reload_signal() -> None:
+    """Re-read prompts on SIGHUP (kill -HUP <pid>); must be called from the main thread."""
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda signum, frame: prompts.reload())
@@ -0,0 +1,127 @@
+"""
+Semantic snippet search inside a single long text (productionised experiments/test_fuzzy_search.py).
+
+Window embeddings are computed once per document and cached by content hash;
+character offsets are tracked while tokenising, and ranking is a single NumPy
+dot product against the (normalised) window matrix.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+import config
+from utils.utils import get_embeddings
+
+_TOKEN_RE = re.compile(r"\S+")
+
+
+@dataclass(slots=True, frozen=True)
+class _WindowedDoc:
+    windows: List[str]
+    offsets: np.ndarray        # (n_windows, 2) char start / end
+    vectors: np.ndarray        # (n_windows, dim), L2-normalised
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True).clip(min=1e-12)
+
+
+class SnippetIndex:
+    def __init__(
+        self,
+        embeddings=None,
+        span: int = config.SNIPPET_SPAN,
+        stride: Optional[int] = None,
+        cache_size: int = 128,
+    ):
+        """
+        span   – tokens per window
+        stride – step between windows (default span // 2, i.e. 50% overlap)
+        """
+        self._embeddings = embeddings
+        self.span = span
+        self.stride = stride or max(1, span // 2)
+        self._cache: OrderedDict[str, _WindowedDoc] = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self):
+        return self._embeddings or get_embeddings()
+
+    def _split(self, text: str) -> Tuple[List[str], np.ndarray]:
+        spans = [(m.start(), m.end()) for m in _TOKEN_RE.finditer(text)]
+        windows, offsets = [], []
+        last = max(len(spans) - self.span, 0)
+        starts = list(range(0, last + 1, self.stride))
+        if spans and starts[-1] != last:
+            starts.append(last)         # make sure the tail of the text is covered
+        for i in starts:
+            chunk = spans[i : i + self.span]
+            if not chunk:
+                break
+            start, end = chunk[0][0], chunk[-1][1]
+            windows.append(text[start:end])
+            offsets.append((start, end))
+        return windows, np.asarray(offsets, dtype=np.int64).reshape(-1, 2)
+
+    def _document(self, text: str) -> _WindowedDoc:
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        windows, offsets = self._split(text)
+        vectors = _normalise(np.asarray(self.embeddings.embed_documents(windows), dtype=np.float32)) if windows \
+            else np.zeros((0, 1), dtype=np.float32)
+        doc = _WindowedDoc(windows, offsets, vectors)
+        with self._lock:
+            self._cache[key] = doc
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return doc
+
+    def search(self, query: str, text: str, top_n: int = 5) -> List[Tuple[str, float, int]]:
+        """Return up to *top_n* ``(snippet, score, char_index)`` tuples, best first."""
+        doc = self._document(text)
+        if not doc.windows:
+            return []
+        q = _normalise(np.asarray(self.embeddings.embed_query(query), dtype=np.float32))
+        scores = doc.vectors @ q
+        top_n = min(top_n, len(scores))
+        best = np.argpartition(-scores, top_n - 1)[:top_n]
+        best = best[np.argsort(-scores[best])]
+        return [(doc.windows[i], float(scores[i]), int(doc.offsets[i, 0])) for i in best]
+
+    def trim(self, query: str, text: str, max_chars: int = config.SNIPPET_MAX_CHARS) -> str:
+        """Cut *text* down to the passages most relevant to *query*, keeping their original order."""
+        if len(text) <= max_chars:
+            return text
+        doc = self._document(text)
+        hits = self.search(query, text, top_n=len(doc.windows))
+        picked: List[Tuple[int, int]] = []
+        total = 0
+        for _, _, start in hits:
+            end = int(doc.offsets[np.searchsorted(doc.offsets[:, 0], start), 1])
+            if total + (end - start) > max_chars and picked:
+                break
+            picked.append((start, end))
+            total += end - start
+        # merge overlapping windows
+        merged: List[List[int]] = []
+        for start, end in sorted(picked):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return " … ".join(text[start:end] for start, end in merged)
+
+
+snippet_index = SnippetIndex()
@@ -1,6 +1,8 @@
 import os
+import time
 import config
 from enum import Enum
+from functools import lru_cache
 from typing import List, Dict, Iterable
 
 from langchain_core.messages import ToolMessage
@@ -8,14 +10,15 @@ from langchain_core.runnables import RunnableLambda
 
 from langgraph.prebuilt import ToolNode
 
-from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
 
 import telegramify_markdown
 import telegramify_markdown.customize as customize
 
 customize.strict_markdown = False
 
+import logging
+logger = logging.getLogger(__name__)
+
 class ModelType(Enum):
     GPT = ("gpt", "GPT")
     YA = ("ya", "YandexGPT")
@@ -90,10 +93,12 @@ def send_text_element(chat_id, element_content, bot, usr_msg = None):
             bot.send_message(chat_id, chunk)
 
 
-def _send_response(event: dict, _printed: set, thread, bot, usr_msg=None, max_length=0):
+def _response_text(event: dict, _printed: set, max_length=0) -> str:
+    """Text of the last AI message of a "values" event that was not sent yet ("" if there is nothing to send)."""
     if current_state := event.get("dialog_state"):
-        print("Currently in: ", current_state)
-    
+        logger.debug(f"Currently in: {current_state}")
+
+    msg_repr = ""
     if message := event.get("messages"):
         if isinstance(message, list):
             message = message[-1]
@@ -102,8 +107,126 @@ def _send_response(event: dict, _printed: set, thread, bot, usr_msg=None, max_le
                 msg_repr = message.content.strip()
                 if max_length > 0 and len(msg_repr) > max_length:
                     msg_repr = f"{msg_repr[:max_length]} ... (truncated)"
-                send_text_element(thread.chat_id, msg_repr, bot, usr_msg)
             _printed.add(message.id)
+    return msg_repr
+
+
+def _send_response(event: dict, _printed: set, thread, bot, usr_msg=None, max_length=0):
+    if msg_repr := _response_text(event, _printed, max_length):
+        send_text_element(thread.chat_id, msg_repr, bot, usr_msg)
+
+
+async def asend_text_element(chat_id, element_content, bot, usr_msg = None):
+    chunks = [element_content[i:i+3800] for i in range(0, len(element_content), 3800)]
+    for chunk in chunks:
+        try:
+            formatted = telegramify_markdown.markdownify(chunk)
+            if usr_msg:
+                await bot.reply_to(usr_msg, formatted, parse_mode='MarkdownV2')
+            else:
+                await bot.send_message(chat_id, formatted, parse_mode='MarkdownV2')
+        except Exception as e:
+            await bot.send_message(chat_id, chunk)
+
+
+async def _asend_response(event: dict, _printed: set, thread, bot, usr_msg=None, max_length=0):
+    if msg_repr := _response_text(event, _printed, max_length):
+        await asend_text_element(thread.chat_id, msg_repr, bot, usr_msg)
+
+
+class StreamingReply:
+    """
+    One Telegram message that grows while LLM tokens arrive.
+    The first token sends the message, further tokens are applied with edit_message_text
+    at most once per ``min_interval`` seconds; text beyond 3800 chars continues in a new message.
+    MarkdownV2 conversion is incremental: completed paragraphs are converted once and cached,
+    only the open tail is re-converted on every edit.  ``discard()`` deletes what was sent
+    (text that turned out to precede a tool call).
+    """
+
+    MAX_CHARS = 3800
+
+    def __init__(self, bot, chat_id, usr_msg=None, min_interval: float = config.STREAM_EDIT_INTERVAL):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.usr_msg = usr_msg
+        self.min_interval = min_interval
+        self.text = ""
+        self._message = None
+        self._last_edit = 0.0
+        self._rendered = ""
+        self._md_src = ""
+        self._md_out = ""
+        self._sent = []
+
+    def _markdown(self) -> str:
+        stable_end = self.text.rfind("\n\n")
+        stable = self.text[:stable_end] if stable_end > 0 else ""
+        # never cache inside an unclosed code block
+        if stable and stable != self._md_src and stable.count("```") % 2 == 0:
+            self._md_src, self._md_out = stable, telegramify_markdown.markdownify(stable).rstrip()
+        if not self.text.startswith(self._md_src) or not self._md_src:
+            return telegramify_markdown.markdownify(self.text)
+        tail = self.text[len(self._md_src):].lstrip("\n")
+        return f"{self._md_out}\n\n{telegramify_markdown.markdownify(tail)}" if tail else self._md_out
+
+    async def _flush(self):
+        if not self.text.strip():
+            return
+        try:
+            formatted, parse_mode = self._markdown(), 'MarkdownV2'
+        except Exception:
+            formatted, parse_mode = self.text, None
+        if formatted == self._rendered:
+            return
+        try:
+            await self._send_or_edit(formatted, parse_mode)
+        except Exception as e:
+            if "message is not modified" in str(e):
+                pass
+            elif parse_mode:
+                await self._send_or_edit(self.text, None)
+            else:
+                raise
+        self._rendered = formatted
+        self._last_edit = time.monotonic()
+
+    async def _send_or_edit(self, text, parse_mode):
+        if self._message is None:
+            if self.usr_msg:
+                self._message = await self.bot.reply_to(self.usr_msg, text, parse_mode=parse_mode)
+            else:
+                self._message = await self.bot.send_message(self.chat_id, text, parse_mode=parse_mode)
+            self._sent.append(self._message)
+        else:
+            await self.bot.edit_message_text(
+                text, chat_id=self.chat_id, message_id=self._message.message_id, parse_mode=parse_mode
+            )
+
+    async def append(self, token: str):
+        self.text += token
+        if len(self.text) > self.MAX_CHARS:
+            cut = self.text.rfind("\n", 0, self.MAX_CHARS)
+            cut = cut if cut > 0 else self.MAX_CHARS
+            rest = self.text[cut:].lstrip("\n")
+            self.text = self.text[:cut]
+            await self._flush()
+            # continue in a fresh message
+            self.text, self._message, self._rendered, self._md_src, self._md_out = rest, None, "", "", ""
+            self.usr_msg = None
+        if self._message is None or time.monotonic() - self._last_edit >= self.min_interval:
+            await self._flush()
+
+    async def finish(self):
+        await self._flush()
+
+    async def discard(self):
+        for message in self._sent:
+            try:
+                await self.bot.delete_message(self.chat_id, message.message_id)
+            except Exception as e:
+                logger.warning(f"Could not delete streamed message {message.message_id}: {e}")
+        self.text, self._message, self._sent = "", None, []
 
 
 def show_graph(graph):
@@ -118,22 +241,11 @@ def show_graph(graph):
         print(f"Error showing graph: {e}")
 
 
-def image_to_uri(image_data: str) -> str:
-    return f"data:image/jpeg;base64,{image_data}"
-
-def summarise_image(image_uri: str):
-    model = ChatOpenAI(model="gpt-4.1-nano")
-    message = HumanMessage(
-        content=[
-            {"type": "text", "text": "generate up to four key words describing the image in Russian language"},
-            {
-                "type": "image_url",
-                "image_url": {"url": f"{image_uri}"},
-            },
-        ],
-    )
-    response = model.invoke([message])
-    return response.content
+@lru_cache(maxsize=None)
+def get_embeddings(model_name: str = config.EMBEDDING_MODEL):
+    """Process-wide embedding model, loaded on first use."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model_name)
 
 
 def sub_dict(
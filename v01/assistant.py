@@ -20,7 +20,7 @@ from langchain.agents import initialize_agent, AgentType
 
 #from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
 
-from v01.retriever import search_kb
+from v01.retriever import search_kb, search_kb_batch
 from agents.tools.tools import (get_list_of_complexes,
                    get_developer_info,
                    get_complex_info,
@@ -32,6 +32,7 @@ from utils.utils import ModelType
 from agents.state.state import State
 
 from hf_tools.chat_local import ChatLocalTools
+from hf_tools.chat_gguf import ChatGGUFTools
 
 #from palimpsest import Palimpsest
 import logging
@@ -82,6 +83,13 @@ def assistant_factory(model: ModelType):
         
         prompt = "Ты бот, который отвечает на вопросы пользователей. Перед ответом извлеки информацию из базы знаний, при помощи инструментов."
         llm = ChatLocalTools(model_id="yandex/YandexGPT-5-Lite-8B-instruct")
+    elif model == ModelType.GGUF:
+        prompt = "Ты бот, который отвечает на вопросы пользователей. Перед ответом извлеки информацию из базы знаний, при помощи инструментов."
+        llm = ChatGGUFTools(
+            model_path=config.LOCAL_MODEL_NAME,
+            n_ctx=config.GGUF_N_CTX,
+            n_threads=config.GGUF_N_THREADS,
+        )
     elif model == ModelType.SBER:
         llm = GigaChat(
             credentials=config.GIGA_CHAT_AUTH, 
@@ -108,6 +116,7 @@ def assistant_factory(model: ModelType):
     #search_kb = get_search_tool(processor)
     assistant_tools = [
         search_kb,
+        search_kb_batch,
         get_list_of_complexes,
         get_developer_info,
         get_complex_info,
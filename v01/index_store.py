@@ -0,0 +1,271 @@
+"""
+On-disk FAISS index persistence shared by all bot worker processes.
+
+Layout of an index folder:
+    index.faiss      – raw FAISS index (Flat / HNSW / IVF-PQ, chosen by corpus size)
+    docstore.sqlite  – documents and position → docstore id mapping (no pickle)
+
+The index is opened with ``faiss.IO_FLAG_MMAP``, but FAISS memory-maps only the
+inverted lists of IVF indexes: IVF-PQ pages are shared between processes through the
+OS cache, while Flat and HNSW indexes (what ``choose_index_type`` picks for the
+corpus sizes of this bot) are still read into every process.  Where the installed
+FAISS has ``IO_FLAG_MMAP_IFC``, the codes of Flat indexes are mapped as well.  The
+documents themselves always stay on disk in SQLite.
+Legacy folders written by ``FAISS.save_local`` (index.pkl) are still readable;
+kb_builder/build_index.py writes the new layout.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import faiss
+import numpy as np
+
+from langchain.docstore.document import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+
+import logging
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.sqlite"
+
+# corpus size thresholds for the automatic index type selection
+FLAT_MAX_VECTORS = 20_000
+HNSW_MAX_VECTORS = 200_000
+# PQ with 8-bit codes trains 256 centroids per sub-quantizer
+IVFPQ_MIN_VECTORS = 256
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """Docstore backed by a SQLite file; safe to open read-only from many processes."""
+
+    def __init__(self, path: str, read_only: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+        if read_only:
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " id TEXT PRIMARY KEY, page_content TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS index_map ("
+                " position INTEGER PRIMARY KEY, doc_id TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self._conn.commit()
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        rows = [
+            (doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False, default=str))
+            for doc_id, doc in texts.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents(id, page_content, metadata) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def delete(self, ids: List) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM documents WHERE id = ?", [(i,) for i in ids])
+            self._conn.commit()
+
+    def search(self, search: str) -> str | Document:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT page_content, metadata FROM documents WHERE id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def save_index_map(self, index_to_docstore_id: Dict[int, str]) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM index_map")
+            self._conn.executemany(
+                "INSERT INTO index_map(position, doc_id) VALUES (?, ?)",
+                list(index_to_docstore_id.items()),
+            )
+            self._conn.commit()
+
+    def load_index_map(self) -> Dict[int, str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT position, doc_id FROM index_map").fetchall()
+        return dict(rows)
+
+    def save_meta(self, meta: Dict[str, str]) -> None:
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", list(meta.items()))
+            self._conn.commit()
+
+    def load_meta(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+
+
+def choose_index_type(n_vectors: int) -> str:
+    """Flat for small corpora, HNSW up to a few hundred thousand vectors, IVF-PQ beyond."""
+    index_type = config.FAISS_INDEX_TYPE
+    if index_type != "auto":
+        return index_type
+    if n_vectors <= FLAT_MAX_VECTORS:
+        return "flat"
+    if n_vectors <= HNSW_MAX_VECTORS:
+        return "hnsw"
+    return "ivfpq"
+
+
+def _create_index(vectors: np.ndarray, index_type: str, metric: int) -> faiss.Index:
+    n, dim = vectors.shape
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dim) if metric == faiss.METRIC_INNER_PRODUCT else faiss.IndexFlatL2(dim)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, config.FAISS_HNSW_M, metric)
+        index.hnsw.efConstruction = 2 * config.FAISS_HNSW_M
+        index.hnsw.efSearch = config.FAISS_HNSW_EF_SEARCH
+        return index
+    if index_type == "ivfpq":
+        nlist = max(1, int(4 * np.sqrt(n)))
+        # PQ needs dim divisible by the number of sub-quantizers
+        m = next(m for m in (64, 48, 32, 16, 8, 4, 2, 1) if dim % m == 0)
+        quantizer = faiss.IndexFlatIP(dim) if metric == faiss.METRIC_INNER_PRODUCT else faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, 8, metric)
+        index.train(vectors)
+        index.nprobe = min(nlist, config.FAISS_IVF_NPROBE)
+        return index
+    raise ValueError(f"Unknown FAISS index type: {index_type}")
+
+
+def build_vectorstore(
+    documents: Iterable[Document],
+    embeddings,
+    index_type: Optional[str] = None,
+    normalize_L2: bool = True,
+) -> FAISS:
+    """Embed *documents* and put them into a FAISS index of the requested (or automatic) type."""
+    documents = list(documents)
+    vectors = np.asarray(
+        embeddings.embed_documents([doc.page_content for doc in documents]), dtype=np.float32
+    )
+    if normalize_L2:
+        faiss.normalize_L2(vectors)
+    index_type = index_type or choose_index_type(len(documents))
+    if index_type == "ivfpq" and len(documents) < IVFPQ_MIN_VECTORS:
+        logger.warning(f"IVF-PQ needs at least {IVFPQ_MIN_VECTORS} vectors, got {len(documents)}: building a flat index")
+        index_type = "flat"
+    distance_strategy = DistanceStrategy.MAX_INNER_PRODUCT if normalize_L2 else DistanceStrategy.EUCLIDEAN_DISTANCE
+    metric = faiss.METRIC_INNER_PRODUCT if normalize_L2 else faiss.METRIC_L2
+    index = _create_index(vectors, index_type, metric)
+    index.add(vectors)
+    logger.info(f"Built {index_type} FAISS index with {index.ntotal} vectors")
+
+    ids = [doc.id or str(i) for i, doc in enumerate(documents)]
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(dict(zip(ids, documents))),
+        index_to_docstore_id=dict(enumerate(ids)),
+        normalize_L2=normalize_L2,
+        distance_strategy=distance_strategy,
+    )
+
+
+def save_vectorstore(vectorstore: FAISS, folder_path: str) -> None:
+    """Persist *vectorstore* as ``index.faiss`` + ``docstore.sqlite`` (no pickle)."""
+    os.makedirs(folder_path, exist_ok=True)
+    faiss.write_index(vectorstore.index, os.path.join(folder_path, INDEX_FILE))
+
+    db_path = os.path.join(folder_path, DOCSTORE_FILE)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    docstore = SQLiteDocstore(db_path)
+    ids = list(vectorstore.index_to_docstore_id.values())
+    docstore.add({doc_id: vectorstore.docstore.search(doc_id) for doc_id in ids})
+    docstore.save_index_map(vectorstore.index_to_docstore_id)
+    docstore.save_meta({
+        "normalize_L2": json.dumps(vectorstore._normalize_L2),
+        "distance_strategy": vectorstore.distance_strategy.value,
+    })
+
+
+def _read_index(index_path: str, mmap: bool) -> faiss.Index:
+    if mmap:
+        # IO_FLAG_MMAP covers IVF inverted lists only; IO_FLAG_MMAP_IFC (newer FAISS) adds flat codes
+        flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+        try:
+            index = faiss.read_index(index_path, flags)
+        except RuntimeError as e:
+            # not every index type can be memory mapped – fall back to a private copy
+            logger.warning(f"mmap load of {index_path} failed ({e}), reading into memory")
+        else:
+            shared = faiss.try_extract_index_ivf(index) is not None or (
+                flags & getattr(faiss, "IO_FLAG_MMAP_IFC", 0) and isinstance(index, faiss.IndexFlatCodes)
+            )
+            if not shared:
+                logger.info(f"{type(index).__name__} from {index_path} is held in process memory (only IVF lists are memory-mapped)")
+            return index
+    return faiss.read_index(index_path)
+
+
+def load_vectorstore(folder_path: str, embeddings, mmap: Optional[bool] = None) -> FAISS:
+    """Open an index folder; uses the mmap + SQLite layout and falls back to legacy pickles."""
+    if not os.path.exists(folder_path):
+        raise FileNotFoundError(f"No vectorstore found at {folder_path}")
+    mmap = config.FAISS_MMAP if mmap is None else mmap
+
+    db_path = os.path.join(folder_path, DOCSTORE_FILE)
+    if not os.path.exists(db_path):
+        logger.warning(f"{folder_path} uses the legacy pickle docstore; run `python v01/index_store.py {folder_path}` to migrate")
+        return FAISS.load_local(folder_path, embeddings, allow_dangerous_deserialization=True)
+
+    index = _read_index(os.path.join(folder_path, INDEX_FILE), mmap)
+    docstore = SQLiteDocstore(db_path, read_only=True)
+    meta = docstore.load_meta()
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=docstore.load_index_map(),
+        normalize_L2=json.loads(meta.get("normalize_L2", "false")),
+        distance_strategy=DistanceStrategy(meta.get("distance_strategy", DistanceStrategy.EUCLIDEAN_DISTANCE.value)),
+    )
+
+
+def migrate_legacy_index(folder_path: str, embeddings, index_type: Optional[str] = None) -> None:
+    """Convert a ``FAISS.save_local`` folder in place, optionally re-indexing into HNSW / IVF-PQ."""
+    legacy = FAISS.load_local(folder_path, embeddings, allow_dangerous_deserialization=True)
+    if index_type is not None or choose_index_type(legacy.index.ntotal) != "flat":
+        ids = list(legacy.index_to_docstore_id.values())
+        documents = [legacy.docstore.search(doc_id) for doc_id in ids]
+        for doc_id, doc in zip(ids, documents):
+            doc.id = doc_id
+        legacy = build_vectorstore(documents, embeddings, index_type=index_type, normalize_L2=legacy._normalize_L2)
+    save_vectorstore(legacy, folder_path)
+    logger.info(f"Migrated {folder_path} to {INDEX_FILE} + {DOCSTORE_FILE}")
+
+
+if __name__ == '__main__':
+    from utils.utils import get_embeddings
+    logging.basicConfig(level=logging.INFO)
+    folder = sys.argv[1] if len(sys.argv) > 1 else config.ASSISTANT_INDEX_FOLDER
+    idx_type = sys.argv[2] if len(sys.argv) > 2 else None
+    migrate_legacy_index(folder, get_embeddings(), index_type=idx_type)
@@ -1,9 +1,10 @@
 from typing import List
 import os
 
-from langchain_huggingface import HuggingFaceEmbeddings
+import faiss
+import numpy as np
+
 from langchain.docstore.document import Document
-from langchain_community.vectorstores import FAISS
 from langchain.retrievers.contextual_compression import ContextualCompressionRetriever
 from langchain.retrievers.document_compressors import CrossEncoderReranker
 from langchain_community.cross_encoders import HuggingFaceCrossEncoder
@@ -15,16 +16,12 @@ from langchain_community.vectorstores import FAISS
 #from palimpsest import Palimpsest
 
 import config
+from utils.utils import get_embeddings
+from v01.index_store import load_vectorstore as load_index
 
-def load_vectorstore(file_path: str, embedding_model_name: str) -> FAISS:
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"No vectorstore found at {file_path}")
-
-    embeddings = HuggingFaceEmbeddings(model_name=embedding_model_name)
 
-    return FAISS.load_local(
-        file_path, embeddings, allow_dangerous_deserialization=True
-    )
+def load_vectorstore(file_path: str, embedding_model_name: str) -> FAISS:
+    return load_index(file_path, get_embeddings(embedding_model_name))
 
 
 def get_retriever():
@@ -34,7 +31,8 @@ def get_retriever():
     vector_store_path = config.ASSISTANT_INDEX_FOLDER
     vectorstore = load_vectorstore(vector_store_path, config.EMBEDDING_MODEL)
     reranker_model = HuggingFaceCrossEncoder(model_name=config.RERANKING_MODEL)
-    RERANKER = CrossEncoderReranker(model=reranker_model, top_n=2)
+    TOP_N = 2
+    RERANKER = CrossEncoderReranker(model=reranker_model, top_n=TOP_N)
     MAX_RETRIEVALS = 5
     
     #with open(f'{vector_store_path}/docstore.pkl', 'rb') as file:
@@ -57,10 +55,33 @@ def get_retriever():
     def search(query: str) -> List[Document]:
         result = retriever.invoke(query, search_kwargs={"k": 2})
         return result
-    return search
 
+    def search_batch(queries: List[str]) -> List[List[Document]]:
+        """One embedding batch, one FAISS search over the query matrix and one rerank batch for all queries."""
+        if not queries:
+            return []
+        query_vectors = np.asarray(vectorstore.embedding_function.embed_documents(queries), dtype=np.float32)
+        if vectorstore._normalize_L2:
+            faiss.normalize_L2(query_vectors)
+        _, indices = vectorstore.index.search(query_vectors, MAX_RETRIEVALS)
+
+        candidates = [
+            [vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]) for i in row if i != -1]
+            for row in indices
+        ]
+        pairs = [(query, doc.page_content) for query, docs in zip(queries, candidates) for doc in docs]
+        scores = iter(reranker_model.score(pairs)) if pairs else iter(())
+
+        results = []
+        for docs in candidates:
+            scored = sorted(zip((next(scores) for _ in docs), docs), key=lambda x: x[0], reverse=True)
+            results.append([doc for _, doc in scored[:TOP_N]])
+        return results
 
-search = get_retriever()
+    return search, search_batch
+
+
+search, search_batch = get_retriever()
 
 @tool
 def search_kb(query: str) -> str:
@@ -76,6 +97,21 @@ def search_kb(query: str) -> str:
     else:
         return "No matching information found."
 
+@tool
+def search_kb_batch(queries: list[str]) -> str:
+    """Retrieves from knowledgebase context for several queries at once. Use it instead of several search_kb calls
+    when user asks about several building complexes or topics in one message.
+    Args:
+        queries: list of independent queries to knowledgebase, one per complex/topic
+    Returns:
+        Context from knowledgebase grouped by query.
+    """
+    groups = []
+    for query, found_docs in zip(queries, search_batch(queries)):
+        context = "\n\n".join([doc.page_content for doc in found_docs]) or "No matching information found."
+        groups.append(f"### {query}\n{context}")
+    return "\n\n".join(groups)
+
 if __name__ == '__main__':
     answer = search_kb("какие есть ЖК?")
     print(answer)
@@ -0,0 +1,162 @@
+"""
+Speech recognition service of the bot process.
+
+Voice messages are transcribed in a pool of worker processes (spawn context), each
+holding its own ASR model, so recognition neither blocks the event loop
+nor serialises concurrent voice messages behind a single model.  The number of
+queued + running jobs is bounded (ASRQueueFull is raised beyond ASR_MAX_QUEUE) and
+every job has a timeout (ASR_TIMEOUT); a job that timed out keeps its slot until the
+worker has finished it.  ``stats()`` reports queue depth, counters
+and latency percentiles; ``collect_metrics`` exports them to the metrics endpoint.  Worker processes (and so the models) are started on the
+first voice message, or right after startup by ``prewarm()``.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+import config
+from vrecog.audio import AudioInput, to_pcm
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class ASRQueueFull(Exception):
+    pass
+
+
+# ───────── worker process side ───────── #
+_worker_backend = None
+_worker_args: Dict[str, object] = {}
+
+
+def _init_worker(backend_name: str, threads: int) -> None:
+    # split the cores between workers instead of letting every model grab all of them
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    _worker_args.update(name=backend_name, threads=threads)
+
+
+def _get_worker_backend():
+    # loaded by the first job of the worker rather than in the initializer:
+    # a failing load then fails that job instead of breaking the whole pool
+    global _worker_backend
+    if _worker_backend is None:
+        from vrecog.backends import create_backend
+
+        name = _worker_args["name"]
+        kwargs = {"cpu_threads": _worker_args["threads"]} if name == "faster-whisper" else {}
+        _worker_backend = create_backend(name, **kwargs)
+    return _worker_backend
+
+
+def _transcribe(audio: AudioInput) -> str:
+    pcm = to_pcm(audio)
+    if pcm.size == 0:
+        return ""
+    return _get_worker_backend().transcribe(pcm)
+
+
+def _ping() -> bool:
+    return _get_worker_backend() is not None
+
+
+# ───────── bot process side ───────── #
+class ASRService:
+    def __init__(
+        self,
+        workers: int = config.ASR_WORKERS,
+        max_queue: int = config.ASR_MAX_QUEUE,
+        timeout: float = config.ASR_TIMEOUT,
+        backend: str = config.ASR_BACKEND,
+    ):
+        threads = config.ASR_CPU_THREADS or max(1, (os.cpu_count() or 1) // workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(backend, threads),
+        )
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        # the counters are only touched from the event loop thread
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self._latencies: deque = deque(maxlen=1024)
+
+    async def transcribe(self, audio: AudioInput) -> str:
+        """Transcribe *audio* in a worker; raises ASRQueueFull or asyncio.TimeoutError."""
+        if self.pending >= self.max_queue:
+            self.rejected += 1
+            raise ASRQueueFull(f"{self.pending} voice messages are already being recognised")
+        self.pending += 1
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().run_in_executor(self._executor, _transcribe, audio)
+        # the slot is held until the worker is done with the clip, not until the caller stops waiting:
+        # after a timeout the clip is still being decoded and must keep counting against max_queue
+        future.add_done_callback(self._release)
+        try:
+            # shield: a timeout only stops the wait, it does not cancel the job (and free its slot early)
+            text = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+            self.completed += 1
+            return text
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._latencies.append(time.perf_counter() - started)
+
+    def _release(self, future: asyncio.Future) -> None:
+        self.pending -= 1
+        if not future.cancelled() and future.exception() is not None:
+            logger.debug(f"ASR job failed: {future.exception()}")
+        logger.debug(f"ASR stats: {self.stats()}")
+
+    async def prewarm(self) -> None:
+        """Start all workers in the background so the first voice message does not pay the model load."""
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            # concurrent submissions make the pool spawn every worker
+            await asyncio.gather(*(loop.run_in_executor(self._executor, _ping) for _ in range(self.workers)))
+            logger.info(f"ASR workers warmed up in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            logger.error(f"ASR prewarm failed: {e}")
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        latencies = list(self._latencies)
+        return {
+            "workers": self.workers,
+            "queue_depth": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "p50_s": float(np.percentile(latencies, 50)) if latencies else None,
+            "p95_s": float(np.percentile(latencies, 95)) if latencies else None,
+        }
+
+    def collect_metrics(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        """stats() as gauge samples for utils.instrumentation (MetricsRegistry.register_collector)."""
+        stats = self.stats()
+        yield "asr_workers", {}, stats["workers"]
+        yield "asr_queue_depth", {}, stats["queue_depth"]
+        for outcome in ("completed", "failed", "timeouts", "rejected"):
+            yield "asr_requests", {"outcome": outcome}, stats[outcome]
+        yield "asr_latency_seconds", {"quantile": "0.5"}, stats["p50_s"]
+        yield "asr_latency_seconds", {"quantile": "0.95"}, stats["p95_s"]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
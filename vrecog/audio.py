@@ -0,0 +1,38 @@
+"""
+In-memory audio decoding shared by the bot process and the ASR workers.
+"""
+import subprocess
+from typing import Union
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+AudioInput = Union[bytes, np.ndarray, str]
+
+
+def decode_audio(data: bytes, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode an encoded clip (Telegram voice is OGG/Opus) to mono float32 PCM in memory:
+    bytes go to ffmpeg over stdin and raw samples come back over stdout, no temp files.
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate),
+        "pipe:1",
+    ]
+    try:
+        out = subprocess.run(cmd, input=data, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def to_pcm(audio: AudioInput) -> np.ndarray:
+    if isinstance(audio, str):
+        with open(audio, "rb") as f:
+            audio = f.read()
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        return decode_audio(bytes(audio))
+    return audio
@@ -0,0 +1,97 @@
+"""
+Speech recognition backends.  All take a mono 16 kHz float32 array and return text.
+
+    whisper         openai-whisper, PyTorch FP32
+    faster-whisper  CTranslate2 (int8 by default on CPU) with VAD silence trimming
+
+The language is pinned (ASR_LANGUAGE, "ru") so neither backend spends a pass on
+language detection.  Select the backend with ASR_BACKEND.
+"""
+from typing import Dict, Type
+
+import numpy as np
+
+import config
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class ASRBackend:
+    name = ""
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        raise NotImplementedError
+
+
+class WhisperBackend(ASRBackend):
+    name = "whisper"
+
+    def __init__(
+        self,
+        model_name: str = config.WHISPER_MODEL,
+        download_root: str | None = config.WHISPER_MODEL_PATH,
+        language: str | None = config.ASR_LANGUAGE,
+    ):
+        import whisper
+
+        self.language = language or None
+        logger.info(f"Loading whisper model: {model_name}")
+        self.model = whisper.load_model(model_name, download_root=download_root)
+        logger.info(f"Whisper model {model_name} loaded")
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        # fp16 is not supported on CPU and only produces a warning per call
+        script = self.model.transcribe(audio, language=self.language, fp16=False)
+        return script.get("text", "").strip()
+
+
+class FasterWhisperBackend(ASRBackend):
+    name = "faster-whisper"
+
+    def __init__(
+        self,
+        model_name: str = config.WHISPER_MODEL,
+        download_root: str | None = config.WHISPER_MODEL_PATH,
+        language: str | None = config.ASR_LANGUAGE,
+        compute_type: str = config.ASR_COMPUTE_TYPE,
+        cpu_threads: int = config.ASR_CPU_THREADS,
+        vad_filter: bool = config.ASR_VAD,
+    ):
+        from faster_whisper import WhisperModel
+
+        self.language = language or None
+        self.vad_filter = vad_filter
+        logger.info(f"Loading faster-whisper model: {model_name} ({compute_type})")
+        self.model = WhisperModel(
+            model_name,
+            device="cpu",
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            download_root=download_root,
+        )
+        logger.info(f"faster-whisper model {model_name} loaded")
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        segments, _ = self.model.transcribe(
+            audio,
+            language=self.language,
+            vad_filter=self.vad_filter,
+            condition_on_previous_text=False,
+        )
+        # segments is a generator: decoding happens while iterating
+        return "".join(segment.text for segment in segments).strip()
+
+
+BACKENDS: Dict[str, Type[ASRBackend]] = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def create_backend(name: str = config.ASR_BACKEND, **kwargs) -> ASRBackend:
+    try:
+        backend_cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown ASR backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    return backend_cls(**kwargs)
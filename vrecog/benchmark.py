@@ -0,0 +1,110 @@
+"""
+ASR backend benchmark on sample clips.
+
+Every clip is decoded once; each backend is loaded once and transcribes all clips
+*repeat* times.  Reported per backend: model load time, p50/p95 latency per clip,
+real-time factor (processing time / audio duration) and, with --reference
+(JSON {"clip.ogg": "expected text"}), word error rate.
+
+    python vrecog/benchmark.py voices/*.ogg
+    python vrecog/benchmark.py voices/*.ogg --backends whisper,faster-whisper --reference voices/reference.json
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from vrecog.audio import SAMPLE_RATE, decode_audio
+from vrecog.backends import BACKENDS, create_backend
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower().replace("ё", "е"))
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref, hyp = _words(reference), _words(hypothesis)
+    if not ref:
+        return float(bool(hyp))
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, start=1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, start=1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1] / len(ref)
+
+
+def run(backend_name: str, clips: Dict[str, np.ndarray], repeat: int, reference: Dict[str, str]) -> Dict:
+    started = time.perf_counter()
+    backend = create_backend(backend_name)
+    load_s = time.perf_counter() - started
+
+    latencies, rtfs, wers, texts = [], [], [], {}
+    for name, audio in clips.items():
+        duration = len(audio) / SAMPLE_RATE
+        for _ in range(repeat):
+            started = time.perf_counter()
+            texts[name] = backend.transcribe(audio)
+            elapsed = time.perf_counter() - started
+            latencies.append(elapsed)
+            rtfs.append(elapsed / duration if duration else 0.0)
+        if name in reference:
+            wers.append(word_error_rate(reference[name], texts[name]))
+
+    return {
+        "backend": backend_name,
+        "load_s": load_s,
+        "p50_s": float(np.percentile(latencies, 50)),
+        "p95_s": float(np.percentile(latencies, 95)),
+        "rtf": float(np.mean(rtfs)),
+        "wer": float(np.mean(wers)) if wers else None,
+        "texts": texts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ASR backends on sample clips")
+    parser.add_argument("clips", nargs="*", default=sorted(glob.glob("voices/*.ogg")))
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--reference", help="JSON file mapping clip file name to the expected transcript")
+    parser.add_argument("--output", help="append results as JSON lines")
+    args = parser.parse_args()
+
+    if not args.clips:
+        parser.error("no clips given and voices/*.ogg is empty")
+    clips = {}
+    for path in args.clips:
+        with open(path, "rb") as f:
+            clips[os.path.basename(path)] = decode_audio(f.read())
+    reference = json.load(open(args.reference, encoding="utf-8")) if args.reference else {}
+    total_audio = sum(len(a) for a in clips.values()) / SAMPLE_RATE
+    print(f"{len(clips)} clips, {total_audio:.1f}s of audio, repeat={args.repeat}\n")
+
+    results = [run(name, clips, args.repeat, reference) for name in args.backends.split(",")]
+
+    print(f"{'backend':<16} {'load,s':>8} {'p50,s':>8} {'p95,s':>8} {'RTF':>6} {'WER':>6}")
+    for r in results:
+        wer = f"{r['wer']:.3f}" if r["wer"] is not None else "-"
+        print(f"{r['backend']:<16} {r['load_s']:>8.1f} {r['p50_s']:>8.2f} {r['p95_s']:>8.2f} {r['rtf']:>6.2f} {wer:>6}")
+    for name in clips:
+        print(f"\n{name}")
+        for r in results:
+            print(f"  {r['backend']:<16} {r['texts'][name]}")
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,7 @@
-from typing import Any
 #import torch
 #import torchaudio
-import whisper
 import os
+import threading
 
 if __name__ == '__main__':
     import sys
@@ -14,17 +13,29 @@ import config
 import logging
 logger = logging.getLogger(__name__)
 
-WHISPER_MODEL=config.WHISPER_MODEL
-#WHISPER_MODEL="small"
-WHISPER_MODEL_PATH = config.WHISPER_MODEL_PATH
-logger.info(f"Loading whisper model: {WHISPER_MODEL}")
-model = whisper.load_model(WHISPER_MODEL, download_root = WHISPER_MODEL_PATH)
-logger.info(f"Whisper model {WHISPER_MODEL} loaded")
+from vrecog.audio import AudioInput, decode_audio, to_pcm
+from vrecog.backends import ASRBackend, create_backend
 
+_backend = None
+_backend_lock = threading.Lock()
 
-def recognise_text(audio_path: Any) -> str:
-    script = model.transcribe(audio_path)
-    return script["text"] if "text" in script else ""
+
+def get_backend() -> ASRBackend:
+    """ASR model of this process, loaded on first use (importing the module is free)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend(config.ASR_BACKEND)
+    return _backend
+
+
+def recognise_text(audio: AudioInput) -> str:
+    """Transcribe encoded bytes, a 16 kHz float32 array or a path to an audio file."""
+    audio = to_pcm(audio)
+    if audio.size == 0:
+        return ""
+    return get_backend().transcribe(audio)
 
 if __name__ == '__main__':
     print(recognise_text("voices/audio_2024-11-06_18-04-50.ogg"))